@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os 
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tournament.metrics.MetricsMiddleware',
+    'tournament.profiling.ProfilingMiddleware',
+    'tournament.replicas.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -87,6 +91,21 @@ DATABASES = {
     }
 }
 
+# Read replicas for API reads, see tournament/replicas.py. Aliases listed in
+# DATABASE_REPLICAS need their own DATABASES entry. Setting DATABASE_REPLICA_NAME
+# adds a second SQLite file as a replica for trying this out locally.
+DATABASE_REPLICAS = []
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['DATABASE_REPLICA_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica')
+DATABASE_ROUTERS = ['tournament.replicas.ReplicaRouter']
+REPLICA_STALENESS_SECONDS = 5  # replicas further behind are skipped, and writers read the primary this long
+REPLICA_LAG_CHECK_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,7 +167,9 @@ AUTH_USER_MODEL = 'accounts.User'
 
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
+REDIS_URL = 'redis://localhost:6379/0'  # also used for rate limiting, 'fakeredis://' for tests
+
+CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
@@ -156,6 +177,104 @@ CELERY_RESULT_SERIALIZER = 'json'
 CLEER_TIMEZONE = 'Asia/Kolkata'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 2*60
+# Tasks are acknowledged only after they finish and one at a time, so a worker
+# that dies mid-match leaves its task on the broker for another worker.
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Analytics games get their own queue, consumed by a separate worker (see
+# run.sh), so they never take a slot from tournament matches.
+CELERY_TASK_ROUTES = {
+    'tournament.tasks.play_games_task': {'queue': 'analytics'},
+}
+CELERY_BEAT_SCHEDULE = {
+    'compact-game-logs': {
+        'task': 'tournament.tasks.compact_game_logs_task',
+        'schedule': 60*60,
+    },
+    'reap-expired-leases': {
+        'task': 'tournament.tasks.reap_expired_leases_task',
+        'schedule': 60,
+    },
+}
+
+# Tick budgets passed to engine.py, a match that runs out is decided by its tie-break
+ENGINE_MAX_POINT_TICKS = 1000
+ENGINE_MAX_MATCH_TICKS = 10000
+# 'subinterpreter' loads each bot into its own sub-interpreter inside the engine
+# process, 'none' loads both into the engine's own interpreter.
+ENGINE_BOT_ISOLATION = 'none'
+
+# Fork server for engine processes, see engine_zygote.py. When set, workers ask
+# the zygote for a forked child per match instead of starting python3.
+ENGINE_ZYGOTE_SOCKET = os.environ.get('ENGINE_ZYGOTE_SOCKET')
+# Applied to each forked child before the bots are loaded.
+ENGINE_RLIMITS = {
+    'RLIMIT_CPU': 10,  # seconds, a backstop behind ENGINE_TIMEOUT
+    'RLIMIT_AS': 1024 * 1024 * 1024,
+}
+
+# Per-request profiling, see tournament/profiling.py
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_SLOW_REQUEST_MS = 500
+PROFILING_SLOW_REQUEST_TOP_QUERIES = 10
+PROFILING_SAMPLE_PATHS = []  # path prefixes eligible for cProfile sampling
+PROFILING_SAMPLE_RATE = 0.01
+PROFILING_OUTPUT_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Team directory search, see tournament/search.py. Trigram matching needs
+# PostgreSQL with pg_trgm and 'django.contrib.postgres' in INSTALLED_APPS.
+TEAM_SEARCH_TRIGRAM = False
+
+# Bulk result exports, see tournament/export.py
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WATERMARK_LAG_SECONDS = 60  # matches finishing this recently wait for the next export
+
+# Match leases, see tournament/leases.py
+MATCH_LEASE_SECONDS = 60
+MATCH_LEASE_HEARTBEAT_SECONDS = 15
+MATCH_MAX_ATTEMPTS = 3  # claims before the reaper marks a match as errored
+
+# How new matches reach the engines, see tournament/match_runner.py. 'celery'
+# queues a process_match_task per match, 'async' leaves them pending for the
+# run_matches command, which supervises many engines from one process.
+MATCH_DISPATCH = 'celery'
+MATCH_RUNNER_CONCURRENCY = 32
+MATCH_RUNNER_BATCH_SIZE = 20  # finished matches saved per transaction
+MATCH_RUNNER_FLUSH_SECONDS = 1.0
+MATCH_RUNNER_POLL_SECONDS = 1.0
+
+# Startup probe run on every new bot, see tournament/probe.py. Over budget
+# submissions are refused with 'reject' or accepted with a warning with 'warn'.
+BOT_PROBE_ENABLED = True
+BOT_PROBE_TIMEOUT_SECONDS = 10
+BOT_IMPORT_BUDGET_MS = 1000
+BOT_FIRST_MOVE_BUDGET_MS = 200
+BOT_PEAK_MEMORY_BUDGET_KB = 512 * 1024
+BOT_BUDGET_ACTION = 'reject'
+# The engine's limits, and no new processes at all. RLIMIT_NPROC doesn't bind root.
+BOT_PROBE_RLIMITS = {**ENGINE_RLIMITS, 'RLIMIT_NPROC': 0}
+
+# Test match admission control, see tournament/admission.py
+MATCH_QUEUE_NAME = 'celery'
+MATCH_QUEUE_MAX_DEPTH = 500
+MATCH_QUEUE_SECONDS_PER_MATCH = 0.5  # average worker time per queued match across the pool
+
+# Pairwise win-rate matrix between active submissions
+WIN_MATRIX_GAMES_PER_PAIR = 10  # 0 disables the matrix
+
+# Local cache of bot blobs on engine workers, see tournament/artifacts.py
+BOT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'prog_battle_bot_cache')
+BOT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Game log retention, see tournament/log_retention.py
+GAME_LOG_HOT_DAYS = 2
+GAME_LOG_TEST_MATCH_EXPIRY_DAYS = 14  # None keeps test match logs forever
+GAME_LOG_COMPACTION_BATCH_SIZE = 500
+# 'django' streams logs from Python, 'x-accel-redirect' (nginx) or 'x-sendfile'
+# hand the transfer to the web server once the request is authorized.
+GAME_LOG_DELIVERY = 'django'
+GAME_LOG_ACCEL_REDIRECT_PREFIX = '/protected-media/'  # internal nginx location aliased to MEDIA_ROOT
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
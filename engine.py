@@ -1,33 +1,49 @@
 import argparse
+import contextlib
 import importlib.util
 import csv
 import random
 import json
+import os
+import sys
+import time
+import multiprocessing
 
 GRID_SIZE = 30
 PADDLE_WIDTH = 2
 MAX_SCORE = 5
+# A rally that lasts MAX_POINT_TICKS is dead and replayed, a match that lasts
+# MAX_MATCH_TICKS ends there and is decided by the tie-break.
+MAX_POINT_TICKS = 1000
+MAX_MATCH_TICKS = 10000
+
+ACTIONS = ("left", "right", "stay")
+LOG_HEADER = ["step", "ball_x", "ball_y", "paddle1_x", "paddle2_x", "bot1_action", "bot2_action", "score_bot1", "score_bot2"]
 
 class Paddle:
     def __init__(self, y):
         self.y = y
         self.x = GRID_SIZE // 2 - 1
 
-    def move(self, direction):
+    def moved(self, direction):
         if direction == "left" and self.x > 0:
-            self.x -= 1
+            return self.x - 1
         elif direction == "right" and self.x + PADDLE_WIDTH < GRID_SIZE:
-            self.x += 1
+            return self.x + 1
+        return self.x
+
+    def move(self, direction):
+        self.x = self.moved(direction)
 
     def in_range(self, ball_x):
         return self.x <= ball_x < self.x + PADDLE_WIDTH
 
 class Ball:
-    def __init__(self):
-            self.x = random.randint(0, GRID_SIZE - 1)
+    def __init__(self, rng=random):
+            self.x = rng.randint(0, GRID_SIZE - 1)
             self.y = GRID_SIZE // 2
-            self.dx = random.choice([-1, 1])
-            self.dy = random.choice([-1, 1])
+            self.dx = rng.choice([-1, 1])
+            self.dy = rng.choice([-1, 1])
 
     def move(self):
         self.x += self.dx
@@ -35,16 +51,397 @@ class Ball:
         if self.x <= 0 or self.x >= GRID_SIZE - 1:
             self.dx *= -1  # Bounce off side walls
 
+class Game:
+    """A single match that advances one tick per step() call.
+
+    play_game drives this with bot modules, training code can drive it with
+    actions directly. Nothing is logged unless a writable text file is passed
+    as log.
+    """
+
+    def __init__(self, seed=None, log=None, max_point_ticks=MAX_POINT_TICKS, max_match_ticks=MAX_MATCH_TICKS):
+        self.writer = csv.writer(log) if log is not None else None
+        self.max_point_ticks = max_point_ticks
+        self.max_match_ticks = max_match_ticks
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        self.rng = random.Random(seed)
+        self.scores = [0, 0]
+        self.returns = [0, 0]
+        self.step_count = 0
+        self.round_num = 0
+        self.dead_points = 0
+        self.done = False
+        self.end_reason = None
+        self.winner = None
+        self.tiebreak = None
+        self.cycles = []
+        self.new_point()
+
+        if self.writer:
+            self.writer.writerow(LOG_HEADER)
+
+        return self.state
+
+    def new_point(self):
+        self.round_num += 1
+        self.point_ticks = 0
+        self.ball = Ball(self.rng)
+        self.paddle1 = Paddle(GRID_SIZE - 1)
+        self.paddle2 = Paddle(0)
+
+    @property
+    def state(self):
+        return {
+            "ball": {"x": self.ball.x, "y": self.ball.y, "dx": self.ball.dx, "dy": self.ball.dy},
+            "paddle1": {"x": self.paddle1.x, "y": self.paddle1.y},
+            "paddle2": {"x": self.paddle2.x, "y": self.paddle2.y},
+            "scores": list(self.scores),
+            "step": self.step_count,
+            "round": self.round_num,
+            "done": self.done,
+        }
+
+    def observe(self, player, pending_action1=None):
+        # The state a bot is given. Player 2 has always moved second, seeing
+        # player 1's paddle after this tick's action, hence pending_action1.
+        if player == "bot1":
+            return get_game_state(self.ball, self.paddle1, self.paddle2, "bot1")
+
+        state = get_game_state(self.ball, self.paddle2, self.paddle1, "bot2")
+        if pending_action1 is not None:
+            state["opponent"]["x"] = self.paddle1.moved(pending_action1)
+        return state
+
+    def features(self):
+        return (self.ball.x, self.ball.y, self.ball.dx, self.ball.dy, self.paddle1.x, self.paddle2.x)
+
+    def step(self, action1, action2):
+        """Advance one tick, returns (state, reward, done).
+
+        reward is +1 when player 1 wins the point, -1 when player 2 does.
+        """
+        if self.done:
+            raise RuntimeError("Game is over, call reset() to start a new one.")
+
+        ball = self.ball
+        self.paddle1.move(action1)
+        self.paddle2.move(action2)
+        ball.move()
+
+        self.step_count += 1
+        if self.writer:
+            self.writer.writerow([
+                self.step_count,
+                ball.x,
+                ball.y,
+                self.paddle1.x,
+                self.paddle2.x,
+                action1,
+                action2,
+                self.scores[0],
+                self.scores[1]
+            ])
+
+        reward = 0
+        if ball.y <= 0:
+            if not self.paddle2.in_range(ball.x):
+                reward = 1
+            else:
+                ball.dy *= -1
+                self.returns[1] += 1
+        elif ball.y >= GRID_SIZE - 1:
+            if not self.paddle1.in_range(ball.x):
+                reward = -1
+            else:
+                ball.dy *= -1
+                self.returns[0] += 1
+
+        if reward:
+            self.scores[0 if reward > 0 else 1] += 1
+            if max(self.scores) >= MAX_SCORE:
+                self.finish("score")
+            else:
+                self.new_point()
+        else:
+            self.point_ticks += 1
+            self.check_budgets()
+
+        if not self.done and self.max_match_ticks and self.step_count >= self.max_match_ticks:
+            self.finish("match_tick_budget")
+
+        return self.state, reward, self.done
+
+    def check_budgets(self):
+        if self.max_point_ticks and self.point_ticks >= self.max_point_ticks:
+            self.dead_points += 1
+            self.new_point()
+
+    def fast_forward_cycle(self, history, start):
+        """Skip the rest of a rally that has been proven to loop forever.
+
+        history holds (features, returns) for every tick of the current rally,
+        and the current state repeats history[start]. The rally can never
+        score, so it runs until a tick budget ends it; the returns that would
+        be made on the way are counted without replaying the ticks.
+        """
+        length = len(history) - start
+        budgets = []
+        if self.max_point_ticks:
+            budgets.append(self.max_point_ticks - self.point_ticks)
+        if self.max_match_ticks:
+            budgets.append(self.max_match_ticks - self.step_count)
+
+        self.cycles.append({"round": self.round_num, "start_step": self.step_count - length, "length": length})
+
+        if not budgets:
+            self.finish("cycle")
+            return
+
+        ticks = min(budgets)
+        cycles, remainder = divmod(ticks, length)
+        features, returns = history[start + remainder]
+        start_returns = history[start][1]
+
+        for i in range(2):
+            cycle_gain = self.returns[i] - start_returns[i]
+            self.returns[i] += cycles * cycle_gain + returns[i] - start_returns[i]
+
+        self.ball.x, self.ball.y, self.ball.dx, self.ball.dy, self.paddle1.x, self.paddle2.x = features
+        self.step_count += ticks
+        self.point_ticks += ticks
+        self.cycles[-1]["skipped_ticks"] = ticks
+
+        if self.writer:
+            self.writer.writerow([
+                self.step_count,
+                self.ball.x,
+                self.ball.y,
+                self.paddle1.x,
+                self.paddle2.x,
+                "cycle",
+                "cycle",
+                self.scores[0],
+                self.scores[1]
+            ])
+
+        self.check_budgets()
+        if not self.done and self.max_match_ticks and self.step_count >= self.max_match_ticks:
+            self.finish("match_tick_budget")
+
+    def finish(self, end_reason):
+        self.done = True
+        self.end_reason = end_reason
+
+        # Deterministic tie-break for matches cut short by the tick budget: more
+        # points, then more paddle returns, then player 1 (the higher seed in Round 2).
+        if self.scores[0] != self.scores[1]:
+            self.winner = 1 if self.scores[0] > self.scores[1] else 2
+        elif self.returns[0] != self.returns[1]:
+            self.winner = 1 if self.returns[0] > self.returns[1] else 2
+            self.tiebreak = "returns"
+        else:
+            self.winner = 1
+            self.tiebreak = "seat"
+
+    def result(self):
+        return {
+            "player1_score": self.scores[0],
+            "player2_score": self.scores[1],
+            "winner": self.winner,
+            "end_reason": self.end_reason,
+            "tiebreak": self.tiebreak,
+            "ticks": self.step_count,
+            "dead_points": self.dead_points,
+            "returns": list(self.returns),
+            "cycles": list(self.cycles),
+            "budget": {"point_ticks": self.max_point_ticks, "match_ticks": self.max_match_ticks},
+        }
+
+class GameBatch:
+    """Steps many independent games per call for high-throughput training.
+
+    Observations are (ball_x, ball_y, ball_dx, ball_dy, paddle1_x, paddle2_x)
+    tuples. Finished games are reset automatically unless auto_reset is off,
+    in which case they stay done until reset() is called.
+    """
+
+    def __init__(self, num_games, seed=None, auto_reset=True, max_point_ticks=MAX_POINT_TICKS, max_match_ticks=MAX_MATCH_TICKS):
+        self.auto_reset = auto_reset
+        self.seed = seed
+        self.games = [
+            Game(self.game_seed(i), max_point_ticks=max_point_ticks, max_match_ticks=max_match_ticks)
+            for i in range(num_games)
+        ]
+        self.resets = 0
+
+    def game_seed(self, index):
+        return None if self.seed is None else self.seed + index
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+        for i, game in enumerate(self.games):
+            game.reset(self.game_seed(i))
+        self.resets = 0
+        return [game.features() for game in self.games]
+
+    def step(self, actions1, actions2):
+        observations = []
+        rewards = []
+        dones = []
+
+        for game, action1, action2 in zip(self.games, actions1, actions2):
+            if game.done:
+                observations.append(game.features())
+                rewards.append(0)
+                dones.append(True)
+                continue
+
+            _, reward, done = game.step(action1, action2)
+
+            if done and self.auto_reset:
+                self.resets += 1
+                game.reset(None if self.seed is None else self.seed + len(self.games) * self.resets)
+
+            observations.append(game.features())
+            rewards.append(reward)
+            dones.append(done)
+
+        return observations, rewards, dones
+
 class PlayerWrapper:
     def __init__(self, path):
         self.path = path
         spec = importlib.util.spec_from_file_location("bot", path)
         self.bot = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(self.bot)
+        # Bots set DETERMINISTIC = True when next_move depends on nothing but
+        # the state it is given, no randomness and no memory between calls.
+        self.deterministic = getattr(self.bot, "DETERMINISTIC", False) is True
 
     def get_move(self, game_state):
         return self.bot.next_move(game_state)
 
+    def close(self):
+        pass
+
+# Code run once in every bot sub-interpreter. The engine passes values in as
+# strings and the bot's replies come back as JSON lines over a pipe, which
+# works the same on every CPython that has sub-interpreters.
+BOT_INTERPRETER_SETUP = """
+import importlib.util, json, os, random
+
+def _reply(value):
+    data = json.dumps(value).encode() + b"\\n"
+    if len(data) > 4096:
+        raise ValueError(f"Bot reply of {len(data)} bytes is too large.")
+    os.write(_reply_fd, data)
+
+def _load(path, seed):
+    global _bot
+    random.seed(seed)
+    spec = importlib.util.spec_from_file_location("bot", path)
+    _bot = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(_bot)
+    _reply(getattr(_bot, "DETERMINISTIC", False) is True)
+"""
+
+def interpreter_backend():
+    # PEP 734 on 3.14+, then the private modules it grew out of.
+    try:
+        from concurrent import interpreters
+
+        def run(interp, code, shared):
+            if shared:
+                interp.prepare_main(shared)
+            interp.exec(code)
+        return interpreters.create, run, lambda interp: interp.close()
+    except ImportError:
+        pass
+
+    try:
+        import _interpreters
+
+        def run(interp, code, shared):
+            error = _interpreters.exec(interp, code, shared or None)
+            if error is not None:
+                raise RuntimeError(getattr(error, "formatted", None) or str(error))
+        return _interpreters.create, run, _interpreters.destroy
+    except ImportError:
+        pass
+
+    try:
+        import _xxsubinterpreters
+
+        def run(interp, code, shared):
+            _xxsubinterpreters.run_string(interp, code, shared or None)
+        return _xxsubinterpreters.create, run, _xxsubinterpreters.destroy
+    except ImportError:
+        pass
+
+    raise RuntimeError(
+        f"Sub-interpreter isolation needs a CPython with sub-interpreter support, "
+        f"{sys.implementation.name} {sys.version.split()[0]} has none. Run with --isolation none."
+    )
+
+class BotInterpreter:
+    def __init__(self):
+        self.create, self.run, self.destroy = interpreter_backend()
+        self.reply_read, self.reply_write = os.pipe()
+        self.interp = self.create()
+        self.run(self.interp, BOT_INTERPRETER_SETUP, {"_reply_fd": self.reply_write})
+        self.buffer = b""
+
+    def call(self, code, shared=None):
+        self.run(self.interp, code, shared)
+        while b"\n" not in self.buffer:
+            self.buffer += os.read(self.reply_read, 65536)
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return json.loads(line)
+
+    def close(self):
+        self.destroy(self.interp)
+        os.close(self.reply_read)
+        os.close(self.reply_write)
+
+# Idle interpreters by bot path. A bot is loaded fresh into one for every game,
+# reusing it saves creating the interpreter and re-importing what the bot uses.
+_bot_interpreters = {}
+
+class SubinterpreterPlayer:
+    # PlayerWrapper with the bot in its own sub-interpreter, so neither bot
+    # shares sys.modules, random state or globals with the other or the engine.
+    def __init__(self, path, seed=None):
+        self.path = path
+        idle = _bot_interpreters.get(path)
+        self.interpreter = idle.pop() if idle else BotInterpreter()
+        try:
+            self.deterministic = self.interpreter.call("_load(_path, _seed)", {"_path": path, "_seed": seed})
+        except Exception:
+            self.interpreter.close()
+            raise
+
+    def get_move(self, game_state):
+        return self.interpreter.call("_reply(_bot.next_move(json.loads(_state)))", {"_state": json.dumps(game_state)})
+
+    def close(self):
+        _bot_interpreters.setdefault(self.path, []).append(self.interpreter)
+
+ISOLATION_MODES = ("none", "subinterpreter")
+
+def load_bot(path, cache=None, isolation="none", seed=None, seat=1):
+    if isolation == "subinterpreter":
+        return SubinterpreterPlayer(path, seed)
+    # Batch workers keep each bot loaded for every game they play with it, once
+    # per seat so a bot playing itself doesn't share its globals across seats.
+    if cache is None:
+        return PlayerWrapper(path)
+    if (path, seat) not in cache:
+        cache[path, seat] = PlayerWrapper(path)
+    return cache[path, seat]
+
 def get_game_state(ball, paddle1, paddle2, player):
     return {
         "ball": {"x": ball.x, "y": ball.y, "dx": ball.dx, "dy": ball.dy},
@@ -53,75 +450,163 @@ def get_game_state(ball, paddle1, paddle2, player):
         "player": player
     }
 
-def play_game(bot1_path, bot2_path, out_dir):
-    bot1 = PlayerWrapper(bot1_path)
-    bot2 = PlayerWrapper(bot2_path)
-
-    scores = {"bot1": 0, "bot2": 0}
-    round_num = 0
-
-    # Open CSV log file
-    with open(out_dir, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["step", "ball_x", "ball_y", "paddle1_x", "paddle2_x", "bot1_action", "bot2_action", "score_bot1", "score_bot2"])
-
-        step = 0
-
-        while scores["bot1"] < MAX_SCORE and scores["bot2"] < MAX_SCORE:
-            round_num += 1
-            ball = Ball()
-            paddle1 = Paddle(GRID_SIZE - 1)
-            paddle2 = Paddle(0)
-
-            while True:
-                state1 = get_game_state(ball, paddle1, paddle2, "bot1")
-                move1 = bot1.get_move(state1)
-                paddle1.move(move1)
-
-                state2 = get_game_state(ball, paddle2, paddle1, "bot2")
-                move2 = bot2.get_move(state2)
-                paddle2.move(move2)
-
-                ball.move()
-
-                step += 1
-                writer.writerow([
-                    step,
-                    ball.x,
-                    ball.y,
-                    paddle1.x,
-                    paddle2.x,
-                    move1,
-                    move2,
-                    scores["bot1"],
-                    scores["bot2"]
-                ])
-
-                if ball.y <= 0:
-                    if not paddle2.in_range(ball.x):
-                        scores["bot1"] += 1
-                        break
-                    else:
-                        ball.dy *= -1
-                elif ball.y >= GRID_SIZE - 1:
-                    if not paddle1.in_range(ball.x):
-                        scores["bot2"] += 1
-                        break
-                    else:
-                        ball.dy *= -1
-
-    game_results = {
-        "player1_score": scores['bot1'],
-        "player2_score": scores['bot2'],
+def open_log(out_dir=None, log_fd=None):
+    # Line buffered when streaming so a killed engine still leaves every frame written so far.
+    if log_fd is not None:
+        return os.fdopen(log_fd, "w", newline="", buffering=1)
+    if out_dir is None:
+        return contextlib.nullcontext()
+    return open(out_dir, "w", newline="")
+
+def play_game(bot1_path, bot2_path, out_dir=None, log_fd=None, bot_cache=None, seed=None,
+              max_point_ticks=MAX_POINT_TICKS, max_match_ticks=MAX_MATCH_TICKS, detect_cycles=True, isolation="none"):
+    # Sub-interpreter bots each have their own random module, seeded apart.
+    bot1 = load_bot(bot1_path, bot_cache, isolation, None if seed is None else f"{seed}:1", seat=1)
+    try:
+        bot2 = load_bot(bot2_path, bot_cache, isolation, None if seed is None else f"{seed}:2", seat=2)
+    except Exception:
+        bot1.close()
+        raise
+
+    # Open CSV log file, or the pipe the caller is reading frames from
+    with open_log(out_dir, log_fd) as f, contextlib.closing(bot1), contextlib.closing(bot2):
+        game = Game(seed, log=f, max_point_ticks=max_point_ticks, max_match_ticks=max_match_ticks)
+
+        # With two deterministic bots a repeated state within a rally means the
+        # rally loops forever, so it is fast-forwarded instead of replayed.
+        detect_cycles = detect_cycles and bot1.deterministic and bot2.deterministic
+        rally = None
+
+        while not game.done:
+            if detect_cycles:
+                if game.round_num != rally:
+                    rally = game.round_num
+                    history = []
+                    seen = {}
+
+                features = game.features()
+                if features in seen:
+                    game.fast_forward_cycle(history, seen[features])
+                    rally = None
+                    continue
+
+                seen[features] = len(history)
+                history.append((features, tuple(game.returns)))
+
+            move1 = bot1.get_move(game.observe("bot1"))
+            move2 = bot2.get_move(game.observe("bot2", pending_action1=move1))
+            game.step(move1, move2)
+
+    return game.result()
+
+def peak_memory_kb():
+    # VmHWM resets on exec, unlike ru_maxrss, so it is this process's own peak
+    # rather than that of whatever forked it. None where /proc isn't available.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def probe_bot(path, isolation="none"):
+    # Loads a bot once and times its import and first move, run by the server
+    # on every new submission.
+    started = time.perf_counter()
+    bot = load_bot(path, isolation=isolation)
+    loaded = time.perf_counter()
+    try:
+        move = bot.get_move(Game().observe("bot1"))
+    finally:
+        bot.close()
+    moved = time.perf_counter()
+
+    return {
+        "import_ms": round((loaded - started) * 1000, 3),
+        "first_move_ms": round((moved - loaded) * 1000, 3),
+        "move": move if isinstance(move, str) else repr(move),
+        "peak_memory_kb": peak_memory_kb(),
     }
 
-    print(json.dumps(game_results))
+# Loaded bots are cached per worker process for the lifetime of the pool.
+_worker_bot_cache = {}
 
-if __name__ == "__main__":
+def run_job(job):
+    index, spec = job
+    result = {"job": spec.get("id", index), "p1": spec["p1"], "p2": spec["p2"], "seed": spec.get("seed")}
+
+    try:
+        if spec.get("seed") is not None:
+            random.seed(spec["seed"])
+        result.update(play_game(
+            spec["p1"],
+            spec["p2"],
+            spec.get("log"),
+            bot_cache=_worker_bot_cache,
+            seed=spec.get("seed"),
+            max_point_ticks=spec.get("max_point_ticks", MAX_POINT_TICKS),
+            max_match_ticks=spec.get("max_match_ticks", MAX_MATCH_TICKS),
+            isolation=spec.get("isolation", "none")
+        ))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    return result
+
+def read_manifest(path):
+    # One JSON object per line: {"p1": ..., "p2": ..., "seed": ..., "log": ...}, "id" is optional.
+    f = sys.stdin if path == "-" else open(path)
+    with f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def run_manifest(path, workers=None):
+    jobs = enumerate(read_manifest(path))
+
+    with multiprocessing.Pool(processes=workers or os.cpu_count()) as pool:
+        for result in pool.imap_unordered(run_job, jobs):
+            print(json.dumps(result), flush=True)
+
+def build_parser():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--p1", required=True, help="Path to bot1.py")
-    parser.add_argument("--p2", required=True, help="Path to bot2.py")
-    parser.add_argument('--out_dir', required=True, help="Output directory.")
-    args = parser.parse_args()
+    parser.add_argument("--p1", help="Path to bot1.py")
+    parser.add_argument("--p2", help="Path to bot2.py")
+    log_target = parser.add_mutually_exclusive_group()
+    log_target.add_argument('--out_dir', help="Output directory.")
+    log_target.add_argument('--log_fd', type=int, help="Inherited file descriptor to stream CSV log frames to.")
+    parser.add_argument('--manifest', help="JSONL file of games to play in batch, '-' for stdin. Results stream out as JSONL.")
+    parser.add_argument('--workers', type=int, default=None, help="Batch worker processes, defaults to the CPU count.")
+    parser.add_argument('--max_point_ticks', type=int, default=MAX_POINT_TICKS, help="Ticks before a rally is dead, 0 for no limit.")
+    parser.add_argument('--max_match_ticks', type=int, default=MAX_MATCH_TICKS, help="Ticks before the match goes to the tie-break, 0 for no limit.")
+    parser.add_argument('--isolation', choices=ISOLATION_MODES, default="none", help="Load each bot into its own sub-interpreter.")
+    parser.add_argument('--probe', help="Load this bot once and print its import and first move times as JSON.")
+    return parser
+
+def main(argv=None):
+    # Also the entry point of every child forked by engine_zygote.py.
+    parser = build_parser()
+    args = parser.parse_args(argv)
 
-    play_game(args.p1, args.p2, args.out_dir)
\ No newline at end of file
+    if args.probe:
+        print(json.dumps(probe_bot(args.probe, args.isolation)))
+    elif args.manifest:
+        run_manifest(args.manifest, args.workers)
+    else:
+        if not (args.p1 and args.p2 and (args.out_dir or args.log_fd is not None)):
+            parser.error("--p1, --p2 and one of --out_dir/--log_fd are required without --manifest")
+        print(json.dumps(play_game(
+            args.p1,
+            args.p2,
+            args.out_dir,
+            args.log_fd,
+            max_point_ticks=args.max_point_ticks,
+            max_match_ticks=args.max_match_ticks,
+            isolation=args.isolation
+        )))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import fcntl
+import importlib
+import json
+import os
+import random
+import resource
+import selectors
+import signal
+import socket
+import sys
+import traceback
+
+import engine
+
+# A fork server for engine.py. The zygote imports the engine and the standard
+# library once, then forks a copy-on-write child per match instead of the
+# worker exec'ing a fresh interpreter. Every match still gets its own process,
+# so bots cannot leak state between games.
+#
+# Protocol, one match per connection: the client sends a JSON line
+#     {"args": [...engine.py arguments...], "rlimits": {"RLIMIT_CPU": 5, ...}}
+# with three file descriptors attached (stdout, stderr and the log pipe). The
+# zygote answers {"pid": ...} once the child is forked and {"exit": ...} when
+# it ends. Closing the connection early kills the child.
+
+MAX_REQUEST_BYTES = 64 * 1024
+LOG_FD = 3
+
+def read_request(conn):
+    data, fds, _, _ = socket.recv_fds(conn, MAX_REQUEST_BYTES, 3)
+    while data and not data.endswith(b'\n'):
+        chunk = conn.recv(MAX_REQUEST_BYTES)
+        if not chunk:
+            break
+        data += chunk
+
+    if len(fds) != 3:
+        for fd in fds:
+            os.close(fd)
+        raise ValueError(f"Expected 3 file descriptors, got {len(fds)}.")
+    return json.loads(data), fds
+
+def apply_rlimits(rlimits):
+    for name, limit in (rlimits or {}).items():
+        resource.setrlimit(getattr(resource, name), (limit, limit))
+
+def run_child(request, fds):
+    # Runs in the forked child and never returns.
+    code = 1
+    try:
+        os.setsid()
+        for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+
+        # Moved clear of 0-3 first so no dup2 below can clobber another.
+        stdout_fd, stderr_fd, log_fd = [fcntl.fcntl(fd, fcntl.F_DUPFD, 10) for fd in fds]
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        os.dup2(log_fd, LOG_FD)
+        # Drops the listening socket, other matches' connections and pipes.
+        os.closerange(LOG_FD + 1, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+
+        apply_rlimits(request.get('rlimits'))
+        # The forked random state is the zygote's, every child would share it.
+        random.seed()
+
+        args = list(request['args']) + ['--log_fd', str(LOG_FD)]
+        sys.argv = [engine.__file__] + args
+        engine.main(args)
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+class Zygote:
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.selector = selectors.DefaultSelector()
+        self.children = {}
+        self.stopping = False
+
+    def listen(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        # Anyone who can connect can run code as this user.
+        os.chmod(self.socket_path, 0o600)
+        self.server.listen(128)
+        self.selector.register(self.server, selectors.EVENT_READ, ('accept', None))
+
+    def accept(self):
+        conn, _ = self.server.accept()
+        try:
+            request, fds = read_request(conn)
+        except Exception as e:
+            print(f"Zygote: bad request: {e}", file=sys.stderr)
+            conn.close()
+            return
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            run_child(request, fds)
+
+        for fd in fds:
+            os.close(fd)
+
+        pidfd = os.pidfd_open(pid)
+        child = {'pid': pid, 'pidfd': pidfd, 'conn': conn, 'hung_up': False}
+        self.children[pid] = child
+        self.selector.register(pidfd, selectors.EVENT_READ, ('exit', child))
+        self.selector.register(conn, selectors.EVENT_READ, ('hangup', child))
+        conn.sendall(json.dumps({'pid': pid}).encode() + b'\n')
+
+    def hangup(self, child):
+        # The client gave up on the match (usually a timeout), the child's
+        # whole session goes, bots included.
+        self.selector.unregister(child['conn'])
+        child['hung_up'] = True
+        try:
+            os.killpg(child['pid'], signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def reap(self, child):
+        _, status = os.waitpid(child['pid'], 0)
+        self.selector.unregister(child['pidfd'])
+        os.close(child['pidfd'])
+        del self.children[child['pid']]
+
+        conn = child['conn']
+        try:
+            conn.sendall(json.dumps({'exit': os.waitstatus_to_exitcode(status)}).encode() + b'\n')
+        except OSError:
+            pass
+        if not child['hung_up']:
+            self.selector.unregister(conn)
+        conn.close()
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.listen()
+        print(f"Zygote listening on {self.socket_path} (pid {os.getpid()})", flush=True)
+
+        try:
+            while not self.stopping:
+                for key, _ in self.selector.select(timeout=1):
+                    action, child = key.data
+                    # Reaped earlier in this same batch of events.
+                    if child is not None and child['pid'] not in self.children:
+                        continue
+                    if action == 'accept':
+                        self.accept()
+                    elif action == 'hangup':
+                        if not key.fileobj.recv(1):
+                            self.hangup(child)
+                    else:
+                        self.reap(child)
+        finally:
+            for pid in list(self.children):
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            self.server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket', required=True, help="Unix socket path to listen on.")
+    parser.add_argument('--preload', default='', help="Comma separated modules bots commonly import, loaded once before forking.")
+    args = parser.parse_args()
+
+    for name in filter(None, (module.strip() for module in args.preload.split(','))):
+        importlib.import_module(name)
+
+    Zygote(args.socket).serve()
@@ -7,88 +7,95 @@ const getDisplayName = (teamName, defaultName = 'NA') => {
     return teamName || defaultName;
 };
 
+const STATUS_DISPLAY = { P: 'Pending', R: 'Running', C: 'Completed', E: 'Error' };
+
+const BRACKET_URL = 'http://localhost:8000/api/tournament/round-two-bracket/tree/';
+
+// Bracket nodes carry just names, scores and the winner, the card below still
+// reads the fields of the old match payload. Logs are linked from the match page.
+const nodeToMatch = (node) => {
+    const [team1, team2] = node.teams;
+    const winner = node.winner === 1 ? team1 : node.winner === 2 ? team2 : null;
+    return {
+        id: node.match,
+        node_id: node.id,
+        player1_team_name: team1.name,
+        player2_team_name: team2.name,
+        player1_score: team1.score,
+        player2_score: team2.score,
+        status_display: STATUS_DISPLAY[node.status],
+        winning_team_details: winner ? { id: winner.id, name: winner.name } : null,
+    };
+};
+
 export default function RoundTwoBracketPage() {
     const [matchesByStage, setMatchesByStage] = useState({});
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
     const [stages, setStages] = useState([]); 
+    const [activeStage, setActiveStage] = useState(null);
+
+    const fetchStage = useCallback(async (stage) => {
+        const response = await fetch(`${BRACKET_URL}?stage=${stage}`);
+        if (!response.ok) {
+            let errorMsg = `Failed to fetch bracket data. Status: ${response.status}`;
+            try {
+                const errorData = await response.json();
+                errorMsg = errorData.detail || JSON.stringify(errorData) || errorMsg;
+            } catch (e) { 
+                throw new Error(e);
+            }
+            throw new Error(errorMsg);
+        }
+        return response.json();
+    }, []);
+
+    const loadStage = useCallback(async (stage) => {
+        setActiveStage(stage);
+        if (matchesByStage[stage]) return;
 
-    const fetchBracketData = useCallback(async () => {
         setLoading(true);
         setError(null);
         try {
-            const response = await fetch('http://localhost:8000/api/tournament/round-two-bracket/');
-            if (!response.ok) {
-                let errorMsg = `Failed to fetch bracket data. Status: ${response.status}`;
-                try {
-                    const errorData = await response.json();
-                    errorMsg = errorData.detail || JSON.stringify(errorData) || errorMsg;
-                } catch (e) { 
-                    throw new Error(e);
-                }
-                throw new Error(errorMsg);
-            }
-            const data = await response.json();
-            const allMatches = data.results || data; 
-
-            const grouped = {};
-            const stageSet = new Set(); 
-
-            allMatches.forEach(match => {
-                const stageValue = match.round_stage !== null && !isNaN(Number(match.round_stage)) 
-                                   ? Number(match.round_stage) 
-                                   : 'unknown_stage';
-                
-                if (!grouped[stageValue]) {
-                    grouped[stageValue] = [];
-                }
-                grouped[stageValue].push(match);
-                stageSet.add(stageValue); 
-            });
-            
-            for (const stageKey in grouped) {
-                if (grouped[stageKey] && Array.isArray(grouped[stageKey])) {
-                     grouped[stageKey].sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
-                }
-            }
-            
-            setMatchesByStage(grouped);
-            
-            let numericStages = Array.from(stageSet).filter(s => typeof s === 'number');
-            numericStages.sort((a, b) => a - b); 
-            
-            let finalSortedStages = [];
-            const desiredOrder = [2, 4, 8, 16]; 
-            desiredOrder.forEach(ds => {
-                if (numericStages.includes(ds)) {
-                    finalSortedStages.push(ds);
-                }
-            });
-
-            numericStages.forEach(ns => {
-                if (!finalSortedStages.includes(ns)) {
-                    finalSortedStages.push(ns); 
-                }
-            });
-
-            if (stageSet.has('unknown_stage') && grouped['unknown_stage'] && grouped['unknown_stage'].length > 0) {
-                 finalSortedStages.push('unknown_stage');
-            }
-            
-            setStages(finalSortedStages.filter(s => grouped[s] && grouped[s].length > 0));
-
+            const data = await fetchStage(stage);
+            setMatchesByStage(prev => ({ ...prev, [stage]: data.nodes.map(nodeToMatch) }));
         } catch (err) {
             setError(err.message);
             console.error("Fetch bracket data error:", err);
         } finally {
             setLoading(false);
         }
-    }, []);
+    }, [fetchStage, matchesByStage]);
 
     useEffect(() => {
+        // Only the stage list and the latest stage are loaded up front, earlier
+        // stages are fetched when picked, however large the bracket is.
+        const fetchBracketData = async () => {
+            setLoading(true);
+            setError(null);
+            try {
+                let data = await fetchStage(2);
+                setStages(data.stages);
+
+                if (data.stages.length > 0) {
+                    const latest = data.stages[data.stages.length - 1];
+                    if (latest !== 2) {
+                        data = await fetchStage(latest);
+                    }
+                    setMatchesByStage({ [latest]: data.nodes.map(nodeToMatch) });
+                    setActiveStage(latest);
+                }
+            } catch (err) {
+                setError(err.message);
+                console.error("Fetch bracket data error:", err);
+            } finally {
+                setLoading(false);
+            }
+        };
+
         fetchBracketData();
-    }, [fetchBracketData]);
+    }, [fetchStage]);
 
 
     const getStageName = (stageKey) => {
@@ -131,7 +138,19 @@ export default function RoundTwoBracketPage() {
         <div className="min-h-screen bg-black text-white px-6 md:px-8 py-5">
             <h1 className="text-center mb-10 text-4xl md:text-5xl font-bold tracking-wide text-neutral-100">Tournament Bracket</h1>
             
-            {stages.map((stageKey,i) => (
+            <div className="flex flex-row flex-wrap justify-center gap-2 mb-10">
+                {stages.map(stageKey => (
+                    <button
+                        key={stageKey}
+                        onClick={() => loadStage(stageKey)}
+                        className={`text-sm font-bold rounded px-3 py-1.5 ${stageKey === activeStage ? 'bg-neutral-100 text-black' : 'bg-neutral-800 text-neutral-300 hover:bg-neutral-700'}`}
+                    >
+                        {getStageName(stageKey)}
+                    </button>
+                ))}
+            </div>
+
+            {[activeStage].filter(stageKey => stageKey !== null).map((stageKey,i) => (
                 <div key={i}>
                     <h2 className="text-center text-2xl md:text-4xl font-semibold mb-0 pb-4 text-neutral-100">
                             {getStageName(stageKey)} 
@@ -181,11 +200,8 @@ export default function RoundTwoBracketPage() {
                                                 {isDraw &&
                                                     <p className="my-1.5 font-medium">Result: Draw</p>
                                                 }
-                                                <p className="my-1.5 text-xs">
-                                                    {match.played_at ? `Played: ${new Date(match.played_at).toLocaleString()}` : `Queued: ${new Date(match.created_at).toLocaleString()}`}
-                                                </p>
 
-                                                {match.game_log_url && match.status_display === 'Completed' && (
+                                                {match.id && match.status_display === 'Completed' && (
                                                     <div className="mt-2.5 flex flex-col sm:flex-row items-center gap-2.5 justify-center">
                                                         {match.id && ( 
                                                             <Link href={`/matches/${match.id}`} className={actionLinkPrimaryClasses}>
@@ -7,6 +7,7 @@ import { useAuth } from '@/context/AuthContext';
 export default function NewChallengePage() {
     const [availableTeams, setAvailableTeams] = useState([]); 
     const [selectedOpponentTeamId, setSelectedOpponentTeamId] = useState('');
+    const [teamSearch, setTeamSearch] = useState('');
     const [message, setMessage] = useState('');
     
     const [loadingTeams, setLoadingTeams] = useState(true);
@@ -20,7 +21,9 @@ export default function NewChallengePage() {
         if (!accessToken) return; 
         setLoadingTeams(true);
         try {
-            const response = await authFetch('http://localhost:8000/api/tournament/teams/');
+            const response = await authFetch(
+                `http://localhost:8000/api/tournament/teams/autocomplete/?q=${encodeURIComponent(teamSearch)}`
+            );
             if (!response.ok) {
                 throw new Error('Failed to fetch teams for opponent selection.');
             }
@@ -35,13 +38,15 @@ export default function NewChallengePage() {
         } finally {
             setLoadingTeams(false);
         }
-    }, [authFetch, accessToken, currentUser]); 
+    }, [authFetch, accessToken, currentUser, teamSearch]); 
 
     useEffect(() => {
         if (!authLoading && !accessToken) {
             router.push('/login?message=Please log in to issue a challenge.');
         } else if (accessToken) { 
-            fetchTeamsForSelection();
+            // Wait for typing to pause before searching.
+            const timer = setTimeout(fetchTeamsForSelection, 250);
+            return () => clearTimeout(timer);
         }
     }, [authLoading, accessToken, router, fetchTeamsForSelection]);
 
@@ -101,6 +106,13 @@ export default function NewChallengePage() {
                     <label htmlFor="opponentTeam" className="block mb-2 font-medium text-neutral-300">
                         Challenge Team:
                     </label>
+                    <input
+                        type="text"
+                        value={teamSearch}
+                        onChange={(e) => setTeamSearch(e.target.value)}
+                        placeholder="Search teams by name..."
+                        className="w-full mb-3 p-3 bg-neutral-700 border border-neutral-600 rounded-md text-base text-neutral-100 placeholder-neutral-400 focus:border-blue-500 focus:ring-1 focus:ring-blue-500"
+                    />
                     {loadingTeams ? (
                         <p className="text-neutral-300 p-3 bg-neutral-700 border border-neutral-600 rounded-md">Loading available teams...</p>
                     ) : availableTeams.length > 0 ? (
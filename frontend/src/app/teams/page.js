@@ -7,26 +7,50 @@ export default function TeamsListPage() {
     const [teams, setTeams] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    const [search, setSearch] = useState('');
+    const [nextPage, setNextPage] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    const fetchPage = async (url) => {
+        const response = await fetch(url);
+
+        if (!response.ok) {
+            let errorMsg = `Failed to fetch teams. Status: ${response.status}`;
+            try {
+                const errorData = await response.json();
+                errorMsg = errorData.detail || JSON.stringify(errorData) || errorMsg;
+            } catch (e) {
+                throw new Error(e)
+            }
+            throw new Error(errorMsg);
+        }
+        return response.json();
+    };
+
+    const loadMore = async () => {
+        if (!nextPage) return;
+        setLoadingMore(true);
+        try {
+            const data = await fetchPage(nextPage);
+            setTeams(prev => [...prev, ...data.results]);
+            setNextPage(data.next);
+        } catch (err) {
+            setError(err.message);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     useEffect(() => {
         const fetchTeams = async () => {
             setLoading(true);
             setError(null);
             try {
-                const response = await fetch('http://localhost:8000/api/tournament/teams/');
-                
-                if (!response.ok) {
-                    let errorMsg = `Failed to fetch teams. Status: ${response.status}`;
-                    try {
-                        const errorData = await response.json();
-                        errorMsg = errorData.detail || JSON.stringify(errorData) || errorMsg;
-                    } catch (e) {
-                        throw new Error(e)
-                    }
-                    throw new Error(errorMsg);
-                }
-                const data = await response.json();
-                setTeams(data);
+                const data = await fetchPage(
+                    `http://localhost:8000/api/tournament/teams/?search=${encodeURIComponent(search)}`
+                );
+                setTeams(data.results || data);
+                setNextPage(data.next || null);
             } catch (err) {
                 setError(err.message);
                 console.error("Fetch teams error:", err);
@@ -35,12 +59,10 @@ export default function TeamsListPage() {
             }
         };
 
-        fetchTeams();
-    }, []);
-
-    if (loading) {
-        return <div className='p-5'>Loading teams...</div>;
-    }
+        // Wait for typing to pause before searching.
+        const timer = setTimeout(fetchTeams, 250);
+        return () => clearTimeout(timer);
+    }, [search]);
 
     if (error) {
         return <div className='p-5 text-red-500'>Error fetching teams: {error}</div>;
@@ -51,8 +73,18 @@ export default function TeamsListPage() {
             <h1 className="text-3xl font-bold mb-6 text-white"> 
                 All Teams
             </h1>
+
+            <input
+                type="text"
+                value={search}
+                onChange={(e) => setSearch(e.target.value)}
+                placeholder="Search teams by name..."
+                className="w-full mb-6 p-3 bg-neutral-700 border border-neutral-600 rounded-md text-base text-neutral-100 placeholder-neutral-400 focus:border-blue-500 focus:ring-1 focus:ring-blue-500"
+            />
             
-            {teams.length === 0 ? (
+            {loading ? (
+                <p className="text-neutral-300">Loading teams...</p>
+            ) : teams.length === 0 ? (
                 <p className="text-neutral-300"> 
                     No teams found.
                 </p>
@@ -82,6 +114,18 @@ export default function TeamsListPage() {
                     ))}
                 </ul>
             )}
+
+            {!loading && nextPage && (
+                <div className="text-center mt-6">
+                    <button
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                        className="py-2 px-4 bg-blue-500 hover:bg-blue-600 text-white rounded-md disabled:bg-neutral-600 disabled:text-neutral-400"
+                    >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 }
\ No newline at end of file
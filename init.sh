@@ -17,7 +17,7 @@ source venv/bin/activate
 echo "Virtual environment activated."
 
 echo "Installing Python dependencies..."
-pip install django djangorestframework djangorestframework-simplejwt django-cors-headers celery redis
+pip install django djangorestframework djangorestframework-simplejwt django-cors-headers celery redis prometheus_client
 echo "Python dependencies installed."
 
 
@@ -1,5 +1,6 @@
 DJANGO_PID=""
 CELERY_PID=""
+ANALYTICS_PID=""
 
 cleanup() {
     echo ""
@@ -35,6 +36,21 @@ cleanup() {
         echo "Celery worker PID not captured or already stopped."
     fi
 
+    if [ -n "$ANALYTICS_PID" ]; then
+        echo "Stopping Celery analytics worker (PID: $ANALYTICS_PID)..."
+        kill $ANALYTICS_PID
+        sleep 2
+        if ps -p $ANALYTICS_PID > /dev/null; then
+            echo "Celery analytics worker (PID: $ANALYTICS_PID) did not stop gracefully, sending SIGKILL..."
+            kill -9 $ANALYTICS_PID
+        else
+            echo "Celery analytics worker (PID: $ANALYTICS_PID) stopped."
+        fi
+        wait $ANALYTICS_PID 2>/dev/null
+    else
+        echo "Celery analytics worker PID not captured or already stopped."
+    fi
+
     if command -v deactivate &> /dev/null; then
       echo "Deactivating virtual environment..."
       deactivate
@@ -57,16 +73,28 @@ else
   exit 1
 fi
 
+# Django and Celery processes share their metrics through this directory.
+export PROMETHEUS_MULTIPROC_DIR="$(pwd)/.prometheus_multiproc"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 echo "Starting Django development server in the background..."
 python manage.py runserver &
 DJANGO_PID=$!
 echo "Django development server started with PID: $DJANGO_PID"
 
-echo "Starting Celery worker in the background..."
-celery -A backend worker -l info &
+echo "Starting Celery worker (with beat for periodic jobs) in the background..."
+celery -A backend worker -B -Q celery -n matches@%h -l info &
 CELERY_PID=$!
 echo "Celery worker started with PID: $CELERY_PID"
 
+# Win-matrix games run in their own worker, so a fan-out never takes the
+# match worker's slots.
+echo "Starting Celery analytics worker in the background..."
+celery -A backend worker -Q analytics -n analytics@%h --concurrency=2 -l info &
+ANALYTICS_PID=$!
+echo "Celery analytics worker started with PID: $ANALYTICS_PID"
+
 cd frontend
 echo "Currently in $(pwd)"
 
@@ -1,3 +1,5 @@
+DETERMINISTIC = True
+
 def next_move(state):
     ball_x = state["ball"]["x"]
     my_x = state["you"]["x"]
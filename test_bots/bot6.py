@@ -1,5 +1,7 @@
 import random
 
+DETERMINISTIC = True
+
 def next_move(state):
     ball_x = state["ball"]["x"]
     my_x = state["you"]["x"]
@@ -1,8 +1,10 @@
 from django.contrib import admin
-from .models import Team, BotSubmission, Match, LeaderboardScore, Challenge
+from .models import Team, BotSubmission, Match, LeaderboardScore, Challenge, TeamStats, BracketNode
 
 admin.site.register(Team)
 admin.site.register(BotSubmission)
 admin.site.register(Match)
 admin.site.register(LeaderboardScore)
-admin.site.register(Challenge)
\ No newline at end of file
+admin.site.register(Challenge)
+admin.site.register(TeamStats)
+admin.site.register(BracketNode)
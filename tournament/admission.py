@@ -0,0 +1,33 @@
+import redis
+from django.conf import settings
+from .models import Match
+from .redis_client import get_redis
+
+class QueueFull(Exception):
+    def __init__(self, depth, estimated_wait):
+        self.depth = depth
+        self.estimated_wait = estimated_wait
+        super().__init__(f"Match queue depth {depth} is over the admission limit.")
+
+def match_queue_depth():
+    if settings.MATCH_DISPATCH == 'async':
+        # The asyncio runner takes work straight from the pending rows.
+        return Match.objects.filter(status=Match.MatchStatus.PENDING, coalesced_into__isnull=True).count()
+
+    # Celery's Redis transport keeps each queue as a plain list on the broker.
+    try:
+        return get_redis().llen(settings.MATCH_QUEUE_NAME)
+    except redis.RedisError as e:
+        print(f"Could not read match queue depth: {e}")
+        return None
+
+def estimated_wait(depth):
+    return int(depth * settings.MATCH_QUEUE_SECONDS_PER_MATCH) + 1
+
+def admit_match():
+    depth = match_queue_depth()
+
+    if depth is not None and depth >= settings.MATCH_QUEUE_MAX_DEPTH:
+        raise QueueFull(depth, estimated_wait(depth))
+
+    return depth
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import tempfile
+import time
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Bot code is stored once per distinct content under the sha256 of the file, so
+# identical uploads share a blob and a blob never changes once written. Workers
+# fetch blobs through the storage backend and keep them in a local LRU cache,
+# which means engine nodes do not need to share a filesystem with the web server.
+BLOB_PREFIX = 'bot_blobs/'
+
+# Cached files used this recently are never evicted, an engine may be reading them.
+EVICTION_GRACE_SECONDS = 5 * 60
+
+class ArtifactError(Exception):
+    pass
+
+def blob_name(digest):
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest}.py"
+
+def store_blob(data):
+    digest = hashlib.sha256(data).hexdigest()
+    name = blob_name(digest)
+
+    if not default_storage.exists(name):
+        saved_name = default_storage.save(name, ContentFile(data))
+
+        # Another upload stored the same blob first, keep theirs.
+        if saved_name != name:
+            default_storage.delete(saved_name)
+
+    return name, digest
+
+def cache_path(digest):
+    return os.path.join(settings.BOT_CACHE_DIR, f"{digest}.py")
+
+def fetch_bot(submission):
+    """Return a local path to the submission's code, downloading it if needed."""
+    if not submission.code_digest:
+        # Uploaded before blobs existed, move it into the blob store first.
+        with submission.code_file.open('rb') as f:
+            submission.store_code(f.read())
+        submission.save(update_fields=['code_file', 'code_digest'])
+
+    path = cache_path(submission.code_digest)
+
+    try:
+        # Touching the file marks it as recently used for eviction.
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    with default_storage.open(submission.code_file.name, 'rb') as f:
+        data = f.read()
+
+    if hashlib.sha256(data).hexdigest() != submission.code_digest:
+        raise ArtifactError(f"Bot blob {submission.code_file.name} does not match digest {submission.code_digest}.")
+
+    os.makedirs(settings.BOT_CACHE_DIR, exist_ok=True)
+
+    # Written under a temporary name and renamed, so concurrent workers on the
+    # same machine never see a partial file.
+    fd, tmp_path = tempfile.mkstemp(dir=settings.BOT_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    evict_bot_cache(keep=path)
+    return path
+
+def evict_bot_cache(keep=None, max_bytes=None):
+    max_bytes = settings.BOT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+
+    with os.scandir(settings.BOT_CACHE_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith('.py'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    removed = 0
+    grace = time.time() - EVICTION_GRACE_SECONDS
+
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes or mtime >= grace:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    return removed
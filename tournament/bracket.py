@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Match, BracketNode
+
+# Round 2 is kept as a tree of BracketNode rows. manage_round_two adds a stage
+# of nodes at a time, pointing each node at the two nodes its teams won, and
+# record_bracket_result copies the result onto the node when its match finishes
+# or errors.
+# Reads never touch Match, a stage is one indexed query and a subtree one query
+# per stage below it, so a 1,024 team bracket is at most ten.
+
+NODE_FIELDS = (
+    'id', 'stage', 'position', 'match', 'status', 'winner', 'feeder1', 'feeder2',
+    'team1', 'team1_name', 'team1_score', 'team2', 'team2_name', 'team2_score',
+)
+
+def match_winner(match, team1_id, team2_id):
+    if match.status != Match.MatchStatus.COMPLETED or match.winning_team_id is None:
+        return None
+    if match.winning_team_id == team1_id:
+        return 1
+    if match.winning_team_id == team2_id:
+        return 2
+    return None
+
+def result_fields(match, team1_id, team2_id):
+    return {
+        'status': match.status,
+        'team1_score': match.player1_score,
+        'team2_score': match.player2_score,
+        'winner': match_winner(match, team1_id, team2_id),
+    }
+
+def set_bracket_node(match, position, feeder1=None, feeder2=None):
+    # A stage that is set up again after an errored match reuses the slot, so
+    # the node moves on to the replacement match.
+    team1 = match.player1_submission.team
+    team2 = match.player2_submission.team
+
+    node, _ = BracketNode.objects.update_or_create(
+        stage=match.round_stage,
+        position=position,
+        defaults={
+            'match': match,
+            'feeder1': feeder1,
+            'feeder2': feeder2,
+            'team1': team1,
+            'team2': team2,
+            'team1_name': team1.name,
+            'team2_name': team2.name,
+            **result_fields(match, team1.id, team2.id),
+        }
+    )
+    return node
+
+def update_bracket_node(match):
+    node = BracketNode.objects.filter(match=match).values('team1', 'team2').first()
+    if node is None:
+        return 0
+    return BracketNode.objects.filter(match=match).update(
+        updated_at=timezone.now(),
+        **result_fields(match, node['team1'], node['team2'])
+    )
+
+def record_bracket_result(match):
+    # Called on every terminal transition of a match, the node must never be
+    # left showing Pending once its match is done.
+    if match.match_type != Match.MatchType.ROUND_TWO:
+        return 0
+    try:
+        return update_bracket_node(match)
+    except Exception as e:
+        print(f"Match {match.id.hex}: could not update bracket node: {e}")
+        return 0
+
+@transaction.atomic
+def rebuild_bracket():
+    # Builds nodes for Round 2 matches created before the tree existed. Stages
+    # are walked from the first round in, each team's feeder being the node of
+    # the match it won in the stage before.
+    matches = Match.objects.filter(
+        match_type=Match.MatchType.ROUND_TWO,
+        round_stage__isnull=False,
+        player1_submission__isnull=False,
+        player2_submission__isnull=False
+    ).select_related('player1_submission__team', 'player2_submission__team').order_by('-round_stage', 'created_at')
+
+    won_by_team = {}
+    current_stage = None
+    stage_nodes = []
+    created = 0
+
+    for match in matches:
+        if match.round_stage != current_stage:
+            if stage_nodes:
+                won_by_team = {node.match.winning_team_id: node for node in stage_nodes if node.match.winning_team_id}
+            current_stage = match.round_stage
+            stage_nodes = []
+            position = 0
+
+        node = set_bracket_node(
+            match,
+            position,
+            won_by_team.get(match.player1_submission.team_id),
+            won_by_team.get(match.player2_submission.team_id)
+        )
+        stage_nodes.append(node)
+        position += 1
+        created += 1
+
+    return created
+
+def serialize_nodes(rows):
+    return [
+        {
+            'id': row['id'],
+            'stage': row['stage'],
+            'position': row['position'],
+            'match': row['match'],
+            'status': row['status'],
+            'winner': row['winner'],
+            'feeders': [row['feeder1'], row['feeder2']],
+            'teams': [
+                {'id': row['team1'], 'name': row['team1_name'], 'score': row['team1_score']},
+                {'id': row['team2'], 'name': row['team2_name'], 'score': row['team2_score']},
+            ],
+        }
+        for row in rows
+    ]
+
+def bracket_stages():
+    return sorted(set(BracketNode.objects.values_list('stage', flat=True)), reverse=True)
+
+def stage_nodes(stage):
+    return serialize_nodes(BracketNode.objects.filter(stage=stage).order_by('position').values(*NODE_FIELDS))
+
+def subtree_nodes(root_id, depth=None):
+    nodes = list(BracketNode.objects.filter(id=root_id).values(*NODE_FIELDS))
+    frontier = nodes
+    level = 0
+
+    while frontier and (depth is None or level < depth):
+        feeder_ids = [row[key] for row in frontier for key in ('feeder1', 'feeder2') if row[key]]
+        if not feeder_ids:
+            break
+        frontier = list(BracketNode.objects.filter(id__in=feeder_ids).order_by('position').values(*NODE_FIELDS))
+        nodes.extend(frontier)
+        level += 1
+
+    return serialize_nodes(nodes)
@@ -0,0 +1,212 @@
+import asyncio
+import subprocess
+import os
+import json
+import socket
+import threading
+import time
+from django.conf import settings
+
+from .metrics import ENGINE_STARTUP
+
+ENGINE_PATH = os.path.join(settings.BASE_DIR, 'engine.py')
+SYSTEM_BOT = os.path.join(settings.BASE_DIR, 'bot1.py')
+ENGINE_TIMEOUT = 3
+
+def engine_args(player1_bot_path, player2_bot_path):
+    return [
+        '--p1', player1_bot_path,
+        '--p2', player2_bot_path,
+        '--max_point_ticks', str(settings.ENGINE_MAX_POINT_TICKS),
+        '--max_match_ticks', str(settings.ENGINE_MAX_MATCH_TICKS),
+        '--isolation', settings.ENGINE_BOT_ISOLATION
+    ]
+
+def engine_command(player1_bot_path, player2_bot_path, log_fd):
+    return ['python3', ENGINE_PATH, *engine_args(player1_bot_path, player2_bot_path), '--log_fd', str(log_fd)]
+
+def engine_output(stdout):
+    # Bots may print to stdout too, the engine's result is always the last line.
+    stdout_lines = stdout.strip().splitlines()
+    return json.loads(stdout_lines[-1] if stdout_lines else '')
+
+class ZygoteProcess:
+    # Enough of Popen for run_engine, backed by a child forked by
+    # engine_zygote.py. Killing it hangs up on the zygote, which kills the
+    # child's whole session.
+    def __init__(self, socket_path, args, log_fd, rlimits=None):
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.conn.connect(socket_path)
+            request = json.dumps({'args': args, 'rlimits': rlimits or {}}).encode() + b'\n'
+            socket.send_fds(self.conn, [request], [stdout_write, stderr_write, log_fd])
+        except Exception:
+            self.conn.close()
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+
+        self.stdout = os.fdopen(stdout_read, 'r')
+        self.stderr = os.fdopen(stderr_read, 'r')
+        self.replies = self.conn.makefile('r')
+        self.pid = json.loads(self.replies.readline() or 'null')
+        self.returncode = None
+        if self.pid is None:
+            self.returncode = -1
+            self.stdout.close()
+            self.stderr.close()
+            self.close()
+            raise RuntimeError("Engine zygote did not start the match.")
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        if self.returncode is None:
+            reply = self.replies.readline()
+            self.returncode = json.loads(reply)['exit'] if reply else -1
+            self.close()
+        return self.returncode
+
+    def kill(self):
+        try:
+            self.conn.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    def close(self):
+        self.replies.close()
+        self.conn.close()
+
+def start_engine(player1_bot_path, player2_bot_path, log_fd):
+    if settings.ENGINE_ZYGOTE_SOCKET:
+        # The zygote adds --log_fd itself, the descriptor travels over the socket.
+        args = engine_args(player1_bot_path, player2_bot_path)
+        return ZygoteProcess(settings.ENGINE_ZYGOTE_SOCKET, args, log_fd, settings.ENGINE_RLIMITS)
+
+    return subprocess.Popen(
+        engine_command(player1_bot_path, player2_bot_path, log_fd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        pass_fds=(log_fd,)
+    )
+
+def run_engine(player1_bot_path, player2_bot_path, log_stream, timeout=ENGINE_TIMEOUT):
+    # The engine streams CSV frames over a dedicated pipe rather than stdout, so
+    # anything a bot prints cannot corrupt either the log or the result JSON.
+    read_fd, write_fd = os.pipe()
+    started = time.perf_counter()
+
+    command = engine_command(player1_bot_path, player2_bot_path, write_fd)
+
+    try:
+        process = start_engine(player1_bot_path, player2_bot_path, write_fd)
+    except Exception:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        process.kill()
+
+    output = {}
+
+    def drain(name, stream):
+        output[name] = stream.read()
+
+    readers = [
+        threading.Thread(target=drain, args=('stdout', process.stdout), daemon=True),
+        threading.Thread(target=drain, args=('stderr', process.stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+
+    try:
+        with os.fdopen(read_fd, 'rb') as log_pipe:
+            first_frame = log_pipe.readline()
+            if first_frame:
+                ENGINE_STARTUP.observe(time.perf_counter() - started)
+                log_stream.write(first_frame)
+            for frame in log_pipe:
+                log_stream.write(frame)
+        process.wait()
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        for reader in readers:
+            reader.join()
+
+    engine_stderr_capture = output.get('stderr', '').strip()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(command, timeout, output=output.get('stdout'), stderr=engine_stderr_capture)
+
+    return engine_output(output.get('stdout', '')), engine_stderr_capture
+
+async def run_engine_async(player1_bot_path, player2_bot_path, log_stream, timeout=ENGINE_TIMEOUT):
+    # Same contract as run_engine, but the pipes are read by the event loop so
+    # one process can supervise many engines, see tournament/match_runner.py.
+    read_fd, write_fd = os.pipe()
+    started = time.perf_counter()
+
+    command = engine_command(player1_bot_path, player2_bot_path, write_fd)
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            pass_fds=(write_fd,)
+        )
+    except Exception:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    loop = asyncio.get_running_loop()
+    log_pipe = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(log_pipe),
+        os.fdopen(read_fd, 'rb', buffering=0)
+    )
+
+    async def copy_log():
+        first_frame = await log_pipe.readline()
+        if first_frame:
+            ENGINE_STARTUP.observe(time.perf_counter() - started)
+            log_stream.write(first_frame)
+        while frame := await log_pipe.readline():
+            log_stream.write(frame)
+
+    async def communicate():
+        stdout, stderr, _ = await asyncio.gather(process.stdout.read(), process.stderr.read(), copy_log())
+        await process.wait()
+        return stdout, stderr
+
+    try:
+        stdout, stderr = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        raise subprocess.TimeoutExpired(command, timeout)
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        transport.close()
+
+    return engine_output(stdout.decode('utf-8', 'replace')), stderr.decode('utf-8', 'replace').strip()
@@ -0,0 +1,319 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.utils import timezone
+
+from .log_retention import read_game_log
+from .models import Match, LeaderboardScore
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Results are exported as Hive-style partitions, <table>/match_type=R1/date=2025-01-31/,
+# which pyarrow, DuckDB and pandas read as a single dataset. Rows are pulled
+# with iterator() (a server-side cursor on PostgreSQL) and written a chunk at a
+# time, so memory stays flat however large the tournament is. Parquet is used
+# when pyarrow is installed, gzip compressed CSV otherwise.
+
+WATERMARK_FILE = '_watermark.json'
+FINISHED = [Match.MatchStatus.COMPLETED, Match.MatchStatus.ERROR]
+
+MATCH_COLUMNS = [
+    ('id', 'string'),
+    ('match_type', 'string'),
+    ('status', 'string'),
+    ('round_stage', 'int'),
+    ('created_at', 'timestamp'),
+    ('played_at', 'timestamp'),
+    ('player1_submission', 'string'),
+    ('player1_team', 'string'),
+    ('player2_submission', 'string'),
+    ('player2_team', 'string'),
+    ('is_player2_system_bot', 'bool'),
+    ('player1_score', 'int'),
+    ('player2_score', 'int'),
+    ('winning_team', 'string'),
+    ('coalesced_into', 'string'),
+    ('end_reason', 'string'),
+    ('tiebreak', 'string'),
+    ('ticks', 'int'),
+    ('rallies', 'int'),
+    ('longest_rally', 'int'),
+    ('player1_hits', 'int'),
+    ('player2_hits', 'int'),
+]
+
+LEADERBOARD_COLUMNS = [
+    ('team', 'string'),
+    ('team_name', 'string'),
+    ('score', 'int'),
+    ('rank', 'int'),
+    ('matches_played', 'int'),
+    ('matches_won', 'int'),
+    ('last_updated', 'timestamp'),
+]
+
+TICK_COLUMNS = [
+    ('match_id', 'string'),
+    ('step', 'int'),
+    ('ball_x', 'int'),
+    ('ball_y', 'int'),
+    ('paddle1_x', 'int'),
+    ('paddle2_x', 'int'),
+    ('bot1_action', 'string'),
+    ('bot2_action', 'string'),
+    ('score_bot1', 'int'),
+    ('score_bot2', 'int'),
+]
+
+def finished_matches(since=None, until=None):
+    matches = Match.objects.filter(status__in=FINISHED, played_at__isnull=False)
+    if since:
+        matches = matches.filter(played_at__gt=since)
+    if until:
+        matches = matches.filter(played_at__lte=until)
+    return matches.order_by('played_at')
+
+def match_rows(matches, chunk_size):
+    fields = (
+        'id', 'match_type', 'status', 'round_stage', 'created_at', 'played_at',
+        'player1_submission', 'player1_submission__team__name',
+        'player2_submission', 'player2_submission__team__name', 'is_player2_system_bot',
+        'player1_score', 'player2_score', 'winning_team', 'coalesced_into', 'engine_result', 'stats', 'game_log',
+    )
+
+    for row in matches.values(*fields).iterator(chunk_size=chunk_size):
+        engine_result = row.pop('engine_result') or {}
+        stats = row.pop('stats') or {}
+        hits = stats.get('hits') or [None, None]
+
+        row['player1_team'] = row.pop('player1_submission__team__name')
+        row['player2_team'] = row.pop('player2_submission__team__name')
+        row['end_reason'] = engine_result.get('end_reason')
+        row['tiebreak'] = engine_result.get('tiebreak')
+        row['ticks'] = engine_result.get('ticks')
+        row['rallies'] = stats.get('rallies')
+        row['longest_rally'] = stats.get('longest_rally')
+        row['player1_hits'], row['player2_hits'] = hits
+        yield row
+
+def leaderboard_rows(chunk_size):
+    scores = LeaderboardScore.objects.values(
+        'team', 'team__name', 'score', 'rank', 'matches_played', 'matches_won', 'last_updated'
+    ).order_by('-score', 'team')
+
+    for row in scores.iterator(chunk_size=chunk_size):
+        row['team_name'] = row.pop('team__name')
+        yield row
+
+def tick_rows(match_id, game_log):
+    reader = csv.reader(io.StringIO(game_log.decode('utf-8', 'replace')))
+    next(reader, None)
+
+    for fields in reader:
+        # A timed out match can end on a partial frame.
+        if len(fields) != len(TICK_COLUMNS) - 1 or not fields[0].isdigit():
+            continue
+        row = dict(zip((name for name, _ in TICK_COLUMNS[1:]), fields))
+        row['match_id'] = match_id
+        yield row
+
+def convert(value, kind):
+    if value is None or value == '':
+        return None
+    if kind == 'int':
+        try:
+            return int(value)
+        except ValueError:
+            return None  # cycle rows carry "cycle" in place of actions only
+    if kind == 'string':
+        return str(value)
+    return value
+
+class PartitionWriter:
+    def __init__(self, path, columns, use_parquet):
+        self.path = path
+        self.columns = columns
+        self.use_parquet = use_parquet
+        self.rows = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if use_parquet:
+            self.schema = pyarrow.schema([(name, arrow_type(kind)) for name, kind in columns])
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+        else:
+            self.file = gzip.open(path, 'wt', newline='')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        if self.use_parquet:
+            data = {
+                name: [convert(row.get(name), kind) for row in rows]
+                for name, kind in self.columns
+            }
+            self.writer.write_table(pyarrow.Table.from_pydict(data, schema=self.schema))
+        else:
+            for row in rows:
+                self.writer.writerow([
+                    '' if row.get(name) is None else csv_value(row.get(name)) for name, _ in self.columns
+                ])
+        self.rows += len(rows)
+
+    def close(self):
+        if self.use_parquet:
+            self.writer.close()
+        else:
+            self.file.close()
+
+def arrow_type(kind):
+    return {
+        'string': pyarrow.string(),
+        'int': pyarrow.int64(),
+        'bool': pyarrow.bool_(),
+        'timestamp': pyarrow.timestamp('us', tz='UTC'),
+    }[kind]
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+class PartitionedExport:
+    def __init__(self, out_dir, table, columns, run_name, chunk_size, use_parquet):
+        self.out_dir = out_dir
+        self.table = table
+        self.columns = columns
+        self.run_name = run_name
+        self.chunk_size = chunk_size
+        self.use_parquet = use_parquet
+        self.buffers = {}
+        self.writers = {}
+
+    def path(self, partition):
+        extension = 'parquet' if self.use_parquet else 'csv.gz'
+        directory = os.path.join(self.out_dir, self.table, *(f"{key}={value}" for key, value in partition))
+        return os.path.join(directory, f"part-{self.run_name}.{extension}")
+
+    def add(self, partition, row):
+        buffer = self.buffers.setdefault(partition, [])
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            self.flush(partition)
+
+    def flush(self, partition):
+        rows = self.buffers.pop(partition, None)
+        if not rows:
+            return
+        if partition not in self.writers:
+            self.writers[partition] = PartitionWriter(self.path(partition), self.columns, self.use_parquet)
+        self.writers[partition].write(rows)
+
+    def close(self):
+        for partition in list(self.buffers):
+            self.flush(partition)
+        for writer in self.writers.values():
+            writer.close()
+        return sum(writer.rows for writer in self.writers.values())
+
+def match_partition(row):
+    return (('match_type', row['match_type']), ('date', row['played_at'].date().isoformat()))
+
+def read_watermark(out_dir):
+    try:
+        with open(os.path.join(out_dir, WATERMARK_FILE)) as f:
+            return datetime.fromisoformat(json.load(f)['played_at'])
+    except FileNotFoundError:
+        return None
+
+def write_watermark(out_dir, until):
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'played_at': until.isoformat()}, f)
+    os.replace(path + '.tmp', path)
+
+def export_results(out_dir, since=None, incremental=False, game_logs=False, chunk_size=None, file_format=None):
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    use_parquet = (file_format or ('parquet' if pyarrow else 'csv')) == 'parquet'
+    if use_parquet and pyarrow is None:
+        raise RuntimeError("Parquet export needs pyarrow, install it or export as csv.")
+
+    # Partitions create their own directories, but a run with nothing to export
+    # still leaves its watermark here.
+    os.makedirs(out_dir, exist_ok=True)
+
+    if incremental and since is None:
+        since = read_watermark(out_dir)
+
+    # Matches finishing right now may not be committed yet, so the export stops
+    # a little short of the present and the next one picks them up.
+    until = timezone.now() - timedelta(seconds=settings.EXPORT_WATERMARK_LAG_SECONDS)
+    run_name = until.strftime('%Y%m%dT%H%M%S')
+    matches = finished_matches(since, until)
+
+    # match_type is already in the partition path, readers add it back as a column.
+    partitioned_columns = [column for column in MATCH_COLUMNS if column[0] != 'match_type']
+    match_export = PartitionedExport(out_dir, 'matches', partitioned_columns, run_name, chunk_size, use_parquet)
+    tick_export = PartitionedExport(out_dir, 'ticks', TICK_COLUMNS, run_name, chunk_size, use_parquet)
+    logs_exported = 0
+
+    for row in match_rows(matches, chunk_size):
+        partition = match_partition(row)
+        match_export.add(partition, row)
+
+        if game_logs and row['game_log']:
+            match = Match(id=row['id'], game_log=row['game_log'])
+            try:
+                data = read_game_log(match)
+            except FileNotFoundError:
+                continue
+            for tick in tick_rows(row['id'].hex, data):
+                tick_export.add(partition, tick)
+            logs_exported += 1
+
+    results = {
+        'format': 'parquet' if use_parquet else 'csv.gz',
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat(),
+        'matches': match_export.close(),
+        'ticks': tick_export.close(),
+        'game_logs': logs_exported,
+    }
+
+    # The leaderboard is a snapshot rather than a log, every run writes all of it.
+    leaderboard_export = PartitionedExport(out_dir, 'leaderboard', LEADERBOARD_COLUMNS, run_name, chunk_size, use_parquet)
+    snapshot = (('snapshot', run_name),)
+    for row in leaderboard_rows(chunk_size):
+        leaderboard_export.add(snapshot, row)
+    results['leaderboard'] = leaderboard_export.close()
+
+    write_watermark(out_dir, until)
+    return results
+
+def stream_csv_gz(rows, columns):
+    # Yields a gzip compressed CSV a chunk at a time for StreamingHttpResponse.
+    buffer = io.BytesIO()
+    compressor = gzip.GzipFile(fileobj=buffer, mode='wb')
+    text = io.TextIOWrapper(compressor, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(text)
+    writer.writerow([name for name, _ in columns])
+
+    for row in rows:
+        writer.writerow(['' if row.get(name) is None else csv_value(row.get(name)) for name, _ in columns])
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    text.flush()
+    text.detach()
+    compressor.close()
+    yield buffer.getvalue()
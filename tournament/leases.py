@@ -0,0 +1,116 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Match
+from .bracket import record_bracket_result
+
+# A worker owns a RUNNING match only while its lease is unexpired. Claiming,
+# renewing and finishing are all conditional UPDATEs, so two workers handed the
+# same task can never both run it, and a match whose worker died is handed back
+# to the queue by the reaper once the lease runs out.
+
+def new_lease_holder():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def lease_expiry(now=None):
+    return (now or timezone.now()) + timedelta(seconds=settings.MATCH_LEASE_SECONDS)
+
+def claim_match(match_id, holder):
+    claimed = Match.objects.filter(id=match_id, status=Match.MatchStatus.PENDING).update(
+        status=Match.MatchStatus.RUNNING,
+        lease_holder=holder,
+        lease_expires_at=lease_expiry(),
+        attempts=F('attempts') + 1
+    )
+    return bool(claimed)
+
+def renew_lease(match_id, holder):
+    renewed = Match.objects.filter(id=match_id, status=Match.MatchStatus.RUNNING, lease_holder=holder).update(
+        lease_expires_at=lease_expiry()
+    )
+    return bool(renewed)
+
+def release_match(match_id, holder, **fields):
+    # Writes the outcome only if this worker still holds the lease.
+    released = Match.objects.filter(id=match_id, status=Match.MatchStatus.RUNNING, lease_holder=holder).update(
+        lease_holder='',
+        lease_expires_at=None,
+        **fields
+    )
+    return bool(released)
+
+def resolve_followers(match_id, **result):
+    # Matches coalesced into this one are never run themselves, every terminal
+    # transition of the leader must hand its result on or they wait forever.
+    return Match.objects.filter(coalesced_into_id=match_id, status=Match.MatchStatus.PENDING).update(**result)
+
+class LeaseHeartbeat:
+    def __init__(self, match_id, holder, interval=None):
+        self.match_id = match_id
+        self.holder = holder
+        self.interval = interval or settings.MATCH_LEASE_HEARTBEAT_SECONDS
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                if not renew_lease(self.match_id, self.holder):
+                    print(f"Match {self.match_id.hex}: lease lost, no longer renewing.")
+                    self.lost.set()
+                    return
+        except Exception as e:
+            print(f"Match {self.match_id.hex}: lease heartbeat failed: {e}")
+        finally:
+            # Every thread gets its own database connection.
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+def reap_expired_leases(now=None):
+    now = now or timezone.now()
+    # RUNNING matches without a lease were claimed before leases existed.
+    expired = Match.objects.filter(
+        Q(lease_expires_at__lt=now) | Q(lease_expires_at__isnull=True),
+        status=Match.MatchStatus.RUNNING
+    )
+
+    requeued = []
+    failed = 0
+
+    for match_id, lease_expires_at, attempts in expired.values_list('id', 'lease_expires_at', 'attempts'):
+        # The lease may have been renewed or released since it was read.
+        if lease_expires_at is None:
+            lease = Q(lease_expires_at__isnull=True)
+        else:
+            lease = Q(lease_expires_at=lease_expires_at)
+        still_expired = Match.objects.filter(lease, id=match_id, status=Match.MatchStatus.RUNNING)
+
+        if attempts >= settings.MATCH_MAX_ATTEMPTS:
+            if still_expired.update(
+                status=Match.MatchStatus.ERROR,
+                lease_holder='',
+                lease_expires_at=None,
+                played_at=now
+            ):
+                failed += 1
+                resolve_followers(match_id, status=Match.MatchStatus.ERROR, played_at=now)
+                record_bracket_result(Match.objects.get(id=match_id))
+        elif still_expired.update(status=Match.MatchStatus.PENDING, lease_holder='', lease_expires_at=None):
+            requeued.append(match_id)
+
+    return requeued, failed
@@ -0,0 +1,110 @@
+import hashlib
+import re
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
+# Game logs are stored gzip compressed and handed out as they are, with
+# Content-Encoding telling the client to inflate them back to the CSV. With
+# GAME_LOG_DELIVERY set to 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache,
+# lighttpd) Django only authorizes the request and the web server sends the
+# file, Range requests included. nginx keeps Content-Disposition and
+# Cache-Control across the internal redirect but drops Content-Encoding and
+# ETag, so its protected location has to set the encoding itself (see the
+# README) or browsers get the raw gzip bytes as CSV.
+
+CHUNK_SIZE = 64 * 1024
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# A completed match never gets a different log under the same name, compaction
+# moves it to a new name (and so a new ETag).
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+def log_etag(name):
+    return '"' + hashlib.sha256(name.encode()).hexdigest()[:32] + '"'
+
+def parse_range(header, size):
+    # Only a single byte range is supported, anything else gets the whole file.
+    match = RANGE_HEADER.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range.")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable.")
+    return start, end
+
+def read_range(f, start, end):
+    with f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def serve_game_log(request, match, immutable):
+    name = match.game_log.name
+    etag = log_etag(name)
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    delivery = settings.GAME_LOG_DELIVERY
+    response = None
+
+    if delivery == 'x-accel-redirect':
+        # Content-Encoding and ETag below are replaced by nginx's own.
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.GAME_LOG_ACCEL_REDIRECT_PREFIX + name
+    elif delivery == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = match.game_log.path
+    else:
+        size = match.game_log.size
+        range_header = request.headers.get('Range')
+        byte_range = None
+
+        if range_header and request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_range(match.game_log.open('rb'), start, end), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = StreamingHttpResponse(read_range(match.game_log.open('rb'), 0, size - 1))
+            response['Content-Length'] = str(size)
+
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Type'] = 'text/csv'
+    if name.endswith('.gz'):
+        # Stored compressed, the client decodes it back to the CSV.
+        response['Content-Encoding'] = 'gzip'
+
+    # Archived logs are named by their hash, so the download is named by match.
+    response['Content-Disposition'] = f'attachment; filename="game_log_{match.id.hex}.csv"'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,116 @@
+import gzip
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import Match
+
+# Hot logs are written per match by process_match_task under game_logs/. Once
+# they are older than GAME_LOG_HOT_DAYS they move into the archive, keyed by the
+# sha256 of the uncompressed CSV so identical logs are only stored once. Both
+# tiers are gzip files referenced from Match.game_log, so readers never need to
+# know which tier a log lives in.
+HOT_PREFIX = 'game_logs/'
+ARCHIVE_PREFIX = 'game_log_archive/'
+GZIP_MAGIC = b'\x1f\x8b'
+
+def archive_name(digest):
+    return f"{ARCHIVE_PREFIX}{digest[:2]}/{digest}.csv.gz"
+
+def is_archived(name):
+    return bool(name) and name.startswith(ARCHIVE_PREFIX)
+
+def read_game_log(match):
+    with match.game_log.open('rb') as f:
+        data = f.read()
+
+    # Logs written before compression was introduced are plain CSV.
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data)
+    return data
+
+def archive_game_log(match):
+    data = read_game_log(match)
+    digest = hashlib.sha256(data).hexdigest()
+    name = archive_name(digest)
+
+    if not default_storage.exists(name):
+        saved_name = default_storage.save(name, ContentFile(gzip.compress(data, compresslevel=9, mtime=0)))
+
+        # Another compactor stored the same blob first, keep theirs.
+        if saved_name != name:
+            default_storage.delete(saved_name)
+
+    hot_name = match.game_log.name
+    moved = Match.objects.filter(pk=match.pk, game_log=hot_name).update(game_log=name)
+
+    if moved:
+        delete_if_unreferenced(hot_name)
+
+    return moved
+
+def delete_if_unreferenced(name):
+    if name and not Match.objects.filter(game_log=name).exists():
+        default_storage.delete(name)
+        return True
+    return False
+
+def expire_game_log(match):
+    name = match.game_log.name
+    cleared = Match.objects.filter(pk=match.pk, game_log=name).update(game_log=None)
+
+    if cleared:
+        delete_if_unreferenced(name)
+
+    return cleared
+
+def process_in_batches(queryset, handler, batch_size, label):
+    done = 0
+    errors = 0
+
+    # Handled rows drop out of the queryset, so keep taking the first batch
+    # until it comes back short or nothing in it could be processed.
+    while True:
+        batch = list(queryset[:batch_size])
+        progressed = 0
+
+        for match in batch:
+            try:
+                progressed += handler(match)
+            except Exception as e:
+                print(f"Error {label} game log for match {match.id.hex}: {e}")
+                errors += 1
+
+        done += progressed
+        if len(batch) < batch_size or not progressed:
+            return done, errors
+
+def compact_game_logs(now=None, batch_size=None):
+    now = now or timezone.now()
+    batch_size = batch_size or settings.GAME_LOG_COMPACTION_BATCH_SIZE
+    results = {'expired': 0, 'archived': 0, 'errors': 0}
+
+    with_logs = Match.objects.exclude(game_log='').exclude(game_log__isnull=True).only('id', 'game_log')
+
+    expiry_days = settings.GAME_LOG_TEST_MATCH_EXPIRY_DAYS
+    if expiry_days is not None:
+        expired = with_logs.filter(
+            match_type=Match.MatchType.TEST_VS_SYSTEM,
+            played_at__lt=now - timedelta(days=expiry_days)
+        ).order_by('played_at')
+
+        results['expired'], errors = process_in_batches(expired, expire_game_log, batch_size, 'expiring')
+        results['errors'] += errors
+
+    to_archive = with_logs.filter(
+        game_log__startswith=HOT_PREFIX,
+        played_at__lt=now - timedelta(days=settings.GAME_LOG_HOT_DAYS)
+    ).order_by('played_at')
+
+    results['archived'], errors = process_in_batches(to_archive, archive_game_log, batch_size, 'archiving')
+    results['errors'] += errors
+
+    return results
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from tournament.log_retention import compact_game_logs
+
+class Command(BaseCommand):
+    help = 'Expires old test match logs and moves older hot logs into the content-addressed archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=None,
+            help='Matches handled per query, defaults to GAME_LOG_COMPACTION_BATCH_SIZE.'
+        )
+
+    def handle(self, *args, **options):
+        results = compact_game_logs(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {results['expired']} and archived {results['archived']} game logs."
+        ))
+        if results['errors']:
+            self.stdout.write(self.style.WARNING(f"{results['errors']} game logs could not be processed."))
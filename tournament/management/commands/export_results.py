@@ -0,0 +1,47 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from tournament.export import export_results
+
+class Command(BaseCommand):
+    help = 'Exports finished matches, the leaderboard and optionally per-tick game logs as partitioned Parquet or csv.gz files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--out_dir', type=str, required=True)
+        parser.add_argument('--since', type=str, default=None, help='Only matches played after this ISO timestamp.')
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Continue from the watermark left in --out_dir by the previous export.'
+        )
+        parser.add_argument('--game_logs', action='store_true', help='Also export every tick of each game log.')
+        parser.add_argument('--format', type=str, choices=['parquet', 'csv'], default=None, help='Defaults to parquet when pyarrow is installed.')
+        parser.add_argument('--chunk_size', type=int, default=None, help='Rows fetched and written at a time, defaults to EXPORT_CHUNK_SIZE.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid --since timestamp '{options['since']}'.")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        try:
+            results = export_results(
+                options['out_dir'],
+                since=since,
+                incremental=options['incremental'],
+                game_logs=options['game_logs'],
+                chunk_size=options['chunk_size'],
+                file_format=options['format']
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {results['matches']} matches, {results['ticks']} ticks from {results['game_logs']} game logs "
+            f"and {results['leaderboard']} leaderboard rows as {results['format']} "
+            f"(played after {results['since'] or 'the start'} up to {results['until']})."
+        ))
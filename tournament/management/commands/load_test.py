@@ -0,0 +1,419 @@
+import contextlib
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import urllib.request
+import urllib.error
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction, OperationalError
+from django.conf import settings
+from django.utils import timezone
+
+from backend.celery import app as celery_app
+from tournament.artifacts import store_blob
+from tournament.models import Team, BotSubmission, Match, LeaderboardScore, Challenge
+
+User = get_user_model()
+
+SAMPLE_BOTS = os.path.join(settings.BASE_DIR, 'test_bots')
+USERNAME_PREFIX = 'loadtest_user'
+TEAM_PREFIX = 'LoadTest Team '
+
+ENDPOINTS = {
+    'leaderboard': ('GET', '/api/tournament/leaderboard/'),
+    'match_list': ('GET', '/api/tournament/matches/'),
+    'test_match': ('POST', '/api/tournament/matches/initiate-test/'),
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LockWaitRecorder:
+    # Counts statements that failed or stalled on a database lock. Installed per
+    # connection, so every client thread wraps its own.
+    def __init__(self, slow_write_seconds):
+        self.slow_write_seconds = slow_write_seconds
+        self.lock = threading.Lock()
+        self.lock_errors = 0
+        self.slow_writes = 0
+        self.write_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        is_write = not sql.lstrip().upper().startswith('SELECT')
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as e:
+            if 'lock' in str(e).lower():
+                with self.lock:
+                    self.lock_errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if is_write:
+                with self.lock:
+                    self.write_seconds += elapsed
+                    if elapsed >= self.slow_write_seconds:
+                        self.slow_writes += 1
+
+
+class LockWaitSampler:
+    # Polls pg_stat_activity for backends waiting on a lock, which sees the
+    # web server and Celery workers too. Only PostgreSQL reports this, elsewhere
+    # report() returns None.
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.samples = []
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if connection.vendor == 'postgresql':
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopping.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE wait_event_type = 'Lock' AND datname = current_database()"
+                    )
+                    self.samples.append(cursor.fetchone()[0])
+                    self.stopping.wait(self.interval)
+        finally:
+            connection.close()
+
+    def report(self):
+        if self.thread is None:
+            return None
+        self.stopping.set()
+        self.thread.join()
+        return {
+            'samples': len(self.samples),
+            'max_waiting': max(self.samples, default=0),
+            'mean_waiting': round(statistics.fmean(self.samples), 3) if self.samples else 0.0,
+        }
+
+
+def recorder_report(recorder):
+    # None when the statements ran in another process the recorder can't see.
+    if recorder is None:
+        return {'lock_errors': None, 'slow_writes': None, 'write_seconds': None}
+    return {
+        'lock_errors': recorder.lock_errors,
+        'slow_writes': recorder.slow_writes,
+        'write_seconds': round(recorder.write_seconds, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generates synthetic teams, runs Round 1 and drives concurrent API clients to measure capacity.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--num_teams', type=int, default=10000)
+        parser.add_argument('--password', type=str, default='password123')
+        parser.add_argument('--batch_size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated load-test data first.')
+        parser.add_argument('--skip_generate', action='store_true')
+        parser.add_argument('--games_per_team', type=int, default=1, help='Round 1 games per team, 0 to skip Round 1.')
+        parser.add_argument(
+            '--eager',
+            action='store_true',
+            help='Run Celery tasks in-process instead of through the broker.'
+        )
+        parser.add_argument('--round_one_timeout', type=int, default=3600, help='Seconds to wait for queued matches to finish.')
+        parser.add_argument('--clients', type=int, default=16, help='Number of concurrent API clients.')
+        parser.add_argument('--requests', type=int, default=2000, help='Total API requests across all clients.')
+        parser.add_argument(
+            '--endpoints',
+            type=str,
+            default='leaderboard,match_list,test_match',
+            help=f"Comma separated subset of {', '.join(ENDPOINTS)}."
+        )
+        parser.add_argument(
+            '--base_url',
+            type=str,
+            default=None,
+            help='Drive a running server over HTTP (e.g. http://localhost:8000) instead of the in-process test client.'
+        )
+        parser.add_argument('--slow_write_ms', type=int, default=100)
+
+    def handle(self, *args, **options):
+        endpoints = [e.strip() for e in options['endpoints'].split(',') if e.strip()]
+        for endpoint in endpoints:
+            if endpoint not in ENDPOINTS:
+                raise CommandError(f"Unknown endpoint '{endpoint}'. Choose from {', '.join(ENDPOINTS)}.")
+
+        if options['eager']:
+            celery_app.conf.task_always_eager = True
+            celery_app.conf.task_eager_propagates = False
+
+        if options['clear']:
+            self.clear()
+
+        if not options['skip_generate']:
+            self.generate(options['num_teams'], options['password'], options['batch_size'])
+
+        report = {}
+
+        if options['games_per_team'] > 0:
+            report['round_one'] = self.run_round_one(
+                options['games_per_team'],
+                options['round_one_timeout'],
+                options['eager'],
+                options['slow_write_ms'] / 1000
+            )
+
+        if options['clients'] > 0 and options['requests'] > 0 and endpoints:
+            report['api'] = self.drive_clients(
+                endpoints,
+                options['clients'],
+                options['requests'],
+                options['base_url'],
+                options['slow_write_ms'] / 1000
+            )
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def clear(self):
+        with transaction.atomic():
+            teams = Team.objects.filter(name__startswith=TEAM_PREFIX)
+            Challenge.objects.filter(challenger_team__in=teams).delete()
+            LeaderboardScore.objects.filter(team__in=teams).delete()
+            Match.objects.filter(player1_submission__team__in=teams).delete()
+            BotSubmission.objects.filter(team__in=teams).delete()
+            teams.delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX, is_superuser=False).delete()
+        self.stdout.write('Load-test data cleared.')
+
+    def store_sample_bots(self):
+        blobs = []
+        for file_name in sorted(os.listdir(SAMPLE_BOTS)):
+            if not file_name.endswith('.py'):
+                continue
+            with open(os.path.join(SAMPLE_BOTS, file_name), 'rb') as f:
+                blobs.append(store_blob(f.read()))
+
+        if not blobs:
+            raise CommandError(f"No sample bots found in {SAMPLE_BOTS}.")
+        return blobs
+
+    def generate(self, num_teams, password, batch_size):
+        start = time.perf_counter()
+        existing = set(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('username', flat=True)
+        )
+        # Hashing is deliberately slow, every synthetic user shares the same hash.
+        password_hash = make_password(password)
+        bot_blobs = self.store_sample_bots()
+        now = timezone.now()
+
+        users_created = 0
+        pending = [i for i in range(1, num_teams + 1) if f'{USERNAME_PREFIX}{i}' not in existing]
+
+        for offset in range(0, len(pending), batch_size):
+            chunk = pending[offset:offset + batch_size]
+
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(
+                        username=f'{USERNAME_PREFIX}{i}',
+                        email=f'{USERNAME_PREFIX}{i}@example.com',
+                        password=password_hash,
+                        is_active=True,
+                    )
+                    for i in chunk
+                ])
+
+                # bulk_create skips Team.save(), so creator membership is added explicitly.
+                teams = Team.objects.bulk_create([
+                    Team(name=f'{TEAM_PREFIX}{i}', creator=user, created_at=now)
+                    for i, user in zip(chunk, users)
+                ])
+
+                Team.members.through.objects.bulk_create([
+                    Team.members.through(team_id=team.id, user_id=team.creator_id)
+                    for team in teams
+                ])
+
+                submissions = []
+                for team in teams:
+                    name, digest = random.choice(bot_blobs)
+                    submissions.append(BotSubmission(
+                        team=team,
+                        submitted_by_id=team.creator_id,
+                        code_file=name,
+                        code_digest=digest,
+                        is_active=True,
+                    ))
+                BotSubmission.objects.bulk_create(submissions)
+
+            users_created += len(chunk)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {users_created} users, teams and active submissions in {elapsed:.2f}s "
+            f"({len(existing)} already existed)."
+        ))
+
+    def run_round_one(self, games_per_team, timeout, eager, slow_write_seconds):
+        baseline = set(
+            Match.objects.filter(match_type=Match.MatchType.ROUND_ONE).values_list('id', flat=True)
+        )
+
+        # Eager tasks run on this thread's connection, real workers are out of reach.
+        recorder = LockWaitRecorder(slow_write_seconds) if eager else None
+        sampler = LockWaitSampler().start()
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder) if recorder else contextlib.nullcontext():
+            call_command('start_round_one', games_per_team=games_per_team, stdout=self.stdout, stderr=self.stderr)
+
+        new_matches = Match.objects.filter(match_type=Match.MatchType.ROUND_ONE).exclude(id__in=baseline)
+        total = new_matches.count()
+        unfinished = [Match.MatchStatus.PENDING, Match.MatchStatus.RUNNING]
+
+        while new_matches.filter(status__in=unfinished).exists():
+            if time.perf_counter() - start > timeout:
+                self.stderr.write(self.style.WARNING(f"Round 1 did not finish within {timeout}s."))
+                break
+            time.sleep(1)
+
+        elapsed = time.perf_counter() - start
+        completed = new_matches.filter(status=Match.MatchStatus.COMPLETED).count()
+        errored = new_matches.filter(status=Match.MatchStatus.ERROR).count()
+
+        return {
+            'matches_created': total,
+            'matches_completed': completed,
+            'matches_errored': errored,
+            'elapsed_seconds': round(elapsed, 3),
+            'matches_per_second': round(completed / elapsed, 3) if elapsed else 0.0,
+            'db': {
+                'vendor': connection.vendor,
+                **recorder_report(recorder),
+                'lock_waiters': sampler.report(),
+            },
+        }
+
+    def drive_clients(self, endpoints, num_clients, num_requests, base_url, slow_write_seconds):
+        users = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('?')[:num_clients]
+        )
+        if not users:
+            raise CommandError('No load-test users found. Run without --skip_generate first.')
+
+        latencies = {endpoint: [] for endpoint in endpoints}
+        statuses = {endpoint: {} for endpoint in endpoints}
+        # Over HTTP the statements run in the server's process, not on these connections.
+        recorder = None if base_url else LockWaitRecorder(slow_write_seconds)
+        sampler = LockWaitSampler().start()
+        results_lock = threading.Lock()
+        counter = iter(range(num_requests))
+        counter_lock = threading.Lock()
+
+        def next_request():
+            with counter_lock:
+                return next(counter, None)
+
+        def worker(user):
+            send = self.http_sender(user, base_url) if base_url else self.client_sender(user)
+            try:
+                with connection.execute_wrapper(recorder) if recorder else contextlib.nullcontext():
+                    while next_request() is not None:
+                        endpoint = random.choice(endpoints)
+                        method, path = ENDPOINTS[endpoint]
+
+                        start = time.perf_counter()
+                        try:
+                            status_code = send(method, path)
+                        except Exception as e:
+                            status_code = type(e).__name__
+                        elapsed = time.perf_counter() - start
+
+                        with results_lock:
+                            latencies[endpoint].append(elapsed)
+                            statuses[endpoint][str(status_code)] = statuses[endpoint].get(str(status_code), 0) + 1
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(users[i % len(users)],)) for i in range(num_clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        report = {
+            'clients': num_clients,
+            'requests': sum(len(v) for v in latencies.values()),
+            'elapsed_seconds': round(elapsed, 3),
+            'requests_per_second': round(sum(len(v) for v in latencies.values()) / elapsed, 3) if elapsed else 0.0,
+            'endpoints': {},
+            'db': {
+                'vendor': connection.vendor,
+                **recorder_report(recorder),
+                'lock_waiters': sampler.report(),
+            },
+        }
+
+        for endpoint, values in latencies.items():
+            report['endpoints'][endpoint] = {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50) * 1000, 2),
+                'p99_ms': round(percentile(values, 99) * 1000, 2),
+                'mean_ms': round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+                'statuses': statuses[endpoint],
+            }
+
+        return report
+
+    def client_sender(self, user):
+        from rest_framework.test import APIClient
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user=user)
+
+        def send(method, path):
+            if method == 'POST':
+                return client.post(path).status_code
+            return client.get(path).status_code
+
+        return send
+
+    def http_sender(self, user, base_url):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        token = str(RefreshToken.for_user(user).access_token)
+
+        def send(method, path):
+            request = urllib.request.Request(
+                base_url.rstrip('/') + path,
+                method=method,
+                data=b'' if method == 'POST' else None,
+                headers={'Authorization': f'Bearer {token}'}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        return send
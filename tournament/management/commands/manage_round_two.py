@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.db.models import Q
-from tournament.models import Match, LeaderboardScore
-from tournament.tasks import process_match_task
+from tournament.models import Match, LeaderboardScore, BracketNode
+from tournament.tasks import dispatch_match
+from tournament.bracket import set_bracket_node
 
 class Command(BaseCommand):
     help = 'Manages round 2 progression'
@@ -93,13 +94,22 @@ class Command(BaseCommand):
                     f"Expected {previous_stage_size / 2} completed matches, found {completed_matches_previous_stage.count()}."
                 )
 
+            previous_nodes = {
+                node.match_id: node for node in BracketNode.objects.filter(stage=previous_stage_size)
+            }
+
             for match_obj in completed_matches_previous_stage:
                 if match_obj.winning_team:
                     active_submission = match_obj.winning_team.submissions.filter(is_active=True).first()
                     if active_submission:
                         lb_entry = LeaderboardScore.objects.filter(team=match_obj.winning_team).first()
                         seed_score = lb_entry.score if lb_entry else 0
-                        qualifying_teams_data.append({'team': match_obj.winning_team, 'submission': active_submission, 'seed_score': seed_score})
+                        qualifying_teams_data.append({
+                            'team': match_obj.winning_team,
+                            'submission': active_submission,
+                            'seed_score': seed_score,
+                            'feeder': previous_nodes.get(match_obj.id)
+                        })
                     else:
                         self.stderr.write(self.style.ERROR(f"Team {match_obj.winning_team.name} won their previous match but now has no active bot. They cannot advance."))
                 else:
@@ -161,11 +171,10 @@ class Command(BaseCommand):
                     is_player2_system_bot=False,
                     status=Match.MatchStatus.PENDING
                 )
-
-                id_hex_for_this_iteration = match.id.hex
+                set_bracket_node(match, i, team1_data.get('feeder'), team2_data.get('feeder'))
 
                 transaction.on_commit(
-                    lambda captured_hex=id_hex_for_this_iteration: process_match_task.delay(captured_hex)
+                    lambda captured_id=match.id: dispatch_match(captured_id)
                 )
                 matches_created_count += 1
                 self.stdout.write(self.style.SUCCESS(
@@ -4,13 +4,12 @@ from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.conf import settings
-from django.core.files import File
 
 from tournament.models import Team, BotSubmission, Match, LeaderboardScore, Challenge
 
 User = get_user_model()
 
-SAMPLE_BOTS = os.path.join(settings.BASE_DIR, 'tests')
+SAMPLE_BOTS = os.path.join(settings.BASE_DIR, 'test_bots')
 
 class Command(BaseCommand):
 
@@ -87,8 +86,8 @@ class Command(BaseCommand):
                     submission = BotSubmission(team=team, submitted_by=user, is_active=True)
 
                     with open(bot_script_path, 'rb') as f:
-                        file = File(f, name=os.path.basename(bot_script_path))
-                        submission.code_file.save(file.name, file, save=True)
+                        submission.store_code(f.read())
+                    submission.save()
 
                     created_submissions_count += 1
                 except Exception as e:
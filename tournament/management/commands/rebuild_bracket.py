@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from tournament.bracket import rebuild_bracket
+
+class Command(BaseCommand):
+    help = 'Builds the Round 2 bracket tree from existing Round 2 matches.'
+
+    def handle(self, *args, **options):
+        nodes = rebuild_bracket()
+        self.stdout.write(self.style.SUCCESS(f"Bracket rebuilt with {nodes} nodes."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from tournament.models import BotSubmission
+from tournament.tasks import refresh_win_matrix_task
+
+class Command(BaseCommand):
+    help = 'Queues games for every pair of active submissions to rebuild the win-rate matrix.'
+
+    def handle(self, *args, **options):
+        submission_ids = list(
+            BotSubmission.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+        )
+
+        # Each submission only refreshes against the ones after it, so every pair is played once.
+        queued = 0
+        for i, submission_id in enumerate(submission_ids[:-1]):
+            opponent_ids = [opponent.hex for opponent in submission_ids[i + 1:]]
+            refresh_win_matrix_task.delay(submission_id.hex, opponent_ids)
+            queued += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Queued win matrix refreshes for {queued} submissions."))
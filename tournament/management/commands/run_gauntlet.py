@@ -0,0 +1,63 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from tournament.models import BotSubmission, Gauntlet
+from tournament.tasks import run_gauntlet_task
+
+class Command(BaseCommand):
+    help = 'Runs a submission against every other active submission and the system bot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--submission',
+            type=str,
+            required=True,
+            help='Id of the submission to run through the gauntlet.'
+        )
+        parser.add_argument(
+            '--games_per_opponent',
+            type=int,
+            default=1
+        )
+        parser.add_argument(
+            '--wait',
+            action='store_true',
+            help='Wait for the gauntlet to finish and print its report.'
+        )
+        parser.add_argument('--timeout', type=int, default=3600)
+
+    def handle(self, *args, **options):
+        if options['games_per_opponent'] <= 0:
+            raise CommandError('Number of games must be positive.')
+
+        try:
+            submission = BotSubmission.objects.get(id=options['submission'])
+        except (BotSubmission.DoesNotExist, ValueError):
+            raise CommandError(f"Submission {options['submission']} not found.")
+
+        gauntlet = Gauntlet.objects.create(
+            submission=submission,
+            games_per_opponent=options['games_per_opponent']
+        )
+        run_gauntlet_task.delay(gauntlet.id.hex)
+
+        self.stdout.write(self.style.SUCCESS(f"Queued gauntlet {gauntlet.id.hex} for {submission.team.name}."))
+
+        if not options['wait']:
+            return
+
+        start = time.monotonic()
+        finished = [Gauntlet.GauntletStatus.COMPLETED, Gauntlet.GauntletStatus.ERROR]
+
+        while True:
+            gauntlet.refresh_from_db()
+            if gauntlet.status in finished:
+                break
+            if time.monotonic() - start > options['timeout']:
+                raise CommandError(f"Gauntlet did not finish within {options['timeout']}s.")
+            time.sleep(1)
+
+        if gauntlet.status == Gauntlet.GauntletStatus.ERROR:
+            raise CommandError(f"Gauntlet {gauntlet.id.hex} failed.")
+
+        self.stdout.write(json.dumps(gauntlet.report, indent=2))
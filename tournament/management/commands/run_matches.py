@@ -0,0 +1,30 @@
+import asyncio
+from django.core.management.base import BaseCommand
+from tournament.match_runner import MatchRunner
+
+class Command(BaseCommand):
+    help = 'Runs pending matches from one process, supervising many engines with asyncio.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Matches played at once, defaults to MATCH_RUNNER_CONCURRENCY.'
+        )
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=None,
+            help='Finished matches saved per transaction, defaults to MATCH_RUNNER_BATCH_SIZE.'
+        )
+        parser.add_argument('--max_matches', type=int, default=None, help='Exit after starting this many matches.')
+        parser.add_argument('--exit_when_idle', action='store_true', help='Exit once no pending matches are left.')
+
+    def handle(self, *args, **options):
+        runner = MatchRunner(concurrency=options['concurrency'], batch_size=options['batch_size'])
+        results = asyncio.run(runner.run(max_matches=options['max_matches'], exit_when_idle=options['exit_when_idle']))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Started {results['started']} matches and saved {results['saved']} results."
+        ))
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from tournament.models import Team, Match
-from tournament.tasks import process_match_task
+from tournament.tasks import dispatch_match
 import time
 
 class Command(BaseCommand):
@@ -45,10 +45,8 @@ class Command(BaseCommand):
                         status=Match.MatchStatus.PENDING
                     )
 
-                    id_hex_for_this_iteration = match.id.hex
-
                     transaction.on_commit(
-                        lambda captured_id_hex=id_hex_for_this_iteration: process_match_task.delay(captured_id_hex)
+                        lambda captured_id=match.id: dispatch_match(captured_id)
                     )
                     
                     
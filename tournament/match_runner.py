@@ -0,0 +1,205 @@
+import asyncio
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Match
+from .engine_runner import run_engine_async
+from .leases import new_lease_holder, lease_expiry, claim_match
+from .metrics import MATCH_DURATION
+from .stats import MatchStatsAccumulator, StatsStream
+from .tasks import (
+    open_game_log, save_game_log, match_bot_paths,
+    apply_engine_result, apply_engine_timeout, fail_match, finish_match
+)
+
+# Runs many matches from one process instead of one per Celery worker. Engines
+# are asyncio subprocesses whose pipes are read by the event loop, at most
+# MATCH_RUNNER_CONCURRENCY at a time. Every database call goes through a single
+# executor thread: pending matches are claimed a batch at a time, the leases of
+# all running matches are renewed with one UPDATE, and finished matches are
+# saved MATCH_RUNNER_BATCH_SIZE to a transaction. Claims and releases are the
+# same conditional updates the Celery task uses, so both can run side by side.
+
+class MatchRunner:
+    def __init__(self, concurrency=None, batch_size=None, flush_seconds=None, poll_seconds=None):
+        self.concurrency = concurrency or settings.MATCH_RUNNER_CONCURRENCY
+        self.batch_size = batch_size or settings.MATCH_RUNNER_BATCH_SIZE
+        self.flush_seconds = flush_seconds or settings.MATCH_RUNNER_FLUSH_SECONDS
+        self.poll_seconds = poll_seconds or settings.MATCH_RUNNER_POLL_SECONDS
+        self.holder = new_lease_holder()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='match-runner-db')
+        self.running = {}
+        self.finished = []
+        self.started = 0
+        self.saved = 0
+
+    async def db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def claim_pending(self, limit):
+        close_old_connections()
+        # Other runners and workers race for the same rows, a few extra
+        # candidates make up for the claims that are lost.
+        candidates = list(
+            Match.objects.filter(status=Match.MatchStatus.PENDING, coalesced_into__isnull=True)
+            .order_by('created_at').values_list('id', flat=True)[:limit * 2]
+        )
+        claimed = []
+
+        for match_id in candidates:
+            if len(claimed) == limit:
+                break
+            if not claim_match(match_id, self.holder):
+                continue
+
+            # Teams are joined so the event loop never has to query for them.
+            match = Match.objects.select_related('player1_submission__team', 'player2_submission__team').get(id=match_id)
+            try:
+                bot_paths, error = match_bot_paths(match)
+            except Exception as e:
+                bot_paths, error = None, f"Error: could not fetch bots: {e}"
+
+            if error:
+                print(f"Match {match_id.hex}: {error}")
+                fail_match(match, self.holder)
+                continue
+
+            print(f"Processing match {match_id.hex}...")
+            match.status = Match.MatchStatus.RUNNING
+            claimed.append((match, bot_paths))
+
+        return claimed
+
+    def renew_leases(self, match_ids):
+        return Match.objects.filter(
+            id__in=match_ids,
+            status=Match.MatchStatus.RUNNING,
+            lease_holder=self.holder
+        ).update(lease_expires_at=lease_expiry())
+
+    def save_results(self, batch):
+        close_old_connections()
+        with transaction.atomic():
+            for match, outcome, log_stream, log_buffer in batch:
+                try:
+                    if outcome is not None and log_stream.tell() > 0:
+                        save_game_log(match, log_stream, log_buffer)
+                    with transaction.atomic():
+                        finish_match(match, self.holder, outcome)
+                except Exception as e:
+                    # The lease runs out and the reaper hands the match back.
+                    print(f"Match {match.id.hex}: could not save the result: {e}")
+                finally:
+                    log_stream.close()
+                    log_buffer.close()
+
+    async def play(self, match, bot_paths):
+        log_stream, log_buffer = open_game_log()
+        stats = MatchStatsAccumulator(settings.ENGINE_MAX_POINT_TICKS)
+        outcome = None
+        engine_started = time.perf_counter()
+
+        try:
+            data, engine_stderr_capture = await run_engine_async(*bot_paths, StatsStream(log_stream, stats))
+            MATCH_DURATION.labels(Match.MatchType(match.match_type).name.lower()).observe(time.perf_counter() - engine_started)
+
+            if engine_stderr_capture:
+                print(f"Match {match.id.hex}: Engine STDERR:\n{engine_stderr_capture}")
+
+            outcome = apply_engine_result(match, data, stats)
+        except subprocess.TimeoutExpired:
+            outcome = apply_engine_timeout(match)
+        except Exception as e:
+            print(f"An unexpected error occurred while processing match {match.id.hex}: {e}")
+            match.status = Match.MatchStatus.ERROR
+        finally:
+            self.slots.release()
+
+        self.finished.append((match, outcome, log_stream, log_buffer))
+        if len(self.finished) >= self.batch_size:
+            self.flush_due.set()
+
+    async def flush(self):
+        if not self.finished:
+            return
+        batch, self.finished = self.finished, []
+        await self.db(self.save_results, batch)
+        self.saved += len(batch)
+
+    async def flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_due.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_due.clear()
+            await self.flush()
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(settings.MATCH_LEASE_HEARTBEAT_SECONDS)
+            # Matches waiting for the next flush still hold their lease.
+            match_ids = list(self.running) + [match.id for match, *_ in self.finished]
+            if match_ids:
+                await self.db(self.renew_leases, match_ids)
+
+    async def acquire_slots(self, limit):
+        # Waits for one free slot, then takes whatever else is free right now.
+        await self.slots.acquire()
+        acquired = 1
+        while acquired < limit and not self.slots.locked():
+            await self.slots.acquire()
+            acquired += 1
+        return acquired
+
+    async def run(self, max_matches=None, exit_when_idle=False):
+        self.slots = asyncio.BoundedSemaphore(self.concurrency)
+        self.flush_due = asyncio.Event()
+        self.stopping = asyncio.Event()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        background = [asyncio.create_task(self.flusher()), asyncio.create_task(self.heartbeat())]
+
+        try:
+            while not self.stopping.is_set():
+                limit = self.concurrency if max_matches is None else max_matches - self.started
+                if limit <= 0:
+                    break
+
+                wanted = await self.acquire_slots(limit)
+                claimed = await self.db(self.claim_pending, wanted)
+                for _ in range(wanted - len(claimed)):
+                    self.slots.release()
+
+                for match, bot_paths in claimed:
+                    task = asyncio.create_task(self.play(match, bot_paths))
+                    self.running[match.id] = task
+                    task.add_done_callback(lambda _, match_id=match.id: self.running.pop(match_id, None))
+                self.started += len(claimed)
+
+                if not claimed:
+                    if exit_when_idle and not self.running:
+                        break
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            # Matches already running are played out and saved before exiting.
+            if self.running:
+                await asyncio.gather(*self.running.values(), return_exceptions=True)
+            for task in background:
+                task.cancel()
+            await self.flush()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
+            self.executor.shutdown()
+
+        return {'started': self.started, 'saved': self.saved}
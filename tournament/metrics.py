@@ -0,0 +1,121 @@
+import contextlib
+import os
+import time
+from django.db import connections
+from django.db.models import Count
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from .admission import match_queue_depth
+from .models import Match
+
+# Web and Celery processes each record into their own files under
+# PROMETHEUS_MULTIPROC_DIR when it is set, and /metrics merges them. Gauges are
+# read from Redis and the database at scrape time instead, so they are the same
+# whichever process serves the scrape.
+
+MATCH_DURATION = Histogram(
+    'prog_battle_match_duration_seconds',
+    'Wall time of one engine run.',
+    ['match_type'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10)
+)
+ENGINE_STARTUP = Histogram(
+    'prog_battle_engine_startup_seconds',
+    'Time from starting engine.py to its first log frame, bots included.',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+MATCH_OUTCOMES = Counter(
+    'prog_battle_match_outcomes_total',
+    'Finished matches by winner.',
+    ['match_type', 'outcome']
+)
+MATCH_STATUSES = Counter(
+    'prog_battle_match_statuses_total',
+    'Matches leaving a worker, by final status.',
+    ['match_type', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'prog_battle_request_duration_seconds',
+    'API request latency.',
+    ['view', 'method', 'status']
+)
+REQUEST_QUERIES = Histogram(
+    'prog_battle_request_db_queries',
+    'Database queries made by one API request.',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250)
+)
+
+def record_match(match, outcome=None):
+    match_type = Match.MatchType(match.match_type).name.lower()
+    MATCH_STATUSES.labels(match_type, Match.MatchStatus(match.status).name.lower()).inc()
+    if outcome:
+        MATCH_OUTCOMES.labels(match_type, outcome).inc()
+
+class LiveMatchCollector:
+    def collect(self):
+        depth = GaugeMetricFamily('prog_battle_match_queue_depth', 'Tasks waiting on the match queue.')
+        queue_depth = match_queue_depth()
+        if queue_depth is not None:
+            depth.add_metric([], queue_depth)
+        yield depth
+
+        running = GaugeMetricFamily('prog_battle_running_matches', 'Matches currently RUNNING.', labels=['match_type'])
+        counts = dict(
+            Match.objects.filter(status=Match.MatchStatus.RUNNING).values_list('match_type').annotate(count=Count('id'))
+        )
+        for match_type in Match.MatchType:
+            running.add_metric([match_type.name.lower()], counts.get(match_type.value, 0))
+        yield running
+
+def metrics_view(request):
+    registry = CollectorRegistry()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    registry.register(LiveMatchCollector())
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+
+        with contextlib.ExitStack() as wrappers:
+            # Replicas included, reads may not go to the primary.
+            for alias in connections:
+                wrappers.enter_context(connections[alias].execute_wrapper(queries))
+            response = self.get_response(request)
+
+        # Labelled by view name rather than path, so ids in URLs do not
+        # create a new series per object.
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if view != 'metrics':
+            REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(time.perf_counter() - start)
+            REQUEST_QUERIES.labels(view).observe(queries.count)
+
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='coalesced_into',
+            field=models.ForeignKey(blank=True, help_text='Pending test match whose result this match shares instead of being run itself.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coalesced_matches', to='tournament.match'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0002_match_coalesced_into'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PairwiseRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('a_wins', models.PositiveIntegerField(default=0)),
+                ('b_wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('submission_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairwise_as_a', to='tournament.botsubmission')),
+                ('submission_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairwise_as_b', to='tournament.botsubmission')),
+            ],
+            options={
+                'unique_together': {('submission_a', 'submission_b')},
+            },
+        ),
+    ]
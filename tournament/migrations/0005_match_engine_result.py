@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0004_gauntlet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='engine_result',
+            field=models.JSONField(blank=True, help_text='Tick count, tick budget, end reason and tie-break reported by engine.py.', null=True),
+        ),
+    ]
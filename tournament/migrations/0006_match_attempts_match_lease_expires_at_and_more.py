@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0005_match_engine_result'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Times a worker has claimed the match.'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='lease_holder',
+            field=models.CharField(blank=True, default='', help_text='Worker currently running the match.', max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0006_match_attempts_match_lease_expires_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsubmission',
+            name='code_digest',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='sha256 of the bot code, names its blob.', max_length=64),
+        ),
+    ]
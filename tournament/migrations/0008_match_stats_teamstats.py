@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0007_botsubmission_code_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='stats',
+            field=models.JSONField(blank=True, help_text='Rally, hit, movement and ball position summary, see tournament/stats.py.', null=True),
+        ),
+        migrations.CreateModel(
+            name='TeamStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('ticks', models.PositiveBigIntegerField(default=0)),
+                ('rallies', models.PositiveIntegerField(default=0)),
+                ('longest_rally', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('misses', models.PositiveIntegerField(default=0)),
+                ('opponent_misses', models.PositiveIntegerField(default=0)),
+                ('paddle_travel', models.PositiveBigIntegerField(default=0)),
+                ('actions', models.JSONField(default=dict)),
+                ('heatmap', models.JSONField(default=list, help_text="Ball positions binned into a small grid, the team's own baseline last.")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='tournament.team')),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:44
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0008_match_stats_teamstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='team_name_lower_idx'),
+        ),
+    ]
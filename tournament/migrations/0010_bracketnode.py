@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0009_team_team_name_lower_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BracketNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.PositiveIntegerField(help_text='Teams in the stage, 2 is the final.')),
+                ('position', models.PositiveIntegerField(help_text='Order of the pairing within its stage.')),
+                ('team1_name', models.CharField(blank=True, default='', max_length=100)),
+                ('team2_name', models.CharField(blank=True, default='', max_length=100)),
+                ('team1_score', models.IntegerField(blank=True, null=True)),
+                ('team2_score', models.IntegerField(blank=True, null=True)),
+                ('winner', models.PositiveSmallIntegerField(blank=True, help_text='1 or 2 once the match has a winner.', null=True)),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('C', 'Completed'), ('E', 'Error')], default='P', max_length=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('feeder1', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tournament.bracketnode')),
+                ('feeder2', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tournament.bracketnode')),
+                ('match', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bracket_node', to='tournament.match')),
+                ('team1', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tournament.team')),
+                ('team2', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tournament.team')),
+            ],
+            options={
+                'ordering': ['-stage', 'position'],
+                'unique_together': {('stage', 'position')},
+            },
+        ),
+    ]
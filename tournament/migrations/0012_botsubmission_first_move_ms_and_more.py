@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0011_match_match_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botsubmission',
+            name='first_move_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='botsubmission',
+            name='import_time_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='botsubmission',
+            name='peak_memory_kb',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='botsubmission',
+            name='startup_warnings',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
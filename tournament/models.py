@@ -1,8 +1,11 @@
 from django.db import models 
+from django.db.models.functions import Lower
 from django.conf import settings
 from django.core.exceptions import ValidationError
 import uuid
 
+from .artifacts import store_blob
+
 User = settings.AUTH_USER_MODEL
 
 class Team(models.Model):
@@ -17,6 +20,9 @@ class Team(models.Model):
     members = models.ManyToManyField(User, related_name='members_of_team', blank=True, help_text='Members of the team.')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Serves case-insensitive prefix search as a range scan, see tournament/search.py.
+        indexes = [models.Index(Lower('name'), name='team_name_lower_idx')]
 
     def __str__(self):
         return self.name
@@ -42,17 +48,32 @@ class BotSubmission(models.Model):
     team = models.ForeignKey(Team, related_name='submissions', on_delete=models.CASCADE)
     submitted_by = models.ForeignKey(User, related_name='bot_submissions', on_delete=models.CASCADE)
     code_file = models.FileField(upload_to='bot_scripts/', help_text="The .py file for the bot.")
+    code_digest = models.CharField(max_length=64, blank=True, default='', db_index=True, help_text="sha256 of the bot code, names its blob.")
     submitted_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=False, help_text="Is this the bot currently active?")
     plagiarism_flagged = models.BooleanField(default=False)
+    # Measured by the startup probe when the code was submitted, see tournament/probe.py.
+    import_time_ms = models.FloatField(null=True, blank=True)
+    first_move_ms = models.FloatField(null=True, blank=True)
+    peak_memory_kb = models.PositiveIntegerField(null=True, blank=True)
+    startup_warnings = models.JSONField(default=list, blank=True)
 
     def __str__(self):
         return f"{self.team.name} - Bot Submission {self.id} ({'Active' if self.is_active else 'Inactive'})"
 
+    def store_code(self, data):
+        name, self.code_digest = store_blob(data)
+        self.code_file = name
+
     def save(self, *args, **kwargs):
         if self.is_active:
             BotSubmission.objects.filter(team=self.team).exclude(pk=self.pk).update(is_active=False)
 
+        # New uploads go to the blob store instead of upload_to.
+        if self.code_file and not self.code_file._committed:
+            self.code_file.seek(0)
+            self.store_code(self.code_file.read())
+
         super().save(*args, **kwargs)
 
 class Match(models.Model):
@@ -89,12 +110,31 @@ class Match(models.Model):
     winning_team = models.ForeignKey(Team, related_name='matches_won', on_delete=models.SET_NULL, null=True, blank=True)
     
     game_log = models.FileField(upload_to='game_logs/', null=True, blank=True, help_text="CSV log file from engine.py.")
+    engine_result = models.JSONField(null=True, blank=True, help_text="Tick count, tick budget, end reason and tie-break reported by engine.py.")
+    stats = models.JSONField(null=True, blank=True, help_text="Rally, hit, movement and ball position summary, see tournament/stats.py.")
 
     round_stage = models.PositiveIntegerField(
         null=True,
         blank=True
     )
 
+    coalesced_into = models.ForeignKey(
+        'self',
+        related_name='coalesced_matches',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="Pending test match whose result this match shares instead of being run itself."
+    )
+
+    lease_holder = models.CharField(max_length=255, blank=True, default='', help_text="Worker currently running the match.")
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0, help_text="Times a worker has claimed the match.")
+
+    class Meta:
+        # The asyncio runner polls for the oldest pending matches, see tournament/match_runner.py.
+        indexes = [models.Index(fields=['status', 'created_at'], name='match_status_created_idx')]
+
     def __str__(self):
         p1_name = self.player1_submission.team.name if self.player1_submission else "Player 1 N/A"
         p2_name = ""
@@ -136,6 +176,34 @@ class Match(models.Model):
 
         super().save(*args, **kwargs)
 
+class BracketNode(models.Model):
+    # One node per Round 2 pairing, linked to the nodes its two teams won. Names,
+    # scores and the winner are copied over as the match finishes so the bracket
+    # is served from this table alone, see tournament/bracket.py.
+    stage = models.PositiveIntegerField(help_text="Teams in the stage, 2 is the final.")
+    position = models.PositiveIntegerField(help_text="Order of the pairing within its stage.")
+    match = models.OneToOneField(Match, related_name='bracket_node', on_delete=models.SET_NULL, null=True, blank=True)
+
+    feeder1 = models.ForeignKey('self', related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    feeder2 = models.ForeignKey('self', related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+
+    team1 = models.ForeignKey(Team, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    team2 = models.ForeignKey(Team, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    team1_name = models.CharField(max_length=100, blank=True, default='')
+    team2_name = models.CharField(max_length=100, blank=True, default='')
+    team1_score = models.IntegerField(null=True, blank=True)
+    team2_score = models.IntegerField(null=True, blank=True)
+    winner = models.PositiveSmallIntegerField(null=True, blank=True, help_text="1 or 2 once the match has a winner.")
+    status = models.CharField(max_length=1, choices=Match.MatchStatus.choices, default=Match.MatchStatus.PENDING)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-stage', 'position']
+        unique_together = ('stage', 'position')
+
+    def __str__(self):
+        return f"Top {self.stage} #{self.position}: {self.team1_name} vs {self.team2_name}"
+
 class LeaderboardScore(models.Model):
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='leaderboard_entries')
     score = models.IntegerField(default=0, help_text="Overall score for leaderboard, calculated based on match results.")
@@ -152,6 +220,25 @@ class LeaderboardScore(models.Model):
         return f"{self.team.name} - Score: {self.score}"
 
 
+class TeamStats(models.Model):
+    # Running totals over every completed match a team has played, updated
+    # from Match.stats as each match finishes.
+    team = models.OneToOneField(Team, on_delete=models.CASCADE, related_name='stats')
+    matches = models.PositiveIntegerField(default=0)
+    ticks = models.PositiveBigIntegerField(default=0)
+    rallies = models.PositiveIntegerField(default=0)
+    longest_rally = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    misses = models.PositiveIntegerField(default=0)
+    opponent_misses = models.PositiveIntegerField(default=0)
+    paddle_travel = models.PositiveBigIntegerField(default=0)
+    actions = models.JSONField(default=dict)
+    heatmap = models.JSONField(default=list, help_text="Ball positions binned into a small grid, the team's own baseline last.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.team.name} - Stats over {self.matches} matches"
+
 class Challenge(models.Model):
     id = models.UUIDField(
         primary_key=True,
@@ -180,3 +267,59 @@ class Challenge(models.Model):
     def clean(self):
         if self.challenger_team == self.challenged_team:
             raise ValidationError("A team cannot challenge itself.")
+
+
+class PairwiseRecord(models.Model):
+    # One row per unordered pair of submissions, submission_a always has the
+    # smaller id so each pair is stored once.
+    submission_a = models.ForeignKey(BotSubmission, related_name='pairwise_as_a', on_delete=models.CASCADE)
+    submission_b = models.ForeignKey(BotSubmission, related_name='pairwise_as_b', on_delete=models.CASCADE)
+    a_wins = models.PositiveIntegerField(default=0)
+    b_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('submission_a', 'submission_b')
+
+    def __str__(self):
+        return f"Pairwise {self.submission_a_id} vs {self.submission_b_id}: {self.a_wins}-{self.b_wins}-{self.draws}"
+
+    @property
+    def games(self):
+        return self.a_wins + self.b_wins + self.draws
+
+    def win_probability(self, submission_id):
+        if not self.games:
+            return None
+        wins = self.a_wins if submission_id == self.submission_a_id else self.b_wins
+        return (wins + 0.5 * self.draws) / self.games
+
+    @staticmethod
+    def ordered(submission_id_1, submission_id_2):
+        return tuple(sorted([submission_id_1, submission_id_2], key=str))
+
+
+class Gauntlet(models.Model):
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+
+    class GauntletStatus(models.TextChoices):
+        PENDING = 'P', 'Pending'
+        RUNNING = 'R', 'Running'
+        COMPLETED = 'C', 'Completed'
+        ERROR = 'E', 'Error'
+
+    submission = models.ForeignKey(BotSubmission, related_name='gauntlets', on_delete=models.CASCADE)
+    requested_by = models.ForeignKey(User, related_name='gauntlets', on_delete=models.SET_NULL, null=True, blank=True)
+    games_per_opponent = models.PositiveIntegerField(default=1)
+    status = models.CharField(max_length=1, choices=GauntletStatus.choices, default=GauntletStatus.PENDING)
+    report = models.JSONField(null=True, blank=True, help_text="Aggregated results against every opponent.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Gauntlet {self.id} for {self.submission_id} ({self.get_status_display()})"
@@ -0,0 +1,132 @@
+import json
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+from django.conf import settings
+
+from engine_zygote import apply_rlimits
+from .engine_runner import ENGINE_PATH
+
+# Every new bot is run once through engine.py --probe before it is accepted. A
+# bot that imports something heavy at module level pays for it inside the
+# engine timeout of every match it plays, so submissions over the startup
+# budgets are refused (or warned about) up front. Peak memory is reported by
+# the probe itself, the fork from the web worker would otherwise count the
+# worker's own memory against the bot. It runs untrusted code on the web
+# host, so it gets BOT_PROBE_RLIMITS and its own session, and the whole session
+# is killed on timeout.
+
+ACTIONS = ('left', 'right', 'stay')
+READER_GRACE_SECONDS = 1
+
+def probe_code(data, timeout=None):
+    timeout = timeout or settings.BOT_PROBE_TIMEOUT_SECONDS
+
+    with tempfile.NamedTemporaryFile(suffix='.py') as bot_file:
+        bot_file.write(data)
+        bot_file.flush()
+
+        rlimits = settings.BOT_PROBE_RLIMITS
+        process = subprocess.Popen(
+            ['python3', ENGINE_PATH, '--probe', bot_file.name, '--isolation', settings.ENGINE_BOT_ISOLATION],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+            preexec_fn=lambda: apply_rlimits(rlimits)
+        )
+
+        output = {}
+
+        def drain(name, stream):
+            output[name] = stream.read()
+
+        readers = [
+            threading.Thread(target=drain, args=('stdout', process.stdout), daemon=True),
+            threading.Thread(target=drain, args=('stderr', process.stderr), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        timed_out = threading.Event()
+
+        def kill_session():
+            # Anything the bot started is in the same session, and the group
+            # id stays valid while any of it is alive.
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        def kill():
+            timed_out.set()
+            kill_session()
+
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        try:
+            process.wait()
+        finally:
+            timer.cancel()
+            kill_session()
+            for reader, stream in zip(readers, (process.stdout, process.stderr)):
+                # Only something that escaped the session can still hold the
+                # pipe, its reader is left behind rather than block the request.
+                reader.join(READER_GRACE_SECONDS)
+                if not reader.is_alive():
+                    stream.close()
+
+    result = {
+        'import_time_ms': None,
+        'first_move_ms': None,
+        'peak_memory_kb': None,
+        'move': None,
+        'error': None,
+    }
+
+    if timed_out.is_set():
+        result['error'] = f"Bot did not load and make a first move within {timeout} seconds."
+        return result
+
+    stdout_lines = output.get('stdout', '').strip().splitlines()
+    try:
+        probe = json.loads(stdout_lines[-1])
+    except (IndexError, ValueError):
+        stderr_lines = output.get('stderr', '').strip().splitlines()
+        result['error'] = f"Bot failed to load: {stderr_lines[-1] if stderr_lines else 'no output'}"
+        return result
+
+    result['import_time_ms'] = probe['import_ms']
+    result['first_move_ms'] = probe['first_move_ms']
+    result['move'] = probe['move']
+    result['peak_memory_kb'] = probe['peak_memory_kb']
+    return result
+
+def budget_problems(result):
+    if result['error']:
+        return [result['error']]
+
+    problems = []
+    if result['import_time_ms'] > settings.BOT_IMPORT_BUDGET_MS:
+        problems.append(
+            f"Loading the bot took {result['import_time_ms']:.0f}ms, over the {settings.BOT_IMPORT_BUDGET_MS}ms budget. "
+            "Move heavy imports out of module level or drop them."
+        )
+    if result['first_move_ms'] > settings.BOT_FIRST_MOVE_BUDGET_MS:
+        problems.append(
+            f"The first call to next_move took {result['first_move_ms']:.0f}ms, over the {settings.BOT_FIRST_MOVE_BUDGET_MS}ms budget."
+        )
+    if result['peak_memory_kb'] is not None and result['peak_memory_kb'] > settings.BOT_PEAK_MEMORY_BUDGET_KB:
+        problems.append(
+            f"The bot peaked at {result['peak_memory_kb'] // 1024}MB of memory, over the "
+            f"{settings.BOT_PEAK_MEMORY_BUDGET_KB // 1024}MB budget."
+        )
+    return problems
+
+def move_warning(result):
+    # Anything else is played as "stay", worth pointing out but not refusing.
+    if result['error'] or result['move'] in ACTIONS:
+        return None
+    return f"next_move returned {result['move']}, the engine plays anything but {', '.join(ACTIONS)} as stay."
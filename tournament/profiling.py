@@ -0,0 +1,152 @@
+import contextlib
+import contextvars
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework import serializers
+
+# Opt-in with PROFILING_ENABLED. Each request gets a RequestProfile that the
+# database wrapper and the serializer hook below add to, and the totals are
+# returned as a Server-Timing header. Slow requests are printed with their
+# queries grouped by fingerprint, so an N+1 shows up as one statement run
+# once per row.
+
+current_profile = contextvars.ContextVar('current_profile', default=None)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r"\bIN\s*\((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(sql):
+    sql = LITERALS.sub('?', sql)
+    sql = IN_LISTS.sub('IN (...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+class RequestProfile:
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.queries = Counter()
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries[fingerprint(sql)] += 1
+
+def timed_serializer_data(data_property):
+    def data(self):
+        profile = current_profile.get()
+        if profile is None:
+            return data_property.fget(self)
+
+        # Only the outermost serializer is timed, nested ones are part of it.
+        profile.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return data_property.fget(self)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_seconds += time.perf_counter() - start
+
+    data.profiled = True
+    return property(data)
+
+def install_serializer_hook():
+    # Serializer.data and ListSerializer.data both end in BaseSerializer.data.
+    if not getattr(serializers.BaseSerializer.data.fget, 'profiled', False):
+        serializers.BaseSerializer.data = timed_serializer_data(serializers.BaseSerializer.data)
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.cprofile_lock = threading.Lock()
+        install_serializer_hook()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+
+        try:
+            with contextlib.ExitStack() as wrappers:
+                # Replicas included, reads may not go to the primary.
+                for alias in connections:
+                    wrappers.enter_context(connections[alias].execute_wrapper(profile))
+                if self.should_sample(request.path):
+                    response = self.sample(request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+
+        total_seconds = time.perf_counter() - start
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.query_count} queries"',
+            f'ser;dur={profile.serializer_seconds * 1000:.1f}',
+            f'total;dur={total_seconds * 1000:.1f}',
+        ])
+
+        if total_seconds * 1000 >= settings.PROFILING_SLOW_REQUEST_MS:
+            self.log_slow_request(request, response, profile, total_seconds)
+
+        return response
+
+    def should_sample(self, path):
+        return (
+            any(path.startswith(prefix) for prefix in settings.PROFILING_SAMPLE_PATHS)
+            and random.random() < settings.PROFILING_SAMPLE_RATE
+        )
+
+    def sample(self, request):
+        # Only one request is profiled at a time, others run unprofiled.
+        if not self.cprofile_lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                return self.get_response(request)
+            finally:
+                profiler.disable()
+                self.dump_profile(request, profiler)
+        finally:
+            self.cprofile_lock.release()
+
+    def dump_profile(self, request, profiler):
+        os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+        name = f"{timezone.now():%Y%m%dT%H%M%S%f}_{request.method}_{slug}.prof"
+        path = os.path.join(settings.PROFILING_OUTPUT_DIR, name)
+        profiler.dump_stats(path)
+        print(f"Profiled {request.method} {request.path} to {path}")
+
+    def log_slow_request(self, request, response, profile, total_seconds):
+        print(
+            f"Slow request {request.method} {request.get_full_path()} -> {response.status_code}: "
+            f"{total_seconds * 1000:.0f}ms total, {profile.query_count} queries in {profile.db_seconds * 1000:.0f}ms, "
+            f"serializers {profile.serializer_seconds * 1000:.0f}ms"
+        )
+        for sql, count in profile.queries.most_common(settings.PROFILING_SLOW_REQUEST_TOP_QUERIES):
+            print(f"    {count}x {sql}")
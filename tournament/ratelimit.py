@@ -0,0 +1,81 @@
+import time
+import uuid
+import redis
+from .redis_client import get_redis
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+class RateLimitExceeded(Exception):
+    def __init__(self, name, limit, retry_after):
+        self.name = name
+        self.limit = limit
+        self.retry_after = retry_after
+        super().__init__(f"{name} limit of {limit} reached, retry after {retry_after}s.")
+
+class SlidingWindowRateLimiter:
+    # Each window is a sorted set of request timestamps. Trimming, adding and
+    # counting run in a single MULTI/EXEC, so concurrent requests can never both
+    # slip in under the limit, and rejected attempts are removed again so they
+    # do not count against the caller.
+    def __init__(self, scope, windows):
+        self.scope = scope
+        self.windows = windows  # [(name, limit, seconds), ...]
+
+    def key(self, identity, seconds):
+        return f"ratelimit:{self.scope}:{seconds}:{identity}"
+
+    def hit(self, identity):
+        now = time.time()
+        token = f"{now}:{uuid.uuid4().hex}"
+
+        try:
+            connection = get_redis()
+
+            pipe = connection.pipeline(transaction=True)
+            for name, limit, seconds in self.windows:
+                key = self.key(identity, seconds)
+                pipe.zremrangebyscore(key, 0, now - seconds)
+                pipe.zadd(key, {token: now})
+                pipe.zcard(key)
+                pipe.expire(key, seconds)
+            results = pipe.execute()
+        except redis.RedisError as e:
+            # Fail open, an unavailable limiter should not take submissions down with it.
+            print(f"Rate limiter '{self.scope}' unavailable: {e}")
+            return None
+
+        for index, (name, limit, seconds) in enumerate(self.windows):
+            count = results[index * 4 + 2]
+
+            if count > limit:
+                self.release(identity, token)
+                raise RateLimitExceeded(name, limit, self.retry_after(identity, limit, seconds, now))
+
+        return token
+
+    def release(self, identity, token):
+        try:
+            pipe = get_redis().pipeline(transaction=True)
+            for name, limit, seconds in self.windows:
+                pipe.zrem(self.key(identity, seconds), token)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"Rate limiter '{self.scope}' unavailable: {e}")
+
+    def retry_after(self, identity, limit, seconds, now):
+        key = self.key(identity, seconds)
+        try:
+            count = get_redis().zcard(key)
+
+            # A slot frees up once enough of the oldest requests fall out of the window.
+            blocking = get_redis().zrange(key, max(count - limit, 0), max(count - limit, 0), withscores=True)
+        except redis.RedisError as e:
+            # The limit was already found exceeded, only the wait is unknown.
+            print(f"Rate limiter '{self.scope}' unavailable: {e}")
+            return seconds
+        if not blocking:
+            return 1
+
+        _, oldest = blocking[0]
+        return max(1, int(oldest + seconds - now) + 1)
@@ -0,0 +1,18 @@
+import redis
+from django.conf import settings
+
+_connection = None
+
+def get_redis():
+    # One client per process, redis-py pools connections internally. Setting
+    # REDIS_URL to 'fakeredis://' swaps in an in-memory server for tests.
+    global _connection
+
+    if _connection is None:
+        if settings.REDIS_URL.startswith('fakeredis://'):
+            import fakeredis
+            _connection = fakeredis.FakeStrictRedis()
+        else:
+            _connection = redis.Redis.from_url(settings.REDIS_URL)
+
+    return _connection
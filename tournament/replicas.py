@@ -0,0 +1,141 @@
+import contextvars
+import hashlib
+import random
+import time
+import redis
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from .redis_client import get_redis
+
+# Read-only requests are answered from a replica in DATABASE_REPLICAS, while
+# workers, commands and every write stay on the primary. ReplicaMiddleware picks
+# a replica for GET/HEAD/OPTIONS requests and the router sends that request's
+# reads to it. A replica found more than REPLICA_STALENESS_SECONDS behind is
+# left out until it catches up.
+#
+# A client that has just written reads from the primary for the next
+# REPLICA_STALENESS_SECONDS, so it always sees its own writes (a test match it
+# just started, a bot it just uploaded). The pin is kept in Redis under a hash
+# of the client's Authorization header or session cookie, shared by every web
+# process.
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+current_replica = contextvars.ContextVar('current_replica', default=None)
+
+_replica_checks = {}
+
+def replica_lag(alias):
+    # Seconds behind the primary, None where the backend can't tell.
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        # A replica that has replayed everything it received is current, even
+        # if the primary hasn't written anything for a while.
+        cursor.execute(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+def replica_is_fresh(alias):
+    # Checked at most every REPLICA_LAG_CHECK_SECONDS per process.
+    now = time.monotonic()
+    checked_at, fresh = _replica_checks.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+        return fresh
+
+    try:
+        lag = replica_lag(alias)
+        fresh = lag is None or lag <= settings.REPLICA_STALENESS_SECONDS
+        if not fresh:
+            print(f"Replica '{alias}' is {lag:.1f}s behind, reading from the primary.")
+    except DatabaseError as e:
+        print(f"Replica '{alias}' unavailable: {e}")
+        fresh = False
+
+    _replica_checks[alias] = (now, fresh)
+    return fresh
+
+def choose_replica():
+    fresh = [alias for alias in settings.DATABASE_REPLICAS if replica_is_fresh(alias)]
+    return random.choice(fresh) if fresh else None
+
+def pin_key(request):
+    identity = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not identity:
+        return None
+    return f"replica_pin:{hashlib.sha256(identity.encode()).hexdigest()}"
+
+def pin_to_primary(request):
+    key = pin_key(request)
+    if key is None:
+        return
+    try:
+        get_redis().set(key, 1, ex=settings.REPLICA_STALENESS_SECONDS)
+    except redis.RedisError as e:
+        print(f"Replica pin unavailable: {e}")
+
+def is_pinned(request):
+    key = pin_key(request)
+    if key is None:
+        return False
+    try:
+        return bool(get_redis().exists(key))
+    except redis.RedisError as e:
+        # Without the pin a client could miss its own write, the primary is safe.
+        print(f"Replica pin unavailable: {e}")
+        return True
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = current_replica.get()
+        if alias is None:
+            return None
+
+        # Objects loaded from the primary keep reading their relations there.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        # Reads inside a transaction must see its writes.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        alias = None
+        if request.method in SAFE_METHODS and not is_pinned(request):
+            alias = choose_replica()
+
+        token = current_replica.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_replica.reset(token)
+
+        if request.method not in SAFE_METHODS:
+            pin_to_primary(request)
+        return response
+
@@ -0,0 +1,54 @@
+import sys
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Collate, Lower
+
+# Prefix search is written as a range on LOWER(name), 'ab' <= name < 'ac', so
+# it is answered from team_name_lower_idx without needing LIKE-friendly
+# operator classes. The range only holds in code point order: SQLite compares
+# bytes already, on PostgreSQL the comparison is made in the "C" collation
+# (see the README for its index). SQLite's LOWER() only folds ASCII, so the term
+# is folded the same way there. With TEAM_SEARCH_TRIGRAM on PostgreSQL, names
+# that merely resemble the term are matched too, ranked by similarity.
+
+def prefix_upper_bound(prefix):
+    # The smallest string above every string starting with prefix, None when
+    # there is none. Surrogates can't be sent to the database, so are skipped.
+    while prefix:
+        following = ord(prefix[-1]) + 1
+        if following <= sys.maxunicode:
+            if 0xD800 <= following <= 0xDFFF:
+                following = 0xE000
+            return prefix[:-1] + chr(following)
+        prefix = prefix[:-1]
+    return None
+
+def fold_case(term):
+    if connection.vendor == 'sqlite':
+        return ''.join(c.lower() if c.isascii() else c for c in term)
+    return term.lower()
+
+def search_teams(queryset, term):
+    name_lower = Lower('name')
+    if connection.vendor == 'postgresql':
+        name_lower = Collate(name_lower, 'C')
+    queryset = queryset.annotate(name_lower=name_lower)
+    term = fold_case((term or '').strip())
+
+    if not term:
+        return queryset.order_by('name_lower', 'id')
+
+    prefix = Q(name_lower__gte=term)
+    upper_bound = prefix_upper_bound(term)
+    if upper_bound is not None:
+        prefix &= Q(name_lower__lt=upper_bound)
+
+    if settings.TEAM_SEARCH_TRIGRAM and connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        return queryset.annotate(
+            similarity=TrigramWordSimilarity(term, 'name')
+        ).filter(prefix | Q(name__trigram_word_similar=term)).order_by('-similarity', 'name_lower', 'id')
+
+    return queryset.filter(prefix).order_by('name_lower', 'id')
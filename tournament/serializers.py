@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Team, BotSubmission, Match, LeaderboardScore, Challenge
+from .models import Team, BotSubmission, Match, LeaderboardScore, Challenge, Gauntlet, TeamStats
+from .probe import probe_code, budget_problems, move_warning
+from django.conf import settings
 from django.db.models import Q
-import os
-from django.core.files.base import ContentFile
 
 User = get_user_model()
 
@@ -127,10 +127,17 @@ class BotSubmissionSerializer(serializers.ModelSerializer):
             'code_text',
             'submitted_at',
             'is_active',
-            'plagiarism_flagged'
+            'plagiarism_flagged',
+            'import_time_ms',
+            'first_move_ms',
+            'peak_memory_kb',
+            'startup_warnings'
         )
 
-        read_only_fields = ('submitted_at', 'team','submitted_by')
+        read_only_fields = (
+            'submitted_at', 'team','submitted_by',
+            'import_time_ms', 'first_move_ms', 'peak_memory_kb', 'startup_warnings'
+        )
     
     def validate_code_file(self, value):
         if not value.name.endswith('.py'):
@@ -140,20 +147,53 @@ class BotSubmissionSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("File size cannot exceed 1MB.")
         
         return value
+
+    def probe_startup(self, data):
+        # A bot that cannot load is never accepted, budgets follow BOT_BUDGET_ACTION.
+        if not settings.BOT_PROBE_ENABLED:
+            return {}
+
+        result = probe_code(data)
+        problems = budget_problems(result)
+        if problems and (result['error'] or settings.BOT_BUDGET_ACTION == 'reject'):
+            raise serializers.ValidationError({'code_file': problems})
+
+        warning = move_warning(result)
+        return {
+            'import_time_ms': result['import_time_ms'],
+            'first_move_ms': result['first_move_ms'],
+            'peak_memory_kb': result['peak_memory_kb'],
+            'startup_warnings': problems + ([warning] if warning else []),
+        }
+
+    def create(self, validated_data):
+        validated_data.pop('code_text', None)
+
+        code_file = validated_data['code_file']
+        code_file.seek(0)
+        validated_data.update(self.probe_startup(code_file.read()))
+        code_file.seek(0)
+
+        return super().create(validated_data)
     
     def update(self, instance, validated_data):
         code_text = validated_data.pop('code_text', None)
+        code_file = validated_data.pop('code_file', None)
 
         instance.is_active = validated_data.get('is_active', instance.is_active)
 
-        if code_text is not None:
-            current_filename = os.path.basename(instance.code_file.name) if instance.code_file and instance.code_file.name else f"{instance.id.hex}.py"
-
-            if not current_filename.endswith('.py'):
-                base_fn, _ = os.path.splitext(current_filename)
-                current_filename = base_fn + '.py'
+        # New code is probed whichever way it arrives, an uploaded file wins.
+        code = None
+        if code_file is not None:
+            code_file.seek(0)
+            code = code_file.read()
+        elif code_text is not None:
+            code = code_text.encode('utf-8')
 
-            instance.code_file.save(current_filename, ContentFile(code_text.encode('utf-8')), save=False)
+        if code is not None:
+            for attr, value in self.probe_startup(code).items():
+                setattr(instance, attr, value)
+            instance.store_code(code)
 
 
         for attr, value in validated_data.items():
@@ -201,12 +241,16 @@ class MatchSerializer(serializers.ModelSerializer):
             'round_stage',
             'winning_team_details',
             'game_log_url', 
+            'coalesced_into',
+            'engine_result',
+            'stats',
         )
 
         read_only_fields = (
             'id', 'created_at', 'played_at', 'status', 'status_display',
             'player1_score', 'player2_score', 'winning_team', 'game_log',
-            'player1_team_name', 'player2_team_name', 'match_type_display'
+            'player1_team_name', 'player2_team_name', 'match_type_display',
+            'coalesced_into', 'engine_result', 'stats'
         )
     
     def get_player2_team_name(self, obj):
@@ -288,4 +332,65 @@ class ChallengeSerializer(serializers.ModelSerializer):
         if existing_challenge:
             raise serializers.ValidationError('An active challenge already exists between the two teams.')
         
-        return data
\ No newline at end of file
+        return data
+
+class GauntletSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    team_name = serializers.CharField(source='submission.team.name', read_only=True)
+    games_per_opponent = serializers.IntegerField(min_value=1, max_value=10, required=False)
+
+    class Meta:
+        model = Gauntlet
+        fields = (
+            'id',
+            'submission',
+            'team_name',
+            'games_per_opponent',
+            'status',
+            'status_display',
+            'report',
+            'created_at',
+            'completed_at',
+        )
+        read_only_fields = ('id', 'status', 'report', 'created_at', 'completed_at')
+
+    def validate_submission(self, value):
+        request = self.context.get('request')
+
+        if not request or not value.team.members.filter(pk=request.user.pk).exists():
+            raise serializers.ValidationError('You can only run a gauntlet for your own team\'s submissions.')
+
+        return value
+
+class TeamStatsSerializer(serializers.ModelSerializer):
+    team_name = serializers.CharField(source='team.name', read_only=True)
+    hit_rate = serializers.SerializerMethodField()
+    mean_rally = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TeamStats
+        fields = (
+            'team',
+            'team_name',
+            'matches',
+            'ticks',
+            'rallies',
+            'longest_rally',
+            'mean_rally',
+            'hits',
+            'misses',
+            'hit_rate',
+            'opponent_misses',
+            'paddle_travel',
+            'actions',
+            'heatmap',
+            'updated_at',
+        )
+        read_only_fields = fields
+
+    def get_hit_rate(self, obj):
+        attempts = obj.hits + obj.misses
+        return round(obj.hits / attempts, 4) if attempts else None
+
+    def get_mean_rally(self, obj):
+        return round(obj.ticks / obj.rallies, 2) if obj.rallies else None
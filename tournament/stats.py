@@ -0,0 +1,140 @@
+from django.db import transaction
+from django.utils import timezone
+
+from engine import GRID_SIZE, PADDLE_WIDTH
+from .models import TeamStats
+
+# Summary statistics built from the engine's CSV frames as they stream past on
+# their way into the game log, so nothing has to re-read the log afterwards.
+# Player 1 defends row GRID_SIZE - 1, player 2 defends row 0, and a row shows
+# the ball before that tick's hit or miss is resolved.
+
+HEATMAP_BINS = 6
+ACTIONS = ('left', 'right', 'stay')
+PADDLE_START = GRID_SIZE // 2 - 1
+
+def heatmap_bin(position):
+    return min(position * HEATMAP_BINS // GRID_SIZE, HEATMAP_BINS - 1)
+
+class MatchStatsAccumulator:
+    def __init__(self, max_point_ticks=None):
+        self.max_point_ticks = max_point_ticks
+        self.ticks = 0
+        self.rally_lengths = []
+        self.dead_rallies = 0
+        self.hits = [0, 0]
+        self.misses = [0, 0]
+        self.paddle_travel = [0, 0]
+        self.actions = [dict.fromkeys(ACTIONS, 0), dict.fromkeys(ACTIONS, 0)]
+        self.heatmap = [[0] * HEATMAP_BINS for _ in range(HEATMAP_BINS)]
+        self.start_rally()
+
+    def start_rally(self):
+        self.rally_ticks = 0
+        self.paddles = [PADDLE_START, PADDLE_START]
+
+    def end_rally(self):
+        self.rally_lengths.append(self.rally_ticks)
+        self.start_rally()
+
+    def feed(self, frame):
+        fields = frame.decode('utf-8', 'replace').strip().split(',')
+        if len(fields) != 9 or not fields[0].isdigit():
+            return  # header or a frame cut off by a timeout
+
+        step, ball_x, ball_y, paddle1, paddle2 = (int(f) for f in fields[:5])
+        actions = fields[5:7]
+
+        self.rally_ticks += step - self.ticks
+        self.ticks = step
+
+        # A cycle row stands for many skipped ticks of a repeating rally, only
+        # played ticks are counted for hits, movement, actions and the heatmap.
+        if actions[0] == 'cycle':
+            self.paddles = [paddle1, paddle2]
+            self.check_dead_rally()
+            return
+
+        for player, (x, action) in enumerate(zip((paddle1, paddle2), actions)):
+            self.paddle_travel[player] += abs(x - self.paddles[player])
+            if action in self.actions[player]:
+                self.actions[player][action] += 1
+        self.paddles = [paddle1, paddle2]
+        self.heatmap[heatmap_bin(ball_y)][heatmap_bin(ball_x)] += 1
+
+        if ball_y >= GRID_SIZE - 1 or ball_y <= 0:
+            player = 0 if ball_y >= GRID_SIZE - 1 else 1
+            if not self.paddles[player] <= ball_x < self.paddles[player] + PADDLE_WIDTH:
+                self.misses[player] += 1
+                self.end_rally()
+                return
+            self.hits[player] += 1
+
+        self.check_dead_rally()
+
+    def check_dead_rally(self):
+        if self.max_point_ticks and self.rally_ticks >= self.max_point_ticks:
+            self.dead_rallies += 1
+            self.end_rally()
+
+    def result(self):
+        rallies = self.rally_lengths + ([self.rally_ticks] if self.rally_ticks else [])
+        return {
+            'ticks': self.ticks,
+            'rallies': len(rallies),
+            'longest_rally': max(rallies, default=0),
+            'mean_rally': round(sum(rallies) / len(rallies), 2) if rallies else None,
+            'dead_rallies': self.dead_rallies,
+            'hits': self.hits,
+            'misses': self.misses,
+            'paddle_travel': self.paddle_travel,
+            'actions': self.actions,
+            'heatmap': self.heatmap,
+        }
+
+class StatsStream:
+    # Handed to run_engine in place of the log stream, every frame is counted
+    # and then written through.
+    def __init__(self, stream, accumulator):
+        self.stream = stream
+        self.accumulator = accumulator
+
+    def write(self, frame):
+        self.accumulator.feed(frame)
+        return self.stream.write(frame)
+
+def add_lists(a, b):
+    return [x + y for x, y in zip(a, b)]
+
+def record_team_stats(match):
+    stats = match.stats
+    sides = []
+    if match.player1_submission_id:
+        sides.append((match.player1_submission.team_id, 0))
+    if match.player2_submission_id and not match.is_player2_system_bot:
+        sides.append((match.player2_submission.team_id, 1))
+
+    for team_id, player in sides:
+        # Player 2 defends the top row, its heatmap is flipped so every team's
+        # own baseline is the last row.
+        heatmap = stats['heatmap'] if player == 0 else stats['heatmap'][::-1]
+
+        with transaction.atomic():
+            team_stats, _ = TeamStats.objects.select_for_update().get_or_create(team_id=team_id)
+            team_stats.matches += 1
+            team_stats.ticks += stats['ticks']
+            team_stats.rallies += stats['rallies']
+            team_stats.longest_rally = max(team_stats.longest_rally, stats['longest_rally'])
+            team_stats.hits += stats['hits'][player]
+            team_stats.misses += stats['misses'][player]
+            team_stats.opponent_misses += stats['misses'][1 - player]
+            team_stats.paddle_travel += stats['paddle_travel'][player]
+            team_stats.actions = {
+                action: team_stats.actions.get(action, 0) + stats['actions'][player][action] for action in ACTIONS
+            }
+            if team_stats.heatmap:
+                team_stats.heatmap = [add_lists(a, b) for a, b in zip(team_stats.heatmap, heatmap)]
+            else:
+                team_stats.heatmap = heatmap
+            team_stats.updated_at = timezone.now()
+            team_stats.save()
@@ -1,19 +1,171 @@
 import subprocess
 import os
-import shutil
-import re
-import json
+import gzip
+import tempfile
+import time
 import uuid
-from celery import shared_task
+from celery import shared_task, chord
 from django.conf import settings
 from django.core.files import File
 from django.utils import timezone
 from django.db.models import F
 
-from .models import Match, Team, LeaderboardScore
+from .models import Match, Team, LeaderboardScore, BotSubmission, PairwiseRecord, Gauntlet
+from .artifacts import fetch_bot
+from .engine_runner import SYSTEM_BOT, ENGINE_TIMEOUT, run_engine
+from .log_retention import compact_game_logs
+from .metrics import MATCH_DURATION, record_match
+from .stats import MatchStatsAccumulator, StatsStream, record_team_stats
+from .bracket import record_bracket_result
+from .leases import LeaseHeartbeat, new_lease_holder, claim_match, release_match, resolve_followers, reap_expired_leases
 
-ENGINE_PATH = os.path.join(settings.BASE_DIR, 'engine.py')
-SYSTEM_BOT = os.path.join(settings.BASE_DIR, 'bot1.py')
+# Compressed logs stay in memory up to this size before spilling to disk.
+LOG_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+def save_game_log(match, log_stream, log_buffer):
+    log_stream.close()
+    log_buffer.seek(0)
+    match.game_log.save(f"game_log_{match.id.hex}.csv.gz", File(log_buffer), save=False)
+
+def open_game_log():
+    # Frames are compressed as they arrive from the engine, nothing is written
+    # to disk until the finished log is handed to storage.
+    log_buffer = tempfile.SpooledTemporaryFile(max_size=LOG_SPOOL_MAX_SIZE)
+    log_stream = gzip.GzipFile(filename='game_log.csv', mode='wb', fileobj=log_buffer, mtime=0)
+    return log_stream, log_buffer
+
+def match_bot_paths(match):
+    # Returns an error message in place of the paths when a bot is missing.
+    if match.player1_submission and match.player1_submission.code_file:
+        player1_bot_path = fetch_bot(match.player1_submission)
+    else:
+        return None, "Error: Player 1 bot script not found."
+
+    if match.is_player2_system_bot:
+        player2_bot_path = SYSTEM_BOT
+    elif match.player1_submission and match.player2_submission.code_file:
+        player2_bot_path = fetch_bot(match.player2_submission)
+    else:
+        return None, "Error: Player 2 bot script not found."
+
+    return (player1_bot_path, player2_bot_path), None
+
+def apply_engine_result(match, data, stats):
+    score_p1 = data.get('player1_score')
+    score_p2 = data.get('player2_score')
+
+    match.player1_score = score_p1
+    match.player2_score = score_p2
+    match.engine_result = {
+        key: data.get(key) for key in ['winner', 'end_reason', 'tiebreak', 'ticks', 'dead_points', 'returns', 'cycles', 'budget']
+    }
+    match.stats = stats.result()
+    match.status = Match.MatchStatus.COMPLETED
+
+    # A match cut short by the tick budget can end level, the engine's
+    # tie-break then names the winner.
+    winner = data.get('winner')
+    if winner is None:
+        winner = 1 if score_p1 > score_p2 else 2 if score_p2 > score_p1 else None
+
+    if winner == 1:
+        match.winning_team = match.player1_submission.team
+        return 'player1'
+    elif winner == 2:
+        if not match.is_player2_system_bot:
+            match.winning_team = match.player2_submission.team
+        return 'player2'
+    return 'draw'
+
+def apply_engine_timeout(match):
+    # The tick budget always ends a game with a winner, running out of wall
+    # clock says nothing about who was ahead, so nobody is awarded the match.
+    print(f"Match {match.id.hex}: Engine.py timed out after {ENGINE_TIMEOUT} seconds.")
+    match.status = Match.MatchStatus.ERROR
+    match.player1_score = None
+    match.player2_score = None
+    match.winning_team = None
+    match.engine_result = {'end_reason': 'timeout'}
+    return 'timeout'
+
+def fail_match(match, holder):
+    # For matches that can't be played at all, errored without running the engine.
+    match.status = Match.MatchStatus.ERROR
+    if not release_match(match.id, holder, status=match.status):
+        return False
+    record_match(match)
+    resolve_followers(match.id, status=match.status)
+    record_bracket_result(match)
+    return True
+
+def finish_match(match, holder, outcome):
+    # Saves the result if the lease is still held and applies everything that
+    # follows from it. Shared by process_match_task and the asyncio runner.
+    match.played_at = timezone.now()
+    finished = release_match(
+        match.id,
+        holder,
+        status=match.status,
+        player1_score=match.player1_score,
+        player2_score=match.player2_score,
+        winning_team=match.winning_team,
+        engine_result=match.engine_result,
+        stats=match.stats,
+        game_log=match.game_log.name or None,
+        played_at=match.played_at
+    )
+
+    if finished:
+        record_match(match, outcome)
+    else:
+        # The lease expired and the match went back to the queue, whoever
+        # claimed it next records the result.
+        print(f"Match {match.id.hex}: lease lost before the result was saved, discarding it.")
+        if match.game_log:
+            match.game_log.delete(save=False)
+        return False
+
+    if match.status in [Match.MatchStatus.COMPLETED, Match.MatchStatus.ERROR]:
+        resolve_followers(
+            match.id,
+            status=match.status,
+            player1_score=match.player1_score,
+            player2_score=match.player2_score,
+            winning_team=match.winning_team,
+            engine_result=match.engine_result,
+            stats=match.stats,
+            game_log=match.game_log.name or None,
+            played_at=match.played_at
+        )
+
+    if match.status == Match.MatchStatus.COMPLETED and match.stats:
+        try:
+            record_team_stats(match)
+        except Exception as e:
+            print(f"Match {match.id.hex}: could not update team stats: {e}")
+
+    record_bracket_result(match)
+
+    if match.status == Match.MatchStatus.COMPLETED and match.match_type == Match.MatchType.ROUND_ONE:
+        
+        if match.player1_submission and match.player1_submission.team:
+            to_update = match.player1_submission.team
+            score = match.player1_score if match.player1_score is not None else 0
+
+            leaederboard_entry, created = LeaderboardScore.objects.get_or_create(team=to_update)
+
+            updates = {
+                'score': F('score') + score,
+                'matches_played': F('matches_played') + 1,
+                'last_updated': timezone.now()
+            }
+
+            if match.winning_team == to_update:
+                updates['matches_won'] = F('matches_won') + 1
+
+            LeaderboardScore.objects.filter(pk=leaederboard_entry.pk).update(**updates)
+
+    return True
 
 @shared_task
 def process_match_task(match_id):
@@ -24,117 +176,251 @@ def process_match_task(match_id):
         print(f"Match with id {match_id} not found.")
         return f"Match with id {match_id} not found."
     
-    if match.status != Match.MatchStatus.PENDING:
+    # Tasks are acknowledged late, so a redelivered task can reach a second
+    # worker. Only the one whose conditional update succeeds runs the match.
+    holder = new_lease_holder()
+    if not claim_match(match_uuid, holder):
+        match.refresh_from_db(fields=['status'])
         print(f"Match is not pending, current status: {match.status}")
         return "Match not pending."
     
     print(f"Processing match {match_id}...")
     match.status = Match.MatchStatus.RUNNING
-    match.save(update_fields=['status'])
 
-    player1_bot_path = None
-    player2_bot_path = None
+    try:
+        bot_paths, error = match_bot_paths(match)
+    except Exception as e:
+        # A missing blob or unreadable storage won't fix itself on a retry.
+        bot_paths, error = None, f"Error: could not fetch bots: {e}"
 
-    log_file_name = f"game_log_{match.id.hex}"
+    if error:
+        print(f"Match {match_id}: {error}")
+        fail_match(match, holder)
+        return error
+    player1_bot_path, player2_bot_path = bot_paths
 
-    if match.player1_submission and match.player1_submission.code_file:
-        player1_bot_path = match.player1_submission.code_file.path
-    else:
-        match.status = Match.MatchStatus.ERROR
-        match.save(update_fields=['status'])
-        return F"Error: Player 1 bot script not found."
+    log_stream, log_buffer = open_game_log()
+    stats = MatchStatsAccumulator(settings.ENGINE_MAX_POINT_TICKS)
 
-    if match.is_player2_system_bot:
-        player2_bot_path = SYSTEM_BOT
-    elif match.player1_submission and match.player2_submission.code_file:
-        player2_bot_path = match.player2_submission.code_file.path
-    else:
+    outcome = None
+    engine_started = time.perf_counter()
+
+    try: 
+        with LeaseHeartbeat(match_uuid, holder):
+            data, engine_stderr_capture = run_engine(player1_bot_path, player2_bot_path, StatsStream(log_stream, stats))
+        MATCH_DURATION.labels(Match.MatchType(match.match_type).name.lower()).observe(time.perf_counter() - engine_started)
+
+        if engine_stderr_capture:
+            print(f"Match {match.id.hex}: Engine STDERR:\n{engine_stderr_capture}")
+
+        outcome = apply_engine_result(match, data, stats)
+        save_game_log(match, log_stream, log_buffer)
+    except subprocess.TimeoutExpired:
+        outcome = apply_engine_timeout(match)
+        if log_stream.tell() > 0:
+            save_game_log(match, log_stream, log_buffer)
+            print(f"Saved (potentially partial) game log for timed-out match {match.id.hex}")
+        else:
+            print(f"No game log found for timed-out match {match.id.hex}")
+    except Exception as e:
+        print(f"An unexpected error occurred while processing match {match_id}: {e}")
         match.status = Match.MatchStatus.ERROR
-        match.save(update_fields=['status'])
-        return F"Error: Player 2 bot script not found."
+    finally:
+        log_stream.close()
+        log_buffer.close()
 
-    temp_match_dir = os.path.join(settings.MEDIA_ROOT, 'temp_match_logs', str(match.id.hex))
-    os.makedirs(temp_match_dir, exist_ok=True)
-    log = os.path.join(temp_match_dir, 'game_log.csv')
+        finish_match(match, holder, outcome)
 
-    out_file = os.path.join(settings.MEDIA_ROOT, 'temp_match_logs', str(match.id.hex), 'game_log.csv')
+def dispatch_match(match_id):
+    # With MATCH_DISPATCH = 'async' the pending row is the queue, a run_matches
+    # process picks it up on its next poll.
+    if settings.MATCH_DISPATCH == 'celery':
+        process_match_task.delay(match_id.hex)
 
-    command = [
-        'python3',
-        ENGINE_PATH,
-        '--p1', player1_bot_path,
-        '--p2', player2_bot_path,
-        '--out_dir', out_file
-    ]
+@shared_task
+def compact_game_logs_task():
+    results = compact_game_logs()
+    print(f"Game log compaction: {results}")
+    return results
 
-    try: 
-        process = subprocess.run(command, capture_output=True, text=True, timeout=3)
+@shared_task
+def reap_expired_leases_task():
+    requeued, failed = reap_expired_leases()
 
+    for match_id in requeued:
+        dispatch_match(match_id)
 
-        engine_stderr_capture = process.stderr.strip() if process.stderr else ""
+    if requeued or failed:
+        print(f"Lease reaper: requeued {len(requeued)} matches, gave up on {failed}.")
+    return {'requeued': len(requeued), 'failed': failed}
 
-        if engine_stderr_capture:
-            print(f"Match {match.id.hex}: Engine STDERR:\n{engine_stderr_capture}")
+def submission_bot_path(submission_id):
+    if submission_id is None:
+        return SYSTEM_BOT
+    return fetch_bot(BotSubmission.objects.get(id=uuid.UUID(submission_id)))
 
+@shared_task
+def play_games_task(player1_submission_id, player2_submission_id, games):
+    # Plays unrecorded games for analytics, a None player2 is the system bot.
+    player1_bot_path = submission_bot_path(player1_submission_id)
+    player2_bot_path = submission_bot_path(player2_submission_id)
+    results = []
 
-        score_p1 = None
-        score_p2 = None
+    with open(os.devnull, 'wb') as discard_log:
+        for _ in range(games):
+            start = time.perf_counter()
+            try:
+                data, _ = run_engine(player1_bot_path, player2_bot_path, discard_log)
+                score_p1 = data.get('player1_score')
+                score_p2 = data.get('player2_score')
+            except subprocess.TimeoutExpired:
+                print(f"Timed out playing {player1_submission_id} vs {player2_submission_id}, game skipped.")
+                continue
+            except Exception as e:
+                print(f"Error playing {player1_submission_id} vs {player2_submission_id}: {e}")
+                continue
 
-        data = json.loads(process.stdout.strip())
-        score_p1 = data.get('player1_score')
-        score_p2 = data.get('player2_score')
+            results.append({
+                'player1_score': score_p1,
+                'player2_score': score_p2,
+                'seconds': time.perf_counter() - start,
+            })
 
-        match.player1_score = score_p1
-        match.player2_score = score_p2
+    return {
+        'player1_submission': player1_submission_id,
+        'player2_submission': player2_submission_id,
+        'games': results,
+    }
 
-        with open(log, 'rb') as log_f:
-            match.game_log.save(log_file_name, File(log_f), save=False)
+@shared_task
+def refresh_win_matrix_task(submission_id, opponent_ids=None):
+    games = settings.WIN_MATRIX_GAMES_PER_PAIR
+    submission = BotSubmission.objects.filter(id=uuid.UUID(submission_id), is_active=True).first()
 
-        match.status = Match.MatchStatus.COMPLETED
+    if not submission or games <= 0:
+        return "Nothing to refresh."
 
-        if score_p1 > score_p2:
-            match.winning_team = match.player1_submission.team
-        elif score_p2 > score_p1:
-            if not match.is_player2_system_bot:
-                match.winning_team = match.player2_submission.team
-        else:
-            pass
-    except subprocess.TimeoutExpired:
-        print(f"Match {match.id.hex}: Engine.py timed out after 10 seconds.")
-        match.status = Match.MatchStatus.COMPLETED 
-        match.player1_score = 1 
-        match.player2_score = 0 
-        match.winning_team = match.player1_submission.team 
-        if os.path.exists(log):
-            with open(log, 'rb') as log_f:
-                match.game_log.save(log_file_name, File(log_f), save=False)
-            print(f"Saved (potentially partial) game log for timed-out match {match.id.hex}")
-        else:
-            print(f"No game log found for timed-out match {match.id.hex}")
-    except Exception as e:
-        print(f"An unexpected error occurred while processing match {match_id}: {e}")
-        match.status = Match.MatchStatus.ERROR
-    finally:
-        match.played_at = timezone.now()
-        match.save()
+    opponents = BotSubmission.objects.filter(is_active=True).exclude(team=submission.team)
+    if opponent_ids is not None:
+        opponents = opponents.filter(id__in=[uuid.UUID(i) for i in opponent_ids])
+
+    # Half the games with each bot as player 1, so seat order does not bias the result.
+    header = []
+    for opponent_id in opponents.values_list('id', flat=True):
+        header.append(play_games_task.s(submission.id.hex, opponent_id.hex, games - games // 2))
+        if games // 2:
+            header.append(play_games_task.s(opponent_id.hex, submission.id.hex, games // 2))
+
+    if not header:
+        return "No opponents."
+
+    chord(header)(record_pairwise_results_task.s())
+    return f"Queued {len(header)} game batches for submission {submission_id}."
+
+@shared_task
+def record_pairwise_results_task(batches):
+    pairs = {}
+
+    for batch in batches:
+        player1 = uuid.UUID(batch['player1_submission'])
+        player2 = uuid.UUID(batch['player2_submission'])
+        submission_a, submission_b = PairwiseRecord.ordered(player1, player2)
+        counts = pairs.setdefault((submission_a, submission_b), {'a_wins': 0, 'b_wins': 0, 'draws': 0})
+
+        for game in batch['games']:
+            if game['player1_score'] == game['player2_score']:
+                counts['draws'] += 1
+            elif (game['player1_score'] > game['player2_score']) == (player1 == submission_a):
+                counts['a_wins'] += 1
+            else:
+                counts['b_wins'] += 1
+
+    # Replaces the pair's counts rather than adding to them, a refresh always
+    # reflects only the games it just played.
+    for (submission_a, submission_b), counts in pairs.items():
+        PairwiseRecord.objects.update_or_create(
+            submission_a_id=submission_a,
+            submission_b_id=submission_b,
+            defaults=counts
+        )
+
+    return f"Recorded {len(pairs)} pairs."
 
-        # shutil.rmtree(temp_match_dir)
+@shared_task
+def run_gauntlet_task(gauntlet_id):
+    gauntlet = Gauntlet.objects.select_related('submission').get(id=uuid.UUID(gauntlet_id))
+    submission = gauntlet.submission
+
+    opponent_ids = BotSubmission.objects.filter(
+        is_active=True
+    ).exclude(team_id=submission.team_id).values_list('id', flat=True)
+
+    header = [
+        play_games_task.s(submission.id.hex, opponent_id.hex, gauntlet.games_per_opponent)
+        for opponent_id in opponent_ids
+    ]
+    header.append(play_games_task.s(submission.id.hex, None, gauntlet.games_per_opponent))
+
+    Gauntlet.objects.filter(pk=gauntlet.pk).update(status=Gauntlet.GauntletStatus.RUNNING)
+    chord(header)(
+        aggregate_gauntlet_task.s(gauntlet.id.hex).on_error(gauntlet_failed_task.s(gauntlet.id.hex))
+    )
 
-        if match.status == Match.MatchStatus.COMPLETED and match.match_type == Match.MatchType.ROUND_ONE:
-            
-            if match.player1_submission and match.player1_submission.team:
-                to_update = match.player1_submission.team
-                score = match.player1_score if match.player1_score is not None else 0
+    return f"Queued {len(header)} opponents for gauntlet {gauntlet_id}."
 
-                leaederboard_entry, created = LeaderboardScore.objects.get_or_create(team=to_update)
+@shared_task
+def aggregate_gauntlet_task(batches, gauntlet_id):
+    gauntlet = Gauntlet.objects.get(id=uuid.UUID(gauntlet_id))
 
-                updates = {
-                    'score': F('score') + score,
-                    'matches_played': F('matches_played') + 1,
-                    'last_updated': timezone.now()
-                }
+    opponent_ids = [uuid.UUID(b['player2_submission']) for b in batches if b['player2_submission']]
+    team_names = dict(
+        BotSubmission.objects.filter(id__in=opponent_ids).values_list('id', 'team__name')
+    )
 
-                if match.winning_team == to_update:
-                    updates['matches_won'] = F('matches_won') + 1
+    opponents = []
+    for batch in batches:
+        opponent_id = batch['player2_submission']
+        games = batch['games']
 
-                LeaderboardScore.objects.filter(pk=leaederboard_entry.pk).update(**updates)
\ No newline at end of file
+        opponents.append({
+            'submission': opponent_id,
+            'team_name': team_names.get(uuid.UUID(opponent_id)) if opponent_id else "System Bot",
+            'games': len(games),
+            'wins': sum(1 for g in games if g['player1_score'] > g['player2_score']),
+            'losses': sum(1 for g in games if g['player1_score'] < g['player2_score']),
+            'draws': sum(1 for g in games if g['player1_score'] == g['player2_score']),
+            'score_differential': sum(g['player1_score'] - g['player2_score'] for g in games),
+            'average_seconds': round(sum(g['seconds'] for g in games) / len(games), 4) if games else None,
+        })
+
+    total_games = sum(o['games'] for o in opponents)
+    wins = sum(o['wins'] for o in opponents)
+    draws = sum(o['draws'] for o in opponents)
+    score_differential = sum(o['score_differential'] for o in opponents)
+    timed = [o for o in opponents if o['average_seconds'] is not None]
+
+    gauntlet.report = {
+        'opponents': len(opponents),
+        'games': total_games,
+        'wins': wins,
+        'losses': sum(o['losses'] for o in opponents),
+        'draws': draws,
+        'win_rate': round((wins + 0.5 * draws) / total_games, 4) if total_games else None,
+        'score_differential': score_differential,
+        'average_score_differential': round(score_differential / total_games, 4) if total_games else None,
+        'slowest_opponents': sorted(timed, key=lambda o: o['average_seconds'], reverse=True)[:5],
+        'results': sorted(opponents, key=lambda o: o['score_differential']),
+    }
+    gauntlet.status = Gauntlet.GauntletStatus.COMPLETED
+    gauntlet.completed_at = timezone.now()
+    gauntlet.save(update_fields=['report', 'status', 'completed_at'])
+
+    return f"Gauntlet {gauntlet_id} completed over {total_games} games."
+
+@shared_task
+def gauntlet_failed_task(request, exc, traceback, gauntlet_id):
+    print(f"Gauntlet {gauntlet_id} failed: {exc}")
+    Gauntlet.objects.filter(id=uuid.UUID(gauntlet_id)).update(
+        status=Gauntlet.GauntletStatus.ERROR,
+        completed_at=timezone.now()
+    )
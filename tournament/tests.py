@@ -1,3 +1,868 @@
-from django.test import TestCase
+import hashlib
+import gzip
+import io
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+import redis
+import engine
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from . import redis_client, replicas
+from .models import Team, BotSubmission, Match, BracketNode
+from .bracket import set_bracket_node
+from .search import prefix_upper_bound, search_teams
+from .stats import MatchStatsAccumulator, StatsStream
+from .log_delivery import parse_range
+from .leases import LeaseHeartbeat, new_lease_holder, claim_match, release_match, reap_expired_leases
+from .tasks import fail_match, finish_match
+from .probe import probe_code, budget_problems
+from .ratelimit import SlidingWindowRateLimiter, RateLimitExceeded, HOUR
+from .views import BotSubmissionListCreateView
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='fakeredis://')
+class RedisTestCase(TestCase):
+    def setUp(self):
+        redis_client._connection = None
+        redis_client.get_redis().flushall()
+
+    def tearDown(self):
+        redis_client._connection = None
+
+
+class SlidingWindowRateLimiterTests(RedisTestCase):
+    def limiter(self):
+        return SlidingWindowRateLimiter('tests', [('hourly', 3, HOUR)])
+
+    def test_admits_up_to_the_limit(self):
+        limiter = self.limiter()
+        for _ in range(3):
+            self.assertIsNotNone(limiter.hit('team'))
+
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.hit('team')
+        self.assertEqual(raised.exception.name, 'hourly')
+        self.assertEqual(raised.exception.limit, 3)
+
+    def test_rejected_attempts_are_not_counted(self):
+        limiter = self.limiter()
+        for _ in range(3):
+            limiter.hit('team')
+        for _ in range(5):
+            with self.assertRaises(RateLimitExceeded):
+                limiter.hit('team')
+
+        self.assertEqual(redis_client.get_redis().zcard(limiter.key('team', HOUR)), 3)
+
+    def test_window_slides(self):
+        limiter = self.limiter()
+        with mock.patch('tournament.ratelimit.time.time', return_value=1000.0):
+            limiter.hit('team')
+        with mock.patch('tournament.ratelimit.time.time', return_value=1000.0 + HOUR / 2):
+            limiter.hit('team')
+            limiter.hit('team')
+
+        with mock.patch('tournament.ratelimit.time.time', return_value=1000.0 + HOUR - 10):
+            with self.assertRaises(RateLimitExceeded) as raised:
+                limiter.hit('team')
+        # The first request leaves the window 10 seconds later.
+        self.assertEqual(raised.exception.retry_after, 11)
+
+        with mock.patch('tournament.ratelimit.time.time', return_value=1000.0 + HOUR + 1):
+            self.assertIsNotNone(limiter.hit('team'))
+
+    def test_identities_are_independent(self):
+        limiter = self.limiter()
+        for _ in range(3):
+            limiter.hit('team-a')
+        self.assertIsNotNone(limiter.hit('team-b'))
+
+    def test_release_returns_the_slot(self):
+        limiter = self.limiter()
+        tokens = [limiter.hit('team') for _ in range(3)]
+        limiter.release('team', tokens[-1])
+        self.assertIsNotNone(limiter.hit('team'))
+
+    def test_every_window_must_admit(self):
+        limiter = SlidingWindowRateLimiter('tests', [('hourly', 5, HOUR), ('burst', 2, 60)])
+        limiter.hit('team')
+        limiter.hit('team')
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.hit('team')
+        self.assertEqual(raised.exception.name, 'burst')
+        self.assertEqual(redis_client.get_redis().zcard(limiter.key('team', HOUR)), 2)
+
+    def test_fails_open_when_redis_is_down(self):
+        with mock.patch('tournament.ratelimit.get_redis', side_effect=redis.ConnectionError('down')):
+            self.assertIsNone(self.limiter().hit('team'))
+
+    def test_retry_after_falls_back_to_the_window_when_redis_is_down(self):
+        limiter = self.limiter()
+        for _ in range(3):
+            limiter.hit('team')
+
+        with mock.patch.object(limiter, 'release'), \
+                mock.patch('tournament.ratelimit.get_redis', side_effect=[redis_client.get_redis(), redis.ConnectionError('down')]):
+            with self.assertRaises(RateLimitExceeded) as raised:
+                limiter.hit('team')
+        self.assertEqual(raised.exception.retry_after, HOUR)
+
+
+def use_temp_media_root(test):
+    media_root = tempfile.TemporaryDirectory()
+    test.addCleanup(media_root.cleanup)
+    media_override = override_settings(MEDIA_ROOT=media_root.name)
+    media_override.enable()
+    test.addCleanup(media_override.disable)
+
+
+@override_settings(BOT_PROBE_ENABLED=False)
+class SubmissionRateLimitTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        use_temp_media_root(self)
+
+        self.user = User.objects.create_user(username='ratelimited', password='password')
+        self.team = Team.objects.create(name='Rate Limited', creator=self.user)
+        self.team.members.add(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit(self):
+        code = SimpleUploadedFile('bot.py', b"def next_move(state):\n    return 'stay'\n")
+        return self.client.post(
+            f'/api/tournament/teams/{self.team.pk}/submissions/',
+            {'code_file': code},
+            format='multipart'
+        )
+
+    @mock.patch.object(BotSubmissionListCreateView, 'HOURLY_SUBMISSION_LIMIT', 2)
+    def test_over_the_limit_is_429_with_retry_after(self):
+        self.assertEqual(self.submit().status_code, 201)
+        self.assertEqual(self.submit().status_code, 201)
+
+        response = self.submit()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertLessEqual(int(response['Retry-After']), HOUR)
+        self.assertEqual(self.team.submissions.count(), 2)
+
+    @mock.patch.object(BotSubmissionListCreateView, 'HOURLY_SUBMISSION_LIMIT', 1)
+    def test_failed_submission_gives_its_slot_back(self):
+        with mock.patch('tournament.serializers.BotSubmissionSerializer.create', side_effect=ValueError('boom')):
+            with self.assertRaises(ValueError):
+                self.submit()
+
+        self.assertEqual(self.submit().status_code, 201)
+
+
+@override_settings(MATCH_MAX_ATTEMPTS=1)
+class CoalescedFollowerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='coalesced', password='password')
+        team = Team.objects.create(name='Coalesced', creator=user)
+        self.submission = BotSubmission.objects.create(team=team, submitted_by=user, code_file='bot.py', is_active=True)
+        self.leader = self.make_match()
+        self.followers = [self.make_match(coalesced_into=self.leader) for _ in range(2)]
+
+    def make_match(self, **fields):
+        return Match.objects.create(
+            match_type=Match.MatchType.TEST_VS_SYSTEM,
+            player1_submission=self.submission,
+            is_player2_system_bot=True,
+            **fields
+        )
+
+    def follower_statuses(self):
+        return set(Match.objects.filter(coalesced_into=self.leader).values_list('status', flat=True))
+
+    def test_failed_leader_errors_its_followers(self):
+        holder = new_lease_holder()
+        claim_match(self.leader.id, holder)
+        self.assertTrue(fail_match(self.leader, holder))
+        self.assertEqual(self.follower_statuses(), {Match.MatchStatus.ERROR})
+
+    def test_reaper_giving_up_errors_the_followers(self):
+        claim_match(self.leader.id, new_lease_holder())
+        requeued, failed = reap_expired_leases(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual((requeued, failed), ([], 1))
+        self.assertEqual(self.follower_statuses(), {Match.MatchStatus.ERROR})
+
+    def test_requeued_leader_keeps_its_followers_waiting(self):
+        claim_match(self.leader.id, new_lease_holder())
+        with override_settings(MATCH_MAX_ATTEMPTS=3):
+            requeued, _ = reap_expired_leases(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(requeued, [self.leader.id])
+        self.assertEqual(self.follower_statuses(), {Match.MatchStatus.PENDING})
+
+
+class BotProbeTests(SimpleTestCase):
+    def test_peak_memory_is_the_bots_own(self):
+        # The probe is forked from the web worker, whose memory must not be
+        # counted against the bot.
+        ballast = b'x' * (400 * 1024 * 1024)
+        result = probe_code(b"def next_move(state):\n    return 'stay'\n")
+        del ballast
+
+        self.assertIsNone(result['error'])
+        self.assertEqual(result['move'], 'stay')
+        self.assertLess(result['peak_memory_kb'], 100 * 1024)
+        self.assertEqual(budget_problems(result), [])
+
+    def test_heavy_bot_is_over_the_memory_budget(self):
+        code = b"ballast = b'x' * (64 * 1024 * 1024)\ndef next_move(state):\n    return 'stay'\n"
+        with override_settings(BOT_PEAK_MEMORY_BUDGET_KB=32 * 1024):
+            result = probe_code(code)
+            self.assertGreater(result['peak_memory_kb'], 64 * 1024)
+            self.assertEqual(len(budget_problems(result)), 1)
+
+
+class GameBatchTests(SimpleTestCase):
+    def test_finished_game_resets_into_the_next_one(self):
+        batch = engine.GameBatch(2, seed=10)
+        game = batch.games[0]
+        # One point from the match, with the ball about to pass player 2's paddle.
+        game.scores = [engine.MAX_SCORE - 1, 0]
+        game.ball.x, game.ball.y, game.ball.dx, game.ball.dy = 3, 1, -1, -1
+        game.paddle2.x = 20
+
+        observations, rewards, dones = batch.step(['stay', 'stay'], ['stay', 'stay'])
+
+        self.assertEqual(rewards[0], 1)
+        self.assertTrue(dones[0])
+        # Games are reseeded past the first batch, seed + num_games * resets.
+        self.assertEqual(observations[0], engine.Game(10 + 2).features())
+        self.assertEqual(game.scores, [0, 0])
+        self.assertFalse(game.done)
+        self.assertEqual((rewards[1], dones[1]), (0, False))
+
+    def test_finished_game_stays_done_without_auto_reset(self):
+        batch = engine.GameBatch(1, seed=10, auto_reset=False, max_match_ticks=1)
+
+        observations, rewards, dones = batch.step(['stay'], ['stay'])
+        self.assertEqual(dones, [True])
+        self.assertTrue(batch.games[0].done)
+
+        self.assertEqual(batch.step(['stay'], ['stay']), (observations, [0], [True]))
+        self.assertEqual(batch.reset(), [engine.Game(10).features()])
+
+
+def tracking_move(state):
+    # Heads for where the ball will be after this tick, never misses a return.
+    target = state['ball']['x'] + state['ball']['dx']
+    if target < state['you']['x']:
+        return 'left'
+    if target > state['you']['x'] + 1:
+        return 'right'
+    return 'stay'
+
+
+def play_tick(game):
+    move1 = tracking_move(game.observe('bot1'))
+    move2 = tracking_move(game.observe('bot2', pending_action1=move1))
+    return game.step(move1, move2)
+
+
+class TickBudgetTests(SimpleTestCase):
+    def finished(self, scores, returns):
+        game = engine.Game(0)
+        game.scores, game.returns = scores, returns
+        game.finish('match_tick_budget')
+        return game
+
+    def test_tiebreak_goes_to_score_first(self):
+        game = self.finished([2, 1], [0, 9])
+        self.assertEqual((game.winner, game.tiebreak), (1, None))
+
+    def test_tiebreak_goes_to_returns_on_level_scores(self):
+        game = self.finished([2, 2], [3, 4])
+        self.assertEqual((game.winner, game.tiebreak), (2, 'returns'))
+
+    def test_tiebreak_goes_to_seat_one_last(self):
+        game = self.finished([2, 2], [4, 4])
+        self.assertEqual((game.winner, game.tiebreak), (1, 'seat'))
+
+    def test_dead_point_is_replayed(self):
+        game = engine.Game(0, max_point_ticks=50, max_match_ticks=0)
+        rewards = [play_tick(game)[1] for _ in range(49)]
+        self.assertEqual((game.round_num, game.point_ticks), (1, 49))
+
+        rewards.append(play_tick(game)[1])
+        self.assertEqual(set(rewards), {0})
+        self.assertEqual((game.round_num, game.point_ticks, game.dead_points), (2, 0, 1))
+        self.assertEqual(game.scores, [0, 0])
+        self.assertFalse(game.done)
+
+    def test_match_tick_budget_ends_the_match(self):
+        game = engine.Game(0, max_point_ticks=0, max_match_ticks=120)
+        while not game.done:
+            play_tick(game)
+
+        result = game.result()
+        self.assertEqual(result['ticks'], 120)
+        self.assertEqual(result['end_reason'], 'match_tick_budget')
+        self.assertEqual(result['dead_points'], 0)
+        self.assertEqual((result['player1_score'], result['player2_score']), (0, 0))
+        self.assertEqual(result['winner'], 1 if result['returns'][0] >= result['returns'][1] else 2)
+
+
+class CycleFastForwardTests(SimpleTestCase):
+    DETERMINISTIC_PAIRS = [('bot4.py', 'bot7.py'), ('bot6.py', 'bot4.py'), ('bot3.py', 'bot7.py')]
+
+    def play(self, p1, p2, seed, detect_cycles):
+        random.seed(seed)
+        return engine.play_game(
+            os.path.join(settings.BASE_DIR, 'test_bots', p1),
+            os.path.join(settings.BASE_DIR, 'test_bots', p2),
+            seed=seed,
+            detect_cycles=detect_cycles
+        )
+
+    def assertSameOutcome(self, skipped, played):
+        for key in ('player1_score', 'player2_score', 'returns', 'winner', 'ticks', 'end_reason', 'dead_points'):
+            self.assertEqual(skipped[key], played[key], key)
+
+    def test_skipping_cycles_matches_playing_every_tick(self):
+        cycles = 0
+        for p1, p2 in self.DETERMINISTIC_PAIRS:
+            for seed in range(20):
+                with self.subTest(p1=p1, p2=p2, seed=seed):
+                    skipped = self.play(p1, p2, seed, detect_cycles=True)
+                    played = self.play(p1, p2, seed, detect_cycles=False)
+                    self.assertSameOutcome(skipped, played)
+                    self.assertEqual(played['cycles'], [])
+                    cycles += len(skipped['cycles'])
+
+        self.assertGreater(cycles, 0)
+
+    def test_random_bot_is_never_fast_forwarded(self):
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                skipped = self.play('bot2.py', 'bot4.py', seed, detect_cycles=True)
+                played = self.play('bot2.py', 'bot4.py', seed, detect_cycles=False)
+                self.assertEqual(skipped['cycles'], [])
+                self.assertSameOutcome(skipped, played)
+
+
+def create_test_match(username):
+    user = User.objects.create_user(username=username, password='password')
+    team = Team.objects.create(name=username, creator=user)
+    submission = BotSubmission.objects.create(team=team, submitted_by=user, code_file='bot.py', is_active=True)
+    return Match.objects.create(
+        match_type=Match.MatchType.TEST_VS_SYSTEM,
+        player1_submission=submission,
+        is_player2_system_bot=True
+    )
+
+
+@override_settings(MATCH_MAX_ATTEMPTS=3)
+class MatchLeaseTests(TestCase):
+    def setUp(self):
+        self.match = create_test_match('leased')
+
+    def steal_lease(self, holder):
+        # The first holder's lease runs out, the reaper requeues the match and
+        # another worker claims it.
+        claim_match(self.match.id, holder)
+        requeued, _ = reap_expired_leases(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(requeued, [self.match.id])
+        thief = new_lease_holder()
+        self.assertTrue(claim_match(self.match.id, thief))
+        return thief
+
+    def test_held_lease_cannot_be_claimed_again(self):
+        self.assertTrue(claim_match(self.match.id, new_lease_holder()))
+        self.assertFalse(claim_match(self.match.id, new_lease_holder()))
+
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.attempts, 1)
+
+    def test_release_after_the_lease_was_stolen_is_a_no_op(self):
+        holder = new_lease_holder()
+        thief = self.steal_lease(holder)
+
+        self.assertFalse(release_match(self.match.id, holder, status=Match.MatchStatus.COMPLETED))
+
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, Match.MatchStatus.RUNNING)
+        self.assertEqual(self.match.lease_holder, thief)
+        self.assertEqual(self.match.attempts, 2)
+
+    def test_finish_after_the_lease_was_stolen_is_a_no_op(self):
+        holder = new_lease_holder()
+        thief = self.steal_lease(holder)
+
+        self.match.status = Match.MatchStatus.COMPLETED
+        self.match.player1_score, self.match.player2_score = 5, 3
+        self.match.winning_team = self.match.player1_submission.team
+        self.assertFalse(finish_match(self.match, holder, 'player1'))
+
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, Match.MatchStatus.RUNNING)
+        self.assertEqual(self.match.lease_holder, thief)
+        self.assertIsNone(self.match.player1_score)
+        self.assertIsNone(self.match.winning_team)
+
+    def test_reaper_requeues_a_match_without_followers(self):
+        claim_match(self.match.id, new_lease_holder())
+        requeued, failed = reap_expired_leases(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual((requeued, failed), ([self.match.id], 0))
+
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, Match.MatchStatus.PENDING)
+        self.assertEqual(self.match.lease_holder, '')
+        self.assertIsNone(self.match.lease_expires_at)
+
+    def test_reaper_leaves_live_leases_alone(self):
+        claim_match(self.match.id, new_lease_holder())
+        self.assertEqual(reap_expired_leases(), ([], 0))
+
+
+class LeaseHeartbeatTests(TransactionTestCase):
+    # The heartbeat renews from its own thread and database connection.
+
+    def setUp(self):
+        self.match = create_test_match('heartbeat')
+
+    def test_heartbeat_extends_the_lease(self):
+        holder = new_lease_holder()
+        claim_match(self.match.id, holder)
+        soon = timezone.now() + timedelta(seconds=1)
+        Match.objects.filter(id=self.match.id).update(lease_expires_at=soon)
+
+        with LeaseHeartbeat(self.match.id, holder, interval=0.05) as heartbeat:
+            time.sleep(0.3)
+
+        self.assertFalse(heartbeat.lost.is_set())
+        self.match.refresh_from_db()
+        self.assertGreater(self.match.lease_expires_at, soon)
+
+    def test_heartbeat_stops_once_the_lease_is_lost(self):
+        claim_match(self.match.id, new_lease_holder())
+
+        with LeaseHeartbeat(self.match.id, new_lease_holder(), interval=0.05) as heartbeat:
+            self.assertTrue(heartbeat.lost.wait(1))
+
+
+@override_settings(MATCH_MAX_ATTEMPTS=1)
+class BracketNodeErrorTests(TestCase):
+    def setUp(self):
+        submissions = []
+        for name in ('Seed One', 'Seed Two'):
+            user = User.objects.create_user(username=name.replace(' ', ''), password='password')
+            team = Team.objects.create(name=name, creator=user)
+            submissions.append(BotSubmission.objects.create(team=team, submitted_by=user, code_file='bot.py', is_active=True))
+
+        self.match = Match.objects.create(
+            match_type=Match.MatchType.ROUND_TWO,
+            round_stage=2,
+            player1_submission=submissions[0],
+            player2_submission=submissions[1]
+        )
+        self.node = set_bracket_node(self.match, 0)
+
+    def node_status(self):
+        return BracketNode.objects.get(id=self.node.id).status
+
+    def test_failed_match_errors_its_node(self):
+        holder = new_lease_holder()
+        claim_match(self.match.id, holder)
+        self.assertEqual(self.node_status(), Match.MatchStatus.PENDING)
+
+        self.assertTrue(fail_match(self.match, holder))
+        self.assertEqual(self.node_status(), Match.MatchStatus.ERROR)
+
+    def test_reaper_giving_up_errors_the_node(self):
+        claim_match(self.match.id, new_lease_holder())
+        reap_expired_leases(now=timezone.now() + timedelta(hours=1))
+        self.assertEqual(self.node_status(), Match.MatchStatus.ERROR)
+
+
+class BatchBotCacheTests(SimpleTestCase):
+    def test_self_play_loads_the_bot_once_per_seat(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.py') as bot_file:
+            # Keeps state in a global, which a shared module would mix up.
+            bot_file.write(
+                "players = set()\n"
+                "def next_move(state):\n"
+                "    players.add(state['player'])\n"
+                "    if len(players) > 1:\n"
+                "        raise RuntimeError(f'one module for both seats: {players}')\n"
+                "    return 'stay'\n"
+            )
+            bot_file.flush()
+
+            with mock.patch.object(engine, '_worker_bot_cache', {}) as cache:
+                for seed in range(2):
+                    result = engine.run_job((seed, {'p1': bot_file.name, 'p2': bot_file.name, 'seed': seed}))
+                    self.assertNotIn('error', result)
+
+        # Still one instance per seat, reused across games.
+        self.assertEqual(set(cache), {(bot_file.name, 1), (bot_file.name, 2)})
+
+
+class PrefixUpperBoundTests(SimpleTestCase):
+    def test_bumps_the_last_character(self):
+        self.assertEqual(prefix_upper_bound('ab'), 'ac')
+        self.assertEqual(prefix_upper_bound('é'), 'ê')
+
+    def test_skips_surrogates(self):
+        self.assertEqual(prefix_upper_bound('a\ud7ff'), 'a\ue000')
+
+    def test_drops_characters_that_cannot_be_bumped(self):
+        self.assertEqual(prefix_upper_bound('ab\U0010ffff'), 'ac')
+        self.assertIsNone(prefix_upper_bound('\U0010ffff\U0010ffff'))
+        self.assertIsNone(prefix_upper_bound(''))
+
+
+class TeamSearchTests(TestCase):
+    NAMES = ['alpha', 'ALPS', 'Alphabet', 'alp', 'al-pha', 'alq', 'beta', 'Élan', 'élite']
+
+    def setUp(self):
+        creator = User.objects.create_user(username='searcher', password='password')
+        for name in self.NAMES:
+            Team.objects.create(name=name, creator=creator)
+
+    def search(self, term):
+        return list(search_teams(Team.objects.all(), term).values_list('name', flat=True))
+
+    def test_prefix_matches_in_lower_case_order(self):
+        self.assertEqual(self.search('alp'), ['alp', 'alpha', 'Alphabet', 'ALPS'])
+        self.assertEqual(self.search('ALPH'), ['alpha', 'Alphabet'])
+
+    def test_prefix_is_not_a_substring_match(self):
+        self.assertEqual(self.search('pha'), [])
+        self.assertEqual(self.search('al-'), ['al-pha'])
+
+    def test_blank_term_lists_every_team(self):
+        self.assertEqual(
+            self.search('  '),
+            ['al-pha', 'alp', 'alpha', 'Alphabet', 'ALPS', 'alq', 'beta', 'Élan', 'élite']
+        )
+
+    def test_non_ascii_prefix(self):
+        self.assertEqual(self.search('Él'), ['Élan'])
+        self.assertEqual(self.search('él'), ['élite'])
+
+
+class SubmissionUpdateProbeTests(TestCase):
+    GOOD_BOT = b"def next_move(state):\n    return 'left'\n"
+
+    def setUp(self):
+        use_temp_media_root(self)
+        user = User.objects.create_user(username='updater', password='password')
+        team = Team.objects.create(name='Updater', creator=user)
+        self.submission = BotSubmission(team=team, submitted_by=user)
+        self.submission.store_code(b"def next_move(state):\n    return 'stay'\n")
+        self.submission.save()
+        self.url = f'/api/tournament/teams/{team.pk}/submissions/{self.submission.pk}/'
+
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def upload(self, code):
+        return self.client.patch(self.url, {'code_file': SimpleUploadedFile('bot.py', code)}, format='multipart')
+
+    def test_uploaded_file_that_fails_the_probe_is_refused(self):
+        digest = self.submission.code_digest
+
+        response = self.upload(b"raise ImportError('no numpy here')\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('code_file', response.data)
+
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.code_digest, digest)
+
+    def test_uploaded_file_is_probed_and_stored(self):
+        response = self.upload(self.GOOD_BOT)
+        self.assertEqual(response.status_code, 200)
+
+        self.submission.refresh_from_db()
+        self.assertIsNotNone(self.submission.import_time_ms)
+        self.assertEqual(self.submission.code_digest, hashlib.sha256(self.GOOD_BOT).hexdigest())
+        with self.submission.code_file.open('rb') as f:
+            self.assertEqual(f.read(), self.GOOD_BOT)
+
+
+class MatchStatsAccumulatorTests(SimpleTestCase):
+    FRAMES = [
+        b"step,ball_x,ball_y,paddle1_x,paddle2_x,bot1_action,bot2_action,score_bot1,score_bot2\n",
+        b"1,10,15,15,14,right,stay,0,0\n",
+        # Player 1's paddle covers 15-16, the ball reaches its row at 11.
+        b"2,11,29,15,13,stay,left,0,0\n",
+        # New rally, player 2's paddle covers 4-5 and returns the ball.
+        b"3,5,0,14,4,stay,left,1,0\n",
+        # 100 ticks skipped by cycle detection.
+        b"103,7,14,14,4,cycle,cycle,1,0\n",
+        # Cut off by a timeout.
+        b"104,3",
+    ]
+
+    def test_scripted_frames(self):
+        stats = MatchStatsAccumulator()
+        for frame in self.FRAMES:
+            stats.feed(frame)
+
+        result = stats.result()
+        self.assertEqual(result['ticks'], 103)
+        self.assertEqual(result['rallies'], 2)
+        self.assertEqual(result['longest_rally'], 101)
+        self.assertEqual(result['mean_rally'], 51.5)
+        self.assertEqual(result['dead_rallies'], 0)
+        self.assertEqual(result['hits'], [0, 1])
+        self.assertEqual(result['misses'], [1, 0])
+        self.assertEqual(result['paddle_travel'], [1, 11])
+        self.assertEqual(result['actions'], [
+            {'left': 0, 'right': 1, 'stay': 2},
+            {'left': 2, 'right': 0, 'stay': 1},
+        ])
+
+        # Rows are ball_y // 5 and columns ball_x // 5, the cycle row isn't counted.
+        heatmap = [[0] * 6 for _ in range(6)]
+        heatmap[3][2] = heatmap[5][2] = heatmap[0][1] = 1
+        self.assertEqual(result['heatmap'], heatmap)
+
+    def test_dead_rallies(self):
+        stats = MatchStatsAccumulator(max_point_ticks=2)
+        for step in range(1, 6):
+            stats.feed(f"{step},10,15,14,14,stay,stay,0,0\n".encode())
+
+        result = stats.result()
+        self.assertEqual(result['dead_rallies'], 2)
+        self.assertEqual(result['rallies'], 3)
+        self.assertEqual(result['longest_rally'], 2)
+
+    def test_stream_writes_every_frame_through(self):
+        stats = MatchStatsAccumulator()
+        log = io.BytesIO()
+        stream = StatsStream(log, stats)
+        for frame in self.FRAMES:
+            stream.write(frame)
+
+        self.assertEqual(log.getvalue(), b''.join(self.FRAMES))
+        self.assertEqual(stats.result()['ticks'], 103)
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_closed_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range(' bytes=100-5000 ', 1000), (100, 999))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range('bytes=500-', 1000), (500, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=1000-', 'bytes=1000-1999', 'bytes=20-10', 'bytes=-0'):
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range(header, 1000)
+
+    def test_unsupported_ranges_get_the_whole_file(self):
+        for header in ('bytes=0-99,200-299', 'bytes=-', 'items=0-99', 'bytes=a-b'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+
+@override_settings(GAME_LOG_DELIVERY='django')
+class GameLogRangeTests(TestCase):
+    LOG = bytes(range(256)) * 4
+
+    def setUp(self):
+        use_temp_media_root(self)
+        user = User.objects.create_user(username='viewer', password='password')
+        team = Team.objects.create(name='Viewer', creator=user)
+        submission = BotSubmission.objects.create(team=team, submitted_by=user, code_file='bot.py')
+        self.match = Match.objects.create(
+            match_type=Match.MatchType.TEST_VS_SYSTEM,
+            player1_submission=submission,
+            status=Match.MatchStatus.COMPLETED
+        )
+        self.match.game_log.save('game_log.csv.gz', ContentFile(self.LOG))
+
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def fetch(self, range_header):
+        return self.client.get(f'/api/tournament/matches/{self.match.id}/log/', HTTP_RANGE=range_header)
+
+    def test_partial_content(self):
+        response = self.fetch('bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1023/{len(self.LOG)}')
+        self.assertEqual(b''.join(response.streaming_content), self.LOG[-24:])
+
+    def test_out_of_range_is_416(self):
+        response = self.fetch(f'bytes={len(self.LOG)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.LOG)}')
+
+    def test_multiple_ranges_get_the_whole_file(self):
+        response = self.fetch('bytes=0-9,20-29')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.LOG)
+
+
+class ResultsExportTests(TestCase):
+    def setUp(self):
+        self.out_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.out_dir.cleanup)
+
+        self.staff = User.objects.create_user(username='exporter', password='password', is_staff=True)
+        team = Team.objects.create(name='Exported', creator=self.staff)
+        self.submission = BotSubmission.objects.create(team=team, submitted_by=self.staff, code_file='bot.py')
+
+        self.played(Match.MatchType.ROUND_ONE, datetime(2026, 1, 1, 10, tzinfo=dt_timezone.utc))
+        self.played(Match.MatchType.TEST_VS_SYSTEM, datetime(2026, 1, 2, 10, tzinfo=dt_timezone.utc))
+        self.played(Match.MatchType.ROUND_ONE, datetime(2026, 1, 3, 10, tzinfo=dt_timezone.utc))
+        self.played(Match.MatchType.ROUND_ONE, datetime(2026, 1, 3, 11, tzinfo=dt_timezone.utc))
+        Match.objects.create(match_type=Match.MatchType.ROUND_ONE, player1_submission=self.submission)
+
+    def played(self, match_type, played_at):
+        return Match.objects.create(
+            match_type=match_type,
+            player1_submission=self.submission,
+            status=Match.MatchStatus.COMPLETED,
+            player1_score=5,
+            player2_score=3,
+            played_at=played_at
+        )
+
+    def partitions(self):
+        # Rows in each matches/ partition, keyed by its path.
+        found = {}
+        root = os.path.join(self.out_dir.name, 'matches')
+        for directory, _, files in os.walk(root):
+            for name in files:
+                with gzip.open(os.path.join(directory, name), 'rt') as f:
+                    rows = sum(1 for _ in f) - 1
+                partition = os.path.relpath(directory, root)
+                found[partition] = found.get(partition, 0) + rows
+        return found
+
+    def test_since_exports_the_later_partitions(self):
+        call_command(
+            'export_results', out_dir=self.out_dir.name, since='2026-01-01T12:00:00+00:00', format='csv',
+            stdout=io.StringIO()
+        )
+
+        self.assertEqual(self.partitions(), {
+            os.path.join('match_type=TS', 'date=2026-01-02'): 1,
+            os.path.join('match_type=R1', 'date=2026-01-03'): 2,
+        })
+
+    def test_incremental_export_continues_from_the_watermark(self):
+        call_command('export_results', out_dir=self.out_dir.name, format='csv', stdout=io.StringIO())
+        self.assertEqual(sum(self.partitions().values()), 4)
+
+        later = timezone.now() + timedelta(hours=1)
+        played_at = later - timedelta(minutes=30)
+        self.played(Match.MatchType.ROUND_ONE, played_at)
+        with mock.patch('tournament.export.timezone.now', return_value=later):
+            call_command('export_results', out_dir=self.out_dir.name, incremental=True, format='csv', stdout=io.StringIO())
+
+        partitions = self.partitions()
+        self.assertEqual(sum(partitions.values()), 5)
+        self.assertEqual(partitions[os.path.join('match_type=R1', f'date={played_at.date().isoformat()}')], 1)
+
+    def test_streaming_export_since(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        response = client.get('/api/tournament/export/', {'since': '2026-01-02T12:00:00+00:00'})
+        self.assertEqual(response.status_code, 200)
+        rows = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(rows), 3)
+
+    def test_bad_since_is_400(self):
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        for since in ('2026-13-01T00:00:00', 'yesterday'):
+            with self.subTest(since=since):
+                response = client.get('/api/tournament/export/', {'since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('since', response.data)
+
+
+@override_settings(REDIS_URL='fakeredis://', DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        redis_client._connection = None
+        redis_client.get_redis().flushall()
+        replicas._replica_checks.clear()
+        self.addCleanup(replicas._replica_checks.clear)
+
+        lag = mock.patch('tournament.replicas.replica_lag', return_value=0.0)
+        self.replica_lag = lag.start()
+        self.addCleanup(lag.stop)
+
+        self.factory = RequestFactory()
+        self.middleware = replicas.ReplicaMiddleware(self.respond)
+
+    def tearDown(self):
+        redis_client._connection = None
+
+    def respond(self, request):
+        # Where the router sends a read made while handling the request.
+        self.read_from = replicas.ReplicaRouter().db_for_read(Match)
+        return HttpResponse()
+
+    def request(self, method, token='Bearer one'):
+        self.middleware(self.factory.generic(method, '/api/tournament/leaderboard/', HTTP_AUTHORIZATION=token))
+        return self.read_from
+
+    def test_safe_methods_read_from_the_replica(self):
+        for method in replicas.SAFE_METHODS:
+            with self.subTest(method=method):
+                self.assertEqual(self.request(method, token=f'Bearer {method}'), 'replica')
+
+    def test_writes_use_the_primary(self):
+        self.assertIsNone(self.request('POST'))
+        self.assertEqual(replicas.ReplicaRouter().db_for_write(Match), 'default')
+
+    def test_client_reads_the_primary_after_a_write(self):
+        self.request('POST')
+        self.assertIsNone(self.request('GET'))
+        # Other clients carry on reading from the replica.
+        self.assertEqual(self.request('GET', token='Bearer two'), 'replica')
+
+        key = replicas.pin_key(self.factory.get('/', HTTP_AUTHORIZATION='Bearer one'))
+        self.assertIn(redis_client.get_redis().ttl(key), range(1, settings.REPLICA_STALENESS_SECONDS + 1))
+
+    def test_pin_falls_back_to_the_primary_when_redis_is_down(self):
+        with mock.patch('tournament.replicas.get_redis', side_effect=redis.ConnectionError('down')):
+            self.assertIsNone(self.request('GET'))
+
+    def test_stale_replica_is_skipped(self):
+        self.replica_lag.return_value = settings.REPLICA_STALENESS_SECONDS + 1
+        self.assertIsNone(self.request('GET'))
+
+    def test_relations_of_primary_objects_stay_on_the_primary(self):
+        instance = Match()
+        instance._state.db = 'default'
+        token = replicas.current_replica.set('replica')
+        try:
+            self.assertEqual(replicas.ReplicaRouter().db_for_read(Match, instance=instance), 'default')
+        finally:
+            replicas.current_replica.reset(token)
+
+    def test_outside_a_request_reads_use_the_default(self):
+        self.assertIsNone(replicas.ReplicaRouter().db_for_read(Match))
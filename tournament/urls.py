@@ -16,17 +16,26 @@ from .views import (
     ChallengeAcceptView,
     ChallengeDeclineView,
     ChallengeCancelView,
-    RoundTwoBracketView
+    RoundTwoBracketView,
+    RoundTwoBracketTreeView,
+    WinMatrixView,
+    GauntletListCreateView,
+    GauntletDetailView,
+    TeamStatsView,
+    ResultsExportView,
+    TeamAutocompleteView
 )
 
 urlpatterns = [
     path('teams/', TeamListCreateView.as_view(), name='team-list-create'),
+    path('teams/autocomplete/', TeamAutocompleteView.as_view(), name='team-autocomplete'),
     path('teams/<uuid:pk>/', TeamDetailView.as_view(), name='team-detail'), 
 
     path('teams/<uuid:team_pk>/submissions/', BotSubmissionListCreateView.as_view(), name='submission-list-create'),
     path('teams/<uuid:team_pk>/submissions/<uuid:submission_pk>/', BotSubmissionDetailView.as_view(), name='submission-detail'),
     path('teams/<uuid:team_pk>/submissions/<uuid:submission_pk>/set-active/', BotSubmissionSetActiveView.as_view(), name='submission-set-active'),
     path('teams/<uuid:team_pk>/matches/', TeamMatchListView.as_view(), name='team-match-list'),
+    path('teams/<uuid:pk>/stats/', TeamStatsView.as_view(), name='team-stats'),
 
     path('matches/initiate-test/', InitiateTestMatchView.as_view(), name='match-initiate-test'),
     path('matches/', MatchListView.as_view(), name='match-list'),
@@ -35,6 +44,12 @@ urlpatterns = [
     
     path('leaderboard/', LeaderboardListView.as_view(), name='leaderboard-list'),
     path('round-two-bracket/', RoundTwoBracketView.as_view(), name='round-two-bracket-list'),
+    path('round-two-bracket/tree/', RoundTwoBracketTreeView.as_view(), name='round-two-bracket-tree'),
+    path('win-matrix/', WinMatrixView.as_view(), name='win-matrix'),
+    path('export/', ResultsExportView.as_view(), name='results-export'),
+
+    path('gauntlets/', GauntletListCreateView.as_view(), name='gauntlet-list-create'),
+    path('gauntlets/<uuid:pk>/', GauntletDetailView.as_view(), name='gauntlet-detail'),
 
     path('challenges/', ChallengeListCreateView.as_view(), name='challenge-list-create'),
     path('challenges/<uuid:pk>/', ChallengeDetailView.as_view(), name='challenge-detail'),
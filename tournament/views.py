@@ -4,23 +4,38 @@ from .models import (
     BotSubmission, 
     Match, 
     LeaderboardScore,
-    Challenge
+    Challenge,
+    PairwiseRecord,
+    Gauntlet,
+    TeamStats,
+    BracketNode
 )
 from .serializers import ( 
     TeamSerializer, 
     BotSubmissionSerializer, 
     MatchSerializer, 
     LeaderboardScoreSerializer, 
-    ChallengeSerializer
+    ChallengeSerializer,
+    GauntletSerializer,
+    TeamStatsSerializer
 )
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from django.utils import timezone 
 from datetime import timedelta
-from rest_framework.exceptions import ValidationError, PermissionDenied
-from .tasks import process_match_task
-from django.http import FileResponse, Http404
-from django.db.models import Q
+from rest_framework.exceptions import ValidationError, PermissionDenied, Throttled
+from .tasks import dispatch_match, refresh_win_matrix_task, run_gauntlet_task
+from .ratelimit import SlidingWindowRateLimiter, RateLimitExceeded, HOUR, DAY
+from .admission import admit_match, QueueFull
+from .log_delivery import serve_game_log
+from .search import search_teams
+from .bracket import bracket_stages, stage_nodes, subtree_nodes, serialize_nodes, NODE_FIELDS
+from .export import MATCH_COLUMNS, LEADERBOARD_COLUMNS, finished_matches, match_rows, leaderboard_rows, stream_csv_gz
+from django.http import Http404, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
+from django.db.models import Q, Exists, OuterRef
 from django.db import transaction
 
 class IsTeamCreator(permissions.BasePermission):
@@ -31,14 +46,40 @@ class IsTeamCreator(permissions.BasePermission):
 
         return obj.creator == request.user
     
+class TeamDirectoryPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
 class TeamListCreateView(generics.ListCreateAPIView):
-    queryset = Team.objects.all()
     serializer_class = TeamSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = TeamDirectoryPagination
+
+    def get_queryset(self):
+        # Creators are joined and members prefetched, a page costs the same
+        # number of queries however many teams it holds.
+        teams = Team.objects.select_related('creator').prefetch_related('members')
+        return search_teams(teams, self.request.query_params.get('search'))
 
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
+class TeamAutocompleteView(views.APIView):
+    permission_classes = [permissions.AllowAny]
+
+    MAX_RESULTS = 20
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.MAX_RESULTS))
+        except ValueError:
+            raise ValidationError({"limit": "Expected an integer."})
+        limit = max(1, min(limit, self.MAX_RESULTS))
+
+        teams = search_teams(Team.objects.all(), request.query_params.get('q'))
+        return Response(list(teams.values('id', 'name')[:limit]))
+
 class TeamMatchListView(generics.ListAPIView):
     serializer_class = MatchSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -77,6 +118,15 @@ class TeamDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+class TeamStatsView(generics.RetrieveAPIView):
+    serializer_class = TeamStatsSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get_object(self):
+        team = get_object_or_404(Team, pk=self.kwargs['pk'])
+        # Teams that have not finished a match yet get zeroed stats.
+        return TeamStats.objects.select_related('team').filter(team=team).first() or TeamStats(team=team)
+
 class BotSubmissionListCreateView(generics.ListCreateAPIView):
     serializer_class = BotSubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -97,19 +147,25 @@ class BotSubmissionListCreateView(generics.ListCreateAPIView):
         if not team.members.filter(pk=self.request.user.pk).exists():
             raise PermissionDenied("User not a mmeber of the team.")
     
-        one_hour_ago = timezone.now() - timedelta(hours=1)
+        limiter = SlidingWindowRateLimiter('submissions', [
+            ('hourly', self.HOURLY_SUBMISSION_LIMIT, HOUR),
+            ('daily', self.DAILY_SUBMISSION_LIMIT, DAY),
+        ])
 
-        recent_submission_count = BotSubmission.objects.filter(
-            team = team,
-            submitted_at__gte = one_hour_ago
-        ).count()
-
-        if recent_submission_count >= self.HOURLY_SUBMISSION_LIMIT:
-            raise ValidationError(
-                {'detail': f"Team hourly submission limit of {self.HOURLY_SUBMISSION_LIMIT} reached. Please try again later."}
+        try:
+            token = limiter.hit(team.pk.hex)
+        except RateLimitExceeded as e:
+            raise Throttled(
+                wait=e.retry_after,
+                detail=f"Team {e.name} submission limit of {e.limit} reached. Please try again later."
             )
 
-        serializer.save(team=team, submitted_by=self.request.user)
+        try:
+            serializer.save(team=team, submitted_by=self.request.user)
+        except Exception:
+            if token:
+                limiter.release(team.pk.hex, token)
+            raise
 
 class BotSubmissionDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = BotSubmissionSerializer
@@ -153,6 +209,10 @@ class BotSubmissionSetActiveView(generics.UpdateAPIView):
         instance = self.get_object()
         instance.is_active = True
         instance.save()
+
+        submission_hex = instance.id.hex
+        transaction.on_commit(lambda: refresh_win_matrix_task.delay(submission_hex))
+
         serializer = self.get_serializer(instance)
 
         return Response(serializer.data)
@@ -181,28 +241,75 @@ class InitiateTestMatchView(views.APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        one_hour_ago = timezone.now() - timedelta(hours=1)
-
-        recent_test_matches_count = Match.objects.filter(
-            match_type=Match.MatchType.TEST_VS_SYSTEM,
-            player1_submission__team=team,
-            created_at__gte=one_hour_ago
-        ).count()
+        limiter = SlidingWindowRateLimiter('test-matches', [
+            ('hourly', self.HOURLY_TEST_MATCH_LIMIT_PER_TEAM, HOUR),
+        ])
 
-        if recent_test_matches_count >= self.HOURLY_TEST_MATCH_LIMIT_PER_TEAM:
+        try:
+            token = limiter.hit(team.pk.hex)
+        except RateLimitExceeded as e:
             return Response(
-                {"detail": f"Team hourly test match limit of {self.HOURLY_TEST_MATCH_LIMIT_PER_TEAM}"},
-                status=status.HTTP_429_TOO_MANY_REQUESTS
+                {"detail": f"Team {e.name} test match limit of {e.limit} reached. Please try again later."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(e.retry_after)}
             )
-    
-        match = Match.objects.create(
-            match_type=Match.MatchType.TEST_VS_SYSTEM,
-            player1_submission=active_submission,
-            is_player2_system_bot=True,
-            status=Match.MatchStatus.PENDING
-        )
 
-        process_match_task.delay(match.id.hex)
+        with transaction.atomic():
+            # Requests for the same submission queue up on its row, so a second
+            # one finds the match the first created instead of creating another.
+            # SQLite has no row locks and ignores this.
+            BotSubmission.objects.select_for_update().get(pk=active_submission.pk)
+
+            # An identical test is already waiting for a worker, share its result
+            # instead of queueing another run of the same submission.
+            pending_match = Match.objects.filter(
+                match_type=Match.MatchType.TEST_VS_SYSTEM,
+                player1_submission=active_submission,
+                status=Match.MatchStatus.PENDING,
+                coalesced_into__isnull=True
+            ).order_by('created_at').first()
+
+            if not pending_match:
+                try:
+                    admit_match()
+                except QueueFull as e:
+                    if token:
+                        limiter.release(team.pk.hex, token)
+                    return Response(
+                        {
+                            "detail": "The match queue is full. Please try again later.",
+                            "queue_depth": e.depth,
+                            "estimated_wait_seconds": e.estimated_wait
+                        },
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(e.estimated_wait)}
+                    )
+
+            match = Match.objects.create(
+                match_type=Match.MatchType.TEST_VS_SYSTEM,
+                player1_submission=active_submission,
+                is_player2_system_bot=True,
+                status=Match.MatchStatus.PENDING,
+                coalesced_into=pending_match
+            )
+
+        if pending_match:
+            # The shared run may have finished between the lookup and the commit,
+            # in which case nothing would ever copy its result over to this match.
+            still_waiting = Match.objects.filter(
+                pk=pending_match.pk,
+                status__in=[Match.MatchStatus.PENDING, Match.MatchStatus.RUNNING]
+            ).exists()
+
+            # Unless the leader's result already reached it.
+            if not still_waiting and Match.objects.filter(
+                pk=match.pk, status=Match.MatchStatus.PENDING
+            ).update(coalesced_into=None):
+                match.coalesced_into = None
+                pending_match = None
+
+        if not pending_match:
+            dispatch_match(match.id)
 
         serializer = self.serializer_class(match)
 
@@ -265,27 +372,25 @@ class MatchLogView(views.APIView):
     permission_classes = [ permissions.IsAuthenticated ]
 
     def get(self, request, match_id):
-        match = get_object_or_404(Match, id=match_id)
-
         user = request.user
 
-        user_teams = Team.objects.filter(Q(members=user))
-        is_involved = False
-
-        if match.player1_submission and match.player1_submission.team in user_teams:
-            is_involved = True
-        if match.player2_submission and match.player2_submission.team in user_teams:
-            is_involved = True
+        # Involvement is checked in the same query that loads the match.
+        user_teams = Team.objects.filter(members=user).filter(
+            Q(pk=OuterRef('player1_submission__team')) | Q(pk=OuterRef('player2_submission__team'))
+        )
+        match = get_object_or_404(
+            Match.objects.annotate(is_involved=Exists(user_teams)).only('id', 'status', 'game_log'),
+            id=match_id
+        )
 
-        if not is_involved and not user.is_staff:
+        if not match.is_involved and not user.is_staff:
             return Response({"detail": "Not authorized to view this log."}, status=status.HTTP_403_FORBIDDEN)
 
-        if not match.game_log_url:
+        if not match.game_log:
             return Response({"detail": "Game log not available for this match."}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            response = FileResponse(match.game_log.open('rb'), as_attachment=True)
-            return response
+            return serve_game_log(request, match, immutable=match.status == Match.MatchStatus.COMPLETED)
         except FileNotFoundError:
             return Response({"detail": "Game long file not found on server."}, status=status.HTTP_404_NOT_FOUND) 
         except Exception as e:
@@ -293,11 +398,137 @@ class MatchLogView(views.APIView):
             return Response({"detail": "Error fetching game log"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 class LeaderboardListView(generics.ListAPIView):
-    queryset = LeaderboardScore.objects.all().order_by('-score', '-matches_won','matches_played')
+    queryset = LeaderboardScore.objects.select_related('team').order_by('-score', '-matches_won','matches_played')
     serializer_class = LeaderboardScoreSerializer
     permission_classes = [permissions.AllowAny]
 
 
+class ResultsExportView(views.APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    TABLES = {
+        'matches': MATCH_COLUMNS,
+        'leaderboard': LEADERBOARD_COLUMNS,
+    }
+
+    def get(self, request):
+        table = request.query_params.get('table', 'matches')
+        if table not in self.TABLES:
+            raise ValidationError({"table": f"Choose one of {', '.join(self.TABLES)}."})
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                # Well formed but out of range, like month 13.
+                since = None
+            if since is None:
+                raise ValidationError({"since": "Expected an ISO 8601 timestamp."})
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        until = timezone.now() - timedelta(seconds=settings.EXPORT_WATERMARK_LAG_SECONDS)
+
+        if table == 'matches':
+            rows = match_rows(finished_matches(since, until), settings.EXPORT_CHUNK_SIZE)
+        else:
+            rows = leaderboard_rows(settings.EXPORT_CHUNK_SIZE)
+
+        response = StreamingHttpResponse(stream_csv_gz(rows, self.TABLES[table]), content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{table}-{until:%Y%m%dT%H%M%S}.csv.gz"'
+        # Pass back as since to fetch only what finished after this export.
+        response['X-Export-Watermark'] = until.isoformat()
+        return response
+
+class WinMatrixView(views.APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        submissions = list(
+            BotSubmission.objects.filter(is_active=True).select_related('team').order_by('team__name')
+        )
+
+        submission_filter = request.query_params.get('submission')
+        rows = submissions
+        if submission_filter:
+            rows = [s for s in submissions if s.id.hex == submission_filter.replace('-', '')]
+            if not rows:
+                return Response({"detail": "No active submission with that id."}, status=status.HTTP_404_NOT_FOUND)
+
+        index = {s.id: i for i, s in enumerate(submissions)}
+        row_index = {s.id: i for i, s in enumerate(rows)}
+
+        win_probability = [[None] * len(submissions) for _ in rows]
+        games = [[0] * len(submissions) for _ in rows]
+
+        records = PairwiseRecord.objects.filter(
+            submission_a__is_active=True,
+            submission_b__is_active=True
+        )
+        if submission_filter:
+            records = records.filter(Q(submission_a=rows[0]) | Q(submission_b=rows[0]))
+
+        for record in records:
+            for row_id, column_id in [
+                (record.submission_a_id, record.submission_b_id),
+                (record.submission_b_id, record.submission_a_id)
+            ]:
+                if row_id in row_index and column_id in index:
+                    win_probability[row_index[row_id]][index[column_id]] = record.win_probability(row_id)
+                    games[row_index[row_id]][index[column_id]] = record.games
+
+        return Response({
+            "submissions": [
+                {"id": s.id, "team": s.team_id, "team_name": s.team.name} for s in submissions
+            ],
+            "rows": [s.id for s in rows],
+            "win_probability": win_probability,
+            "games": games,
+        })
+
+class GauntletListCreateView(generics.ListCreateAPIView):
+    serializer_class = GauntletSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    HOURLY_GAUNTLET_LIMIT_PER_TEAM = 2
+
+    def get_queryset(self):
+        return Gauntlet.objects.filter(
+            submission__team__members=self.request.user
+        ).select_related('submission__team').order_by('-created_at')
+
+    def perform_create(self, serializer):
+        team = serializer.validated_data['submission'].team
+
+        limiter = SlidingWindowRateLimiter('gauntlets', [
+            ('hourly', self.HOURLY_GAUNTLET_LIMIT_PER_TEAM, HOUR),
+        ])
+
+        try:
+            limiter.hit(team.pk.hex)
+        except RateLimitExceeded as e:
+            raise Throttled(
+                wait=e.retry_after,
+                detail=f"Team {e.name} gauntlet limit of {e.limit} reached. Please try again later."
+            )
+
+        gauntlet = serializer.save(requested_by=self.request.user)
+
+        gauntlet_hex = gauntlet.id.hex
+        transaction.on_commit(lambda: run_gauntlet_task.delay(gauntlet_hex))
+
+class GauntletDetailView(generics.RetrieveAPIView):
+    serializer_class = GauntletSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Gauntlet.objects.all().select_related('submission__team')
+        return Gauntlet.objects.filter(
+            submission__team__members=self.request.user
+        ).select_related('submission__team')
+
 class ChallengeListCreateView(generics.ListCreateAPIView):
     serializer_class = ChallengeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -396,7 +627,7 @@ class ChallengeAcceptView(views.APIView):
                 challenge.match_played = match
                 challenge.save()
 
-                process_match_task.delay(match.id.hex)
+                dispatch_match(match.id)
 
                 serializer = self.serializer_class(challenge)
                 return Response(serializer.data, status=status.HTTP_200_OK)
@@ -468,4 +699,31 @@ class RoundTwoBracketView(generics.ListAPIView):
             'player1_submission__team',
             'player2_submission__team',
             'winning_team'
-        ).order_by('round_stage', 'created_at') 
\ No newline at end of file
+        ).order_by('round_stage', 'created_at')
+
+class RoundTwoBracketTreeView(views.APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        # ?stage=16 returns one stage, ?root=<node id> a node and everything
+        # that fed into it (limited to ?depth stages), neither the whole tree.
+        params = {}
+        for name in ('stage', 'root', 'depth'):
+            value = request.query_params.get(name)
+            if value is None:
+                continue
+            try:
+                params[name] = int(value)
+            except ValueError:
+                raise ValidationError({name: "Expected an integer."})
+
+        if 'root' in params:
+            nodes = subtree_nodes(params['root'], params.get('depth'))
+            if not nodes:
+                raise Http404("Bracket node not found.")
+        elif 'stage' in params:
+            nodes = stage_nodes(params['stage'])
+        else:
+            nodes = serialize_nodes(BracketNode.objects.values(*NODE_FIELDS))
+
+        return Response({'stages': bracket_stages(), 'nodes': nodes}) 
\ No newline at end of file